@@ -40,6 +40,8 @@ from acts.examples.reconstruction import (
 )
 from acts.examples.odd import getOpenDataDetector, getOpenDataDetectorDirectory
 
+from mycommon.sequencer import ScopedSequencer
+
 u = acts.UnitConstants
 
 
@@ -119,6 +121,15 @@ parser.add_argument(
     help="Use the Ml seed filter to select seed after the seeding step",
     action="store_true",
 )
+parser.add_argument(
+    "--particle-hypotheses",
+    help="Particle hypothesis for seeding and CKF. With several, reconstruction "
+    "runs once per hypothesis on the same simulated events, writing to "
+    "<output>/<hypothesis>",
+    nargs="+",
+    choices=["pion", "muon", "proton", "none"],
+    default=["proton"],
+)
 parser.add_argument(
     "--reco",
     help="Switch reco on/off",
@@ -151,6 +162,13 @@ ambi_ML = args.ambi_solver == "ML"
 ambi_scoring = args.ambi_solver == "scoring"
 ambi_config = args.ambi_config
 seedFilter_ML = args.MLSeedFilter
+particleHypotheses = {
+    "pion": acts.ParticleHypothesis.pion,
+    "muon": acts.ParticleHypothesis.muon,
+    "proton": acts.ParticleHypothesis.proton,
+    # leave the choice to the track parameter estimation
+    "none": None,
+}
 geoDir = getOpenDataDetectorDirectory()
 actsDir = pathlib.Path("/eos/user/r/reyu/software/acts")
 # acts.examples.dump_args_calls(locals())  # show python binding calls
@@ -331,7 +349,8 @@ addDigiParticleSelection(
     ),
 )
 
-if args.reco:
+
+def addReco(s, outputDir, particleHypothesis):
     addSeeding(
         s,
         trackingGeometry,
@@ -348,8 +367,7 @@ if args.reco:
         initialSigmaQoverPt=0.1 * u.e / u.GeV,
         initialSigmaPtRel=0.1,
         initialVarInflation=[1.0] * 6,
-        particleHypothesis=acts.ParticleHypothesis.proton,
-#        particleHypothesis=None,
+        particleHypothesis=particleHypothesis,
         geoSelectionConfigFile=oddSeedingSel,
 #        outputDirRoot=outputDir if args.output_root else None,
         outputDirCsv=outputDir if args.output_csv else None,
@@ -472,4 +490,15 @@ if args.reco:
         outputDirRoot=outputDir  / "vertex_amvf_truth_time",
     )
 
+
+if args.reco:
+    if len(args.particle_hypotheses) == 1:
+        addReco(s, outputDir, particleHypotheses[args.particle_hypotheses[0]])
+    else:
+        # seeding, CKF and vertexing once per hypothesis on the same digitized
+        # events, each with its own whiteboard collections and output directory
+        for name in args.particle_hypotheses:
+            with ScopedSequencer(s, name) as scope:
+                addReco(scope, outputDir / name, particleHypotheses[name])
+
 s.run()
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 
 import os
+import copy
 import argparse
 import pathlib
-import math
 
 import acts
 import acts.examples
@@ -40,10 +40,67 @@ from acts.examples.reconstruction import (
 )
 from acts.examples.odd import getOpenDataDetector, getOpenDataDetectorDirectory
 
+from mycommon.chainspec import (
+    stages,
+    ambiguity_solvers,
+    load_spec,
+    convert,
+    stage_hashes,
+    find_reusable,
+    write_manifest,
+)
+from mycommon.checkpoint import (
+    run_chunks,
+    run_event_list,
+    read_event_list,
+    merge_chunks,
+    chunk_command,
+)
+from mycommon.pileup import build_library, overlay, vertices_name
+from mycommon.sequencer import ScopedSequencer
+from mycommon.seeds import stream_seed, scheme as seedScheme
+from mycommon.latency import TimedSequencer
+from mycommon.telemetry import Telemetry
+from mycommon.compression import compress_outputs, parse_setting
+from mycommon.covariance import compact_outputs, layouts as covarianceLayouts
+from mycommon.vertex_summary import summarize_outputs, merge_chunk_summaries
+
 u = acts.UnitConstants
 
 
 parser = argparse.ArgumentParser(description="Full chain with the OpenDataDetector")
+parser.add_argument(
+    "--spec",
+    help="Chain configuration (YAML or JSON) layered over "
+    "configs/full_chain_odd.yaml, the options below override it",
+    type=pathlib.Path,
+)
+parser.add_argument(
+    "--reuse-from",
+    help="Output directories of earlier runs to reuse results from when their "
+    "stage hashes match, the output directory itself is always searched",
+    nargs="*",
+    type=pathlib.Path,
+    default=[],
+)
+parser.add_argument(
+    "--force",
+    help="Run all stages even if earlier results match",
+    action="store_true",
+)
+parser.add_argument(
+    "--checkpoint-every",
+    help="Run the events in chunks of this size, each as its own job whose "
+    "completion is recorded in <output>/checkpoint.json, and merge them at the end",
+    type=int,
+    default=0,
+)
+parser.add_argument(
+    "--resume",
+    help="With --checkpoint-every, only run the chunks missing from the checkpoint",
+    default=False,
+    action=argparse.BooleanOptionalAction,
+)
 parser.add_argument(
     "--output",
     "-o",
@@ -51,48 +108,95 @@ parser.add_argument(
     type=pathlib.Path,
     default=pathlib.Path.cwd() / "odd_output",
 )
-parser.add_argument("--events", "-n", help="Number of events", type=int, default=10)
-parser.add_argument("--skip", "-s", help="Number of events", type=int, default=0)
+parser.add_argument("--events", "-n", help="Number of events", type=int)
+parser.add_argument("--skip", "-s", help="Number of events", type=int)
+parser.add_argument(
+    "--threads",
+    "-j",
+    help="Number of threads, -1 for all cores (Geant4 always uses one)",
+    type=int,
+    default=-1,
+)
+parser.add_argument(
+    "--event-list",
+    help="Process only these event numbers instead of --skip and --events, "
+    "with the same random numbers as in a run over all of them",
+    nargs="*",
+    type=int,
+)
+parser.add_argument(
+    "--event-list-file",
+    help="Like --event-list, one event number per line, # starts a comment",
+)
 parser.add_argument("--edm4hep", help="Use edm4hep inputs", type=pathlib.Path)
 parser.add_argument(
-    "--geant4", help="Use Geant4 instead of fatras", action="store_true"
+    "--geant4",
+    help="Use Geant4 instead of fatras",
+    action=argparse.BooleanOptionalAction,
 )
 parser.add_argument(
     "--ttbar",
     help="Use Pythia8 (ttbar, pile-up 200) instead of particle gun",
-    action="store_true",
+    action=argparse.BooleanOptionalAction,
 )
 parser.add_argument(
     "--ttbar-pu",
     help="Number of pile-up events for ttbar",
     type=int,
-    default=200,
+)
+parser.add_argument(
+    "--pu-library",
+    help="Sample the ttbar pile-up from this library instead of generating it",
+    type=pathlib.Path,
+)
+parser.add_argument(
+    "--build-pu-library",
+    help="Generate --events minimum-bias events into a pile-up library in this "
+    "directory and exit",
+    type=pathlib.Path,
+)
+parser.add_argument(
+    "--pu-hit-library",
+    help="Overlay ttbar pile-up hits from this library of simulated minimum-bias "
+    "events instead of generating and simulating the pile-up",
+    type=pathlib.Path,
+)
+parser.add_argument(
+    "--build-pu-hit-library",
+    help="Generate and simulate --events minimum-bias events into a pile-up hit "
+    "library in this directory and exit",
+    type=pathlib.Path,
+)
+parser.add_argument(
+    "--pu-scan",
+    help="Simulate every ttbar hard-scatter event once and overlay pile-up hits "
+    "from --pu-hit-library at each of these PU levels, writing "
+    "<output>/ttbar_pu<N> for all of them from one job; the pile-up of every "
+    "level is drawn independently, as in a single run at that level",
+    nargs="+",
+    type=int,
 )
 parser.add_argument(
     "--gun-particles",
     help="Multiplicity (no. of particles) of the particle gun",
     type=int,
-    default=4,
 )
 parser.add_argument(
     "--gun-multiplicity",
     help="Multiplicity (no. of vertices) of the particle gun",
     type=int,
-    default=200,
 )
 parser.add_argument(
     "--gun-eta-range",
     nargs=2,
     help="Eta range of the particle gun",
     type=float,
-    default=[-3.0, 3.0],
 )
 parser.add_argument(
     "--gun-pt-range",
     nargs=2,
     help="Pt range of the particle gun (GeV)",
     type=float,
-    default=[1.0 * u.GeV, 10.0 * u.GeV],
 )
 parser.add_argument(
     "--digi-config", help="Digitization configuration file", type=pathlib.Path
@@ -102,56 +206,206 @@ parser.add_argument(
 )
 parser.add_argument(
     "--ambi-solver",
-    help="Set which ambiguity solver to use, default is the classical one",
+    help="Set which ambiguity solver to use, default is the classical one; all "
+    "runs every solver on the same CKF tracks, each writing to <output>/ambi_<solver>",
     type=str,
-    choices=["greedy", "scoring", "ML"],
-    default="greedy",
+    choices=[*ambiguity_solvers, "all"],
 )
 parser.add_argument(
     "--ambi-config",
     help="Set the configuration file for the Score Based ambiguity resolution",
     type=pathlib.Path,
-    default=pathlib.Path.cwd() / "ambi_config.json",
 )
 
 parser.add_argument(
     "--MLSeedFilter",
     help="Use the Ml seed filter to select seed after the seeding step",
+    action=argparse.BooleanOptionalAction,
+)
+parser.add_argument(
+    "--latency",
+    help="Record the latency of every algorithm per event in latency.csv; the "
+    "Python probe after every algorithm takes the GIL, so use --threads 1 or "
+    "the latencies include the probes waiting on each other",
     action="store_true",
 )
+parser.add_argument(
+    "--telemetry",
+    help="Write throughput metrics (events, events/s, events in flight, RSS, bytes "
+    "per output, with --latency time per algorithm) to this file while running; "
+    "this adds two Python probes per event, which take the GIL",
+    type=pathlib.Path,
+)
+parser.add_argument(
+    "--telemetry-format",
+    help="Append JSON lines, or rewrite the file in Prometheus text format",
+    choices=["jsonl", "prometheus"],
+    default="jsonl",
+)
+parser.add_argument(
+    "--telemetry-interval",
+    help="Seconds between telemetry samples",
+    type=float,
+    default=10,
+)
+parser.add_argument(
+    "--telemetry-port",
+    help="Also serve the metrics in Prometheus text format on this port at /metrics",
+    type=int,
+)
 parser.add_argument(
     "--reco",
     help="Switch reco on/off",
     default=True,
     action=argparse.BooleanOptionalAction,
 )
+parser.add_argument(
+    "--last-stage",
+    help="Stop the chain after this stage",
+    choices=stages[stages.index("digitization") :],
+    default=stages[-1],
+)
 parser.add_argument(
     "--output-root",
     help="Switch root output on/off",
-    default=True,
     action=argparse.BooleanOptionalAction,
 )
 parser.add_argument(
     "--output-csv",
     help="Switch csv output on/off",
-    default=False,
     action=argparse.BooleanOptionalAction,
 )
 parser.add_argument(
     "--output-obj",
     help="Switch obj output on/off",
-    default=False,
     action=argparse.BooleanOptionalAction,
 )
+parser.add_argument(
+    "--vertex-ntuples",
+    help="Keep the per-vertex performance ntuples of the vertex finders, "
+    "otherwise only their summary in vertex_summary.json. This saves disk space "
+    "but no I/O: the ntuples are still written during the run and deleted after "
+    "summarizing",
+    action=argparse.BooleanOptionalAction,
+)
+parser.add_argument(
+    "--cov-layout",
+    help="Covariance branches of the track summaries: all 36 elements, the upper "
+    "triangle, or sigmas plus int16 correlation coefficients",
+    choices=covarianceLayouts,
+)
+parser.add_argument(
+    "--cov-float32",
+    help="Store the upper triangle covariance as float32 (with --cov-layout upper)",
+    action=argparse.BooleanOptionalAction,
+)
+parser.add_argument(
+    "--compression",
+    help="Compression of the ROOT outputs per family (a stage name or default), "
+    "e.g. default=zstd:5 ckf=lz4:4:64000:1000 as algorithm:level[:basket "
+    "size[:auto flush]], applied by rewriting the files after the run; off "
+    "keeps the writers' settings",
+    nargs="*",
+    metavar="FAMILY=SETTING",
+    default=[],
+)
+
+spec = convert(load_spec(parser.parse_known_args()[0].spec), u)
+parser.set_defaults(
+    events=spec["run"]["events"],
+    skip=spec["run"]["skip"],
+    geant4=spec["simulation"]["engine"] == "geant4",
+    ttbar=spec["generator"]["type"] == "ttbar",
+    ttbar_pu=spec["generator"]["ttbar"]["pileup"],
+    pu_library=spec["generator"]["ttbar"]["pileupLibrary"],
+    pu_hit_library=spec["simulation"]["pileupHitLibrary"],
+    gun_particles=spec["generator"]["gun"]["particles"],
+    gun_multiplicity=spec["generator"]["gun"]["multiplicity"],
+    gun_eta_range=spec["generator"]["gun"]["eta"],
+    gun_pt_range=[pt / u.GeV for pt in spec["generator"]["gun"]["pt"]],
+    digi_config=spec["digitization"]["config"],
+    ambi_solver=spec["ambiguity"]["solver"],
+    ambi_config=spec["ambiguity"]["scoring"]["volumeFile"],
+    MLSeedFilter=spec["seeding"]["mlSeedFilter"]["enabled"],
+    output_root=spec["outputs"]["root"],
+    output_csv=spec["outputs"]["csv"],
+    output_obj=spec["outputs"]["obj"],
+    vertex_ntuples=spec["outputs"]["vertexNtuples"],
+    cov_layout=spec["outputs"]["covariance"]["layout"],
+    cov_float32=spec["outputs"]["covariance"]["float32"],
+)
 
 args = parser.parse_args()
 
-outputDir = args.output / f"ttbar_pu{args.ttbar_pu}"
-ambi_ML = args.ambi_solver == "ML"
-ambi_scoring = args.ambi_solver == "scoring"
+# fold the command line back into the spec, so that the stage hashes describe
+# what actually runs
+spec["run"].update(events=args.events, skip=args.skip, seeds=seedScheme)
+generator = spec["generator"]
+generator["type"] = "ttbar" if args.ttbar else "gun"
+generator["ttbar"]["pileup"] = args.ttbar_pu
+generator["ttbar"]["pileupLibrary"] = args.pu_library and str(args.pu_library)
+generator["gun"].update(
+    particles=args.gun_particles,
+    multiplicity=args.gun_multiplicity,
+    eta=args.gun_eta_range,
+    pt=[pt * u.GeV for pt in args.gun_pt_range],
+)
+simulation = spec["simulation"]
+simulation["engine"] = "geant4" if args.geant4 else "fatras"
+simulation["pileupHitLibrary"] = args.pu_hit_library and str(args.pu_hit_library)
+if args.pu_library and args.pu_hit_library:
+    parser.error("--pu-library and --pu-hit-library exclude each other")
+if args.pu_hit_library and args.geant4:
+    parser.error("--pu-hit-library simulates the hard scatter with Fatras")
+if args.pu_scan and not (args.ttbar and args.pu_hit_library):
+    parser.error("--pu-scan needs --ttbar and --pu-hit-library")
+if args.pu_scan and args.checkpoint_every:
+    parser.error("--pu-scan does not support --checkpoint-every")
+if args.cov_float32 and args.cov_layout != "upper":
+    parser.error("--cov-float32 needs --cov-layout upper")
+eventList = list(args.event_list or [])
+if args.event_list_file:
+    eventList += read_event_list(args.event_list_file)
+if eventList and (args.checkpoint_every or args.pu_scan):
+    parser.error("--event-list does not support --checkpoint-every or --pu-scan")
+if eventList:
+    spec["run"]["eventList"] = sorted(set(eventList))
+if args.edm4hep:
+    generator["type"] = simulation["engine"] = "edm4hep"
+    generator["edm4hep"] = str(args.edm4hep)
+spec["digitization"]["config"] = args.digi_config and str(args.digi_config)
+spec["seeding"]["mlSeedFilter"]["enabled"] = args.MLSeedFilter
+spec["ckf"]["selector"].setdefault("pt", [1.0 * u.GeV if args.ttbar else 0.0, None])
+ambiguity = spec["ambiguity"]
+ambiguity["solver"] = args.ambi_solver
+ambiguity["scoring"]["volumeFile"] = str(args.ambi_config)
+spec["outputs"].update(root=args.output_root, csv=args.output_csv, obj=args.output_obj)
+spec["outputs"]["vertexNtuples"] = args.vertex_ntuples
+spec["outputs"]["covariance"].update(layout=args.cov_layout, float32=args.cov_float32)
+compression = spec["outputs"].setdefault("compression", {})
+for item in args.compression:
+    if item == "off":
+        compression.clear()
+        continue
+    family, _, setting = item.partition("=")
+    compression[family] = setting
+try:
+    compression = {
+        family: parse_setting(setting) if setting else None
+        for family, setting in compression.items()
+    }
+except ValueError as e:
+    parser.error(f"--compression: {e}")
+
+outputDir = args.output / (
+    "pu_scan" if args.pu_scan else f"ttbar_pu{args.ttbar_pu}"
+)
+ambi_ML = args.ambi_solver in ("ML", "all")
+ambi_scoring = args.ambi_solver in ("scoring", "all")
 ambi_config = args.ambi_config
 seedFilter_ML = args.MLSeedFilter
 geoDir = getOpenDataDetectorDirectory()
+scriptDir = pathlib.Path(os.path.dirname(__file__))
 # acts.examples.dump_args_calls(locals())  # show python binding calls
 
 oddMaterialMap = (
@@ -166,24 +420,274 @@ oddDigiConfig = (
     else geoDir / "config/odd-digi-smearing-config.json"
 )
 
-oddSeedingSel = geoDir / "config/odd-seeding-config.json"
+oddSeedingSel = (
+    spec["seeding"]["geoSelectionConfig"]
+    or geoDir / "config/odd-seeding-config.json"
+)
+seedFilterModel = scriptDir / spec["seeding"]["mlSeedFilter"]["model"]
+ambiModel = scriptDir / ambiguity["ML"]["model"]
+buildLibrary = args.build_pu_library or args.build_pu_hit_library
+
+# stages whose hash and inputs match an earlier run are not rerun: if all of
+# them match there is nothing to do, if generation and simulation match their
+# particles and hits are read back instead
+runStages = stages[
+    : stages.index(args.last_stage if args.reco else "digitization") + 1
+]
+stageFiles = {
+    "generator": [
+        args.edm4hep,
+        args.pu_library and args.pu_library / "index.json",
+    ],
+    "simulation": [
+        oddMaterialMap,
+        args.pu_hit_library and args.pu_hit_library / "index.json",
+    ],
+    "digitization": [oddDigiConfig],
+    "seeding": [oddSeedingSel, seedFilterModel if seedFilter_ML else None],
+    "ambiguity": [ambiModel if ambi_ML else None, ambi_config if ambi_scoring else None],
+}
+hashes = stage_hashes(spec, stageFiles)
+hashes = {stage: hashes[stage] for stage in runStages}
+reused = (
+    {}
+    if args.force or buildLibrary or args.pu_scan
+    else find_reusable(hashes, [outputDir, *args.reuse_from])
+)
+
+if len(reused) == len(runStages):
+    print(f"All stages match the results in {reused[runStages[-1]]}, nothing to do")
+    raise SystemExit(0)
+
+if eventList and not buildLibrary:
+    eventDirs = run_event_list(
+        chunk_command(__file__)
+        + ["--event-list", "--event-list-file", "", "--checkpoint-every", "0"]
+        + ["--compression", "off"],
+        outputDir,
+        eventList,
+    )
+    merge_chunk_summaries(
+        [d / outputDir.relative_to(args.output) for d in eventDirs], outputDir
+    )
+    if merge_chunks(eventDirs, args.output):
+        compress_outputs(outputDir, compression)
+        write_manifest(outputDir, spec, hashes)
+    raise SystemExit(0)
+
+if args.checkpoint_every and not buildLibrary:
+    chunks = run_chunks(
+        chunk_command(__file__)
+        + ["--checkpoint-every", "0", "--no-resume", "--compression", "off"],
+        outputDir,
+        first=args.skip,
+        events=args.events,
+        chunk=args.checkpoint_every,
+        key=hashes[runStages[-1]],
+        resume=args.resume,
+    )
+    merge_chunk_summaries(
+        [d / outputDir.relative_to(args.output) for d in chunks], outputDir
+    )
+    if merge_chunks(chunks, args.output):
+        compress_outputs(outputDir, compression)
+        write_manifest(outputDir, spec, hashes)
+    raise SystemExit(0)
+
+simulationDir = reused.get("simulation")
+# the vertex finders also need the truth vertices of the generation
+reusedFiles = ["particles_simulation.root", "hits.root"]
+if "vertexing" in runStages:
+    reusedFiles.append(vertices_name)
+if simulationDir is not None and not (
+    args.output_root
+    and all((pathlib.Path(simulationDir) / name).exists() for name in reusedFiles)
+):
+    simulationDir = None
+if simulationDir is not None:
+    print(f"Reusing generation and simulation from {simulationDir}")
+
 oddMaterialDeco = acts.IMaterialDecorator.fromFile(oddMaterialMap)
 
 detector = getOpenDataDetector(odd_dir=geoDir, mdecorator=oddMaterialDeco)
 trackingGeometry = detector.trackingGeometry()
 decorators = detector.contextDecorators()
 field = acts.ConstantBField(acts.Vector3(0.0, 0.0, 2.0 * u.T))
-rnd = acts.examples.RandomNumbers(seed=42)
+_randomNumbers = {}
+
+
+def randomNumbers(stream):
+    """Random numbers of one stream, see `mycommon.seeds`."""
+    if stream not in _randomNumbers:
+        _randomNumbers[stream] = acts.examples.RandomNumbers(
+            seed=stream_seed(spec["run"]["seed"], stream)
+        )
+    return _randomNumbers[stream]
+
+
+def pileupSeed(pu):
+    """Seed of the pile-up overlay at `pu`.
+
+    Every PU level has its own stream, so the levels of a PU scan draw
+    independent pile-up, each the same as a single run at that level.
+    """
+    return stream_seed(spec["run"]["seed"], f"pileup_overlay_pu{pu}")
+
 
 s = acts.examples.Sequencer(
     events=args.events,
     skip=args.skip,
-    numThreads=1 if args.geant4 else -1,
+    numThreads=1 if args.geant4 else args.threads,
     outputDir=str(outputDir),
     trackFpes=False,
 )
+telemetry = args.telemetry is not None or args.telemetry_port is not None
+if args.latency or telemetry:
+    # telemetry alone only needs the probes at the start and end of an event
+    s = TimedSequencer(
+        s, outputDir if args.latency else None, per_algorithm=args.latency
+    )
 
-if args.edm4hep:
+
+def selection(block):
+    return ParticleSelectorConfig(
+        **{k: tuple(v) if isinstance(v, list) else v for k, v in block.items()}
+    )
+
+
+def beamSpot(time=True):
+    stddev = generator["ttbar"]["vertexStddev"]
+    return acts.examples.GaussianVertexGenerator(
+        mean=acts.Vector4(0, 0, 0, 0),
+        stddev=acts.Vector4(*stddev[:3], stddev[3] if time else 0.0),
+    )
+
+
+# beam spot in the mm and ns of the CSV files, for sampled pile-up vertices
+pileupVertexStddev = [
+    value / unit
+    for value, unit in zip(generator["ttbar"]["vertexStddev"], [u.mm, u.mm, u.mm, u.ns])
+]
+
+
+def addHardScatterSimulation(directory):
+    """Simulate the ttbar hard scatter alone into CSV files in `directory`."""
+    h = acts.examples.Sequencer(
+        events=args.events,
+        skip=args.skip,
+        numThreads=args.threads,
+        outputDir=str(outputDir),
+        trackFpes=False,
+    )
+    addPythia8(
+        h,
+        hardProcess=generator["ttbar"]["hardProcess"],
+        npileup=0,
+        vtxGen=beamSpot(),
+        rnd=randomNumbers("generator"),
+        outputDirCsv=directory,
+    )
+    addGenParticleSelection(h, selection(generator["selection"]))
+    addFatras(
+        h,
+        trackingGeometry,
+        field,
+        outputDirCsv=directory,
+        rnd=randomNumbers("simulation"),
+        **simulation["fatras"],
+    )
+    h.run()
+
+
+def addTruthVertexReader(s, directory):
+    """Truth vertices of `overlay` or an earlier run, for the vertex finders."""
+    s.addReader(
+        acts.examples.RootVertexReader(
+            level=acts.logging.INFO,
+            filePath=str(directory / vertices_name),
+            outputVertices="vertices_truth",
+        )
+    )
+
+
+def addOverlayReaders(s, directory):
+    """Read hard scatter plus pile-up hits and vertices written by `overlay`."""
+    s.addReader(
+        acts.examples.CsvParticleReader(
+            level=acts.logging.INFO,
+            inputDir=str(directory),
+            inputStem="particles_simulated",
+            outputParticles="particles_simulated",
+        )
+    )
+    s.addReader(
+        acts.examples.CsvSimHitReader(
+            level=acts.logging.INFO,
+            inputDir=str(directory),
+            inputStem="hits",
+            outputSimHits="simhits",
+        )
+    )
+    addTruthVertexReader(s, directory)
+
+    s.addWhiteboardAlias("particles", "particles_simulated")
+
+    addSimParticleSelection(s, selection(simulation["selection"]))
+
+
+if buildLibrary:
+    libraryDir = buildLibrary
+    g = acts.examples.Sequencer(
+        events=args.events,
+        skip=args.skip,
+        numThreads=args.threads,
+        outputDir=str(libraryDir),
+        trackFpes=False,
+    )
+    if args.build_pu_library:
+        # minimum-bias events around the origin, moved to their vertices
+        # when they are sampled
+        addPythia8(
+            g,
+            hardProcess=generator["minbias"]["hardProcess"],
+            npileup=0,
+            vtxGen=acts.examples.FixedVertexGenerator(fixed=acts.Vector4(0, 0, 0, 0)),
+            rnd=randomNumbers("pileup_generator"),
+            outputDirCsv=libraryDir / "csv",
+        )
+        stems = ("particles",)
+    else:
+        # simulated hits can only be moved in time, the vertices get their
+        # z spread here
+        addPythia8(
+            g,
+            hardProcess=generator["minbias"]["hardProcess"],
+            npileup=0,
+            vtxGen=beamSpot(time=False),
+            rnd=randomNumbers("pileup_generator"),
+        )
+        addGenParticleSelection(g, selection(generator["selection"]))
+        addFatras(
+            g,
+            trackingGeometry,
+            field,
+            outputDirCsv=libraryDir / "csv",
+            rnd=randomNumbers("pileup_simulation"),
+            **simulation["fatras"],
+        )
+        stems = ("particles_simulated", "hits")
+    g.run()
+
+    index = build_library(libraryDir / "csv", libraryDir, stems)
+    print(f"Pile-up library {libraryDir}: {index['events']} events")
+    raise SystemExit(0)
+
+
+if args.pu_scan:
+    # the hard scatter is simulated once, every PU level adds its own pile-up
+    # hits to the same events in its own branch below
+    addHardScatterSimulation(outputDir / "hard_scatter")
+elif args.edm4hep:
     import acts.examples.edm4hep
 
     edm4hepReader = acts.examples.edm4hep.EDM4hepReader(
@@ -209,64 +713,133 @@ if args.edm4hep:
 
     s.addWhiteboardAlias("particles", edm4hepReader.config.outputParticlesGenerator)
 
-    addSimParticleSelection(
-        s,
-        ParticleSelectorConfig(
-            rho=(0.0, 24 * u.mm),
-            absZ=(0.0, 1.0 * u.m),
-            eta=(-3.0, 3.0),
-            pt=(150 * u.MeV, None),
-            removeNeutral=True,
-        ),
+    addSimParticleSelection(s, selection(simulation["selection"]))
+elif simulationDir is not None:
+    s.addReader(
+        acts.examples.RootParticleReader(
+            level=acts.logging.INFO,
+            filePath=str(pathlib.Path(simulationDir) / "particles_simulation.root"),
+            outputParticles="particles_simulated",
+        )
+    )
+    s.addReader(
+        acts.examples.RootSimHitReader(
+            level=acts.logging.INFO,
+            filePath=str(pathlib.Path(simulationDir) / "hits.root"),
+            outputSimHits="simhits",
+        )
+    )
+    if "vertexing" in runStages:
+        addTruthVertexReader(s, pathlib.Path(simulationDir))
+
+    s.addWhiteboardAlias("particles", "particles_simulated")
+
+    addSimParticleSelection(s, selection(simulation["selection"]))
+elif args.pu_hit_library:
+    # only the hard scatter is simulated, the pile-up hits come from the
+    # library
+    addHardScatterSimulation(outputDir / "hard_scatter")
+    overlay(
+        outputDir / "hard_scatter",
+        args.pu_hit_library,
+        outputDir / "simulated",
+        mu=args.ttbar_pu,
+        vertex_stddev=pileupVertexStddev,
+        seed=pileupSeed(args.ttbar_pu),
     )
+
+    addOverlayReaders(s, outputDir / "simulated")
 else:
     if not args.ttbar:
+        gun = generator["gun"]
         addParticleGun(
             s,
-            MomentumConfig(
-                args.gun_pt_range[0] * u.GeV,
-                args.gun_pt_range[1] * u.GeV,
-                transverse=True,
-            ),
-            EtaConfig(args.gun_eta_range[0], args.gun_eta_range[1]),
-            PhiConfig(0.0, 360.0 * u.degree),
+            MomentumConfig(gun["pt"][0], gun["pt"][1], transverse=True),
+            EtaConfig(gun["eta"][0], gun["eta"][1]),
+            PhiConfig(gun["phi"][0], gun["phi"][1]),
             ParticleConfig(
-                args.gun_particles, acts.PdgParticle.eMuon, randomizeCharge=True
+                gun["particles"],
+                getattr(acts.PdgParticle, gun["pdg"]),
+                randomizeCharge=gun["randomizeCharge"],
             ),
             vtxGen=acts.examples.GaussianVertexGenerator(
                 mean=acts.Vector4(0, 0, 0, 0),
-                stddev=acts.Vector4(
-                    0.0125 * u.mm, 0.0125 * u.mm, 55.5 * u.mm, 1.0 * u.ns
-                ),
+                stddev=acts.Vector4(*gun["vertexStddev"]),
             ),
-            multiplicity=args.gun_multiplicity,
-            rnd=rnd,
+            multiplicity=gun["multiplicity"],
+            rnd=randomNumbers("generator"),
         )
     else:
-        addPythia8(
-            s,
-            hardProcess=["Top:qqbar2ttbar=on"],
-            npileup=args.ttbar_pu,
-            vtxGen=acts.examples.GaussianVertexGenerator(
-                mean=acts.Vector4(0, 0, 0, 0),
-                stddev=acts.Vector4(
-                    0.0125 * u.mm, 0.0125 * u.mm, 55.5 * u.mm, 5.0 * u.ns
+        if args.pu_library:
+            # hard scatter alone, the pile-up is sampled from the library
+            hardScatterDir = outputDir / "hard_scatter"
+            h = acts.examples.Sequencer(
+                events=args.events,
+                skip=args.skip,
+                numThreads=args.threads,
+                outputDir=str(outputDir),
+                trackFpes=False,
+            )
+            addPythia8(
+                h,
+                hardProcess=generator["ttbar"]["hardProcess"],
+                npileup=0,
+                vtxGen=beamSpot(),
+                rnd=randomNumbers("generator"),
+                outputDirCsv=hardScatterDir,
+            )
+            h.run()
+
+            overlay(
+                hardScatterDir,
+                args.pu_library,
+                outputDir / "generated",
+                mu=args.ttbar_pu,
+                vertex_stddev=pileupVertexStddev,
+                seed=pileupSeed(args.ttbar_pu),
+            )
+
+            s.addReader(
+                acts.examples.CsvParticleReader(
+                    level=acts.logging.INFO,
+                    inputDir=str(outputDir / "generated"),
+                    inputStem="particles",
+                    outputParticles="particles_generated",
+                )
+            )
+            addTruthVertexReader(s, outputDir / "generated")
+            s.addWhiteboardAlias("particles", "particles_generated")
+            if args.output_root:
+                # what addPythia8 writes for a generated event
+                s.addWriter(
+                    acts.examples.RootParticleWriter(
+                        level=acts.logging.INFO,
+                        inputParticles="particles_generated",
+                        filePath=str(outputDir / "particles.root"),
+                    )
+                )
+                s.addWriter(
+                    acts.examples.RootVertexWriter(
+                        level=acts.logging.INFO,
+                        inputVertices="vertices_truth",
+                        filePath=str(outputDir / "vertices.root"),
+                    )
+                )
+        else:
+            addPythia8(
+                s,
+                hardProcess=generator["ttbar"]["hardProcess"],
+                npileup=args.ttbar_pu,
+                vtxGen=acts.examples.GaussianVertexGenerator(
+                    mean=acts.Vector4(0, 0, 0, 0),
+                    stddev=acts.Vector4(*generator["ttbar"]["vertexStddev"]),
                 ),
-            ),
-            rnd=rnd,
-            outputDirRoot=outputDir if args.output_root else None,
-            outputDirCsv=outputDir if args.output_csv else None,
-        )
+                rnd=randomNumbers("generator"),
+                outputDirRoot=outputDir if args.output_root else None,
+                outputDirCsv=outputDir if args.output_csv else None,
+            )
 
-        addGenParticleSelection(
-            s,
-            ParticleSelectorConfig(
-                rho=(0.0, 24 * u.mm),
-                absZ=(0.0, 1.0 * u.m),
-                eta=(-3.0, 3.0),
-                pt=(150 * u.MeV, None),
-            ),
-        )
+        addGenParticleSelection(s, selection(generator["selection"]))
 
     if args.geant4:
         if s.config.numThreads != 1:
@@ -283,142 +856,37 @@ else:
             outputDirRoot=outputDir if args.output_root else None,
             outputDirCsv=outputDir if args.output_csv else None,
             outputDirObj=outputDir if args.output_obj else None,
-            rnd=rnd,
+            rnd=randomNumbers("simulation"),
             killVolume=trackingGeometry.highestTrackingVolume,
-            killAfterTime=25 * u.ns,
+            **simulation["geant4"],
         )
     else:
         addFatras(
             s,
             trackingGeometry,
             field,
-            enableInteractions=True,
             outputDirRoot=outputDir if args.output_root else None,
             outputDirCsv=outputDir if args.output_csv else None,
             outputDirObj=outputDir if args.output_obj else None,
-            rnd=rnd,
-        )
-
-addDigitization(
-    s,
-    trackingGeometry,
-    field,
-    digiConfigFile=oddDigiConfig,
-    outputDirRoot=outputDir if args.output_root else None,
-    outputDirCsv=outputDir if args.output_csv else None,
-    rnd=rnd,
-)
-
-addDigiParticleSelection(
-    s,
-    ParticleSelectorConfig(
-        pt=(1.0 * u.GeV, None),
-        eta=(-3.0, 3.0),
-        measurements=(9, None),
-        removeNeutral=True,
-    ),
-)
-
-if args.reco:
-    addSeeding(
-        s,
-        trackingGeometry,
-        field,
-        initialSigmas=[
-            1 * u.mm,
-            1 * u.mm,
-            1 * u.degree,
-            1 * u.degree,
-            0.1 * u.e / u.GeV,
-            1 * u.ns,
-        ],
-        initialSigmaPtRel=0.1,
-        initialVarInflation=[1.0] * 6,
-        geoSelectionConfigFile=oddSeedingSel,
-        outputDirRoot=outputDir if args.output_root else None,
-        outputDirCsv=outputDir if args.output_csv else None,
-    )
-
-    if seedFilter_ML:
-        addSeedFilterML(
-            s,
-            SeedFilterMLDBScanConfig(
-                epsilonDBScan=0.03, minPointsDBScan=2, minSeedScore=0.1
-            ),
-            onnxModelFile=os.path.dirname(__file__)
-            + "/MLAmbiguityResolution/seedDuplicateClassifier.onnx",
-            outputDirRoot=outputDir if args.output_root else None,
-            outputDirCsv=outputDir if args.output_csv else None,
+            rnd=randomNumbers("simulation"),
+            **simulation["fatras"],
         )
 
-    addCKFTracks(
-        s,
-        trackingGeometry,
-        field,
-        TrackSelectorConfig(
-            pt=(1.0 * u.GeV if args.ttbar else 0.0, None),
-            absEta=(None, 3.0),
-            loc0=(-4.0 * u.mm, 4.0 * u.mm),
-            nMeasurementsMin=7,
-            maxHoles=2,
-            maxOutliers=2,
-        ),
-        CkfConfig(
-            chi2CutOffMeasurement=15.0,
-            chi2CutOffOutlier=25.0,
-            numMeasurementsCutOff=10,
-            seedDeduplication=True,
-            stayOnSeed=True,
-            pixelVolumes=[16, 17, 18],
-            stripVolumes=[23, 24, 25],
-            maxPixelHoles=1,
-            maxStripHoles=2,
-            constrainToVolumes=[
-                2,  # beam pipe
-                32,
-                4,  # beam pip gap
-                16,
-                17,
-                18,  # pixel
-                20,  # PST
-                23,
-                24,
-                25,  # short strip
-                26,
-                8,  # long strip gap
-                28,
-                29,
-                30,  # long strip
-            ],
-        ),
-        outputDirRoot=outputDir if args.output_root else None,
-#        outputDirCsv=outputDir if args.output_csv else None,
-        writeCovMat=True,
-    )
-
-    if ambi_ML:
+def addResolution(s, outputDir, solver):
+    """Ambiguity resolution with `solver`, track parameters and vertexing."""
+    if solver == "ML":
         addAmbiguityResolutionML(
             s,
-            AmbiguityResolutionMLConfig(
-                maximumSharedHits=3, maximumIterations=1000000, nMeasurementsMin=7
-            ),
+            AmbiguityResolutionMLConfig(**ambiguity["ML"]["config"]),
             outputDirRoot=outputDir if args.output_root else None,
             outputDirCsv=outputDir if args.output_csv else None,
-            onnxModelFile=os.path.dirname(__file__)
-            + "/MLAmbiguityResolution/duplicateClassifier.onnx",
+            onnxModelFile=str(ambiModel),
         )
 
-    elif ambi_scoring:
+    elif solver == "scoring":
         addScoreBasedAmbiguityResolution(
             s,
-            ScoreBasedAmbiguityResolutionConfig(
-                minScore=0,
-                minScoreSharedTracks=1,
-                maxShared=2,
-                minUnshared=3,
-                maxSharedTracksPerMeasurement=2,
-                useAmbiguityScoring=False,
-            ),
+            ScoreBasedAmbiguityResolutionConfig(**ambiguity["scoring"]["config"]),
             outputDirRoot=outputDir if args.output_root else None,
             outputDirCsv=outputDir if args.output_csv else None,
             ambiVolumeFile=ambi_config,
@@ -427,9 +895,7 @@ if args.reco:
     else:
         addAmbiguityResolution(
             s,
-            AmbiguityResolutionConfig(
-                maximumSharedHits=3, maximumIterations=1000000, nMeasurementsMin=7
-            ),
+            AmbiguityResolutionConfig(**ambiguity["greedy"]["config"]),
             outputDirRoot=outputDir if args.output_root else None,
             outputDirCsv=outputDir if args.output_csv else None,
             writeCovMat=True,
@@ -441,60 +907,169 @@ if args.reco:
             outputTrackParameters="track_parameters",
         )
     )
-    addVertexFitting(
-        s,
-        field,
-        trackParameters="track_parameters",
-        outputProtoVertices="tvf_protovertices",
-        outputVertices="tvf_fittedVertices",
-        vertexFinder=VertexFinder.Truth,
-        outputDirRoot=outputDir / "vertex_tvf",
-    )
+    if "vertexing" not in runStages:
+        return
 
-    addVertexFitting(
-        s,
-        field,
-        trackParameters="track_parameters",
-        outputProtoVertices="ivf_protovertices",
-        outputVertices="ivf_fittedVertices",
-        vertexFinder=VertexFinder.Iterative,
-        outputDirRoot=outputDir / "vertex_ivf",
-    )
+    vertexFinders = {
+        "tvf": dict(vertexFinder=VertexFinder.Truth),
+        "ivf": dict(vertexFinder=VertexFinder.Iterative),
+        "amvf_gauss": dict(
+            seeder=acts.VertexSeedFinder.GaussianSeeder,
+            useTime=False,
+            vertexFinder=VertexFinder.AMVF,
+        ),
+        "amvf_truth_notime": dict(
+            seeder=acts.VertexSeedFinder.TruthSeeder,
+            useTime=False,
+            vertexFinder=VertexFinder.AMVF,
+        ),
+        "amvf_truth_time": dict(
+            seeder=acts.VertexSeedFinder.TruthSeeder,
+            useTime=True,
+            vertexFinder=VertexFinder.AMVF,
+        ),
+    }
+    for name in spec["vertexing"]["finders"]:
+        addVertexFitting(
+            s,
+            field,
+            trackParameters="track_parameters",
+            outputProtoVertices=f"{name}_protovertices",
+            outputVertices=f"{name}_fittedVertices",
+            outputDirRoot=outputDir / f"vertex_{name}",
+            **vertexFinders[name],
+        )
 
-    addVertexFitting(
-        s,
-        field,
-        trackParameters="track_parameters",
-        outputProtoVertices="amvf_gauss_protovertices",
-        outputVertices="amvf_gauss_fittedVertices",
-        seeder=acts.VertexSeedFinder.GaussianSeeder,
-        useTime=False,
-        vertexFinder=VertexFinder.AMVF,
-        outputDirRoot=outputDir / "vertex_amvf_gauss",
-    )
 
-    addVertexFitting(
+def addDigiReco(s, outputDir):
+    addDigitization(
         s,
+        trackingGeometry,
         field,
-        trackParameters="track_parameters",
-        outputProtoVertices="amvf_truth_notime_protovertices",
-        outputVertices="amvf_truth_notime_fittedVertices",
-        seeder=acts.VertexSeedFinder.TruthSeeder,
-        useTime=False,
-        vertexFinder=VertexFinder.AMVF,
-        outputDirRoot=outputDir / "vertex_amvf_truth_notime",
+        digiConfigFile=oddDigiConfig,
+        outputDirRoot=outputDir if args.output_root else None,
+        outputDirCsv=outputDir if args.output_csv else None,
+        rnd=randomNumbers("digitization"),
     )
 
-    addVertexFitting(
+    addDigiParticleSelection(s, selection(spec["digitization"]["selection"]))
+
+    if args.reco:
+        seedingParameters = dict(spec["seeding"]["parameters"])
+        if "particleHypothesis" in seedingParameters:
+            seedingParameters["particleHypothesis"] = getattr(
+                acts.ParticleHypothesis, seedingParameters["particleHypothesis"]
+            )
+        addSeeding(
+            s,
+            trackingGeometry,
+            field,
+            geoSelectionConfigFile=oddSeedingSel,
+            outputDirRoot=outputDir if args.output_root else None,
+            outputDirCsv=outputDir if args.output_csv else None,
+            **seedingParameters,
+        )
+
+        if seedFilter_ML:
+            addSeedFilterML(
+                s,
+                SeedFilterMLDBScanConfig(**spec["seeding"]["mlSeedFilter"]["config"]),
+                onnxModelFile=str(seedFilterModel),
+                outputDirRoot=outputDir if args.output_root else None,
+                outputDirCsv=outputDir if args.output_csv else None,
+            )
+        if "ckf" not in runStages:
+            return
+
+        addCKFTracks(
+            s,
+            trackingGeometry,
+            field,
+            TrackSelectorConfig(
+                **{
+                    k: tuple(v) if isinstance(v, list) else v
+                    for k, v in spec["ckf"]["selector"].items()
+                }
+            ),
+            CkfConfig(**spec["ckf"]["config"]),
+            outputDirRoot=outputDir if args.output_root else None,
+#        outputDirCsv=outputDir if args.output_csv else None,
+            writeCovMat=True,
+        )
+        if "ambiguity" not in runStages:
+            return
+
+        if args.ambi_solver == "all":
+            # one CKF, every solver on its own scoped copy of the tracks
+            for solver in ambiguity_solvers:
+                with ScopedSequencer(s, solver) as scope:
+                    addResolution(scope, outputDir / f"ambi_{solver}", solver)
+        else:
+            addResolution(s, outputDir, args.ambi_solver)
+
+
+if args.pu_scan:
+    for pu in args.pu_scan:
+        puDir = args.output / f"ttbar_pu{pu}"
+        overlay(
+            outputDir / "hard_scatter",
+            args.pu_hit_library,
+            puDir / "simulated",
+            mu=pu,
+            vertex_stddev=pileupVertexStddev,
+            seed=pileupSeed(pu),
+        )
+        with ScopedSequencer(s, f"pu{pu}") as scope:
+            addOverlayReaders(scope, puDir / "simulated")
+            addDigiReco(scope, puDir)
+else:
+    addDigiReco(s, outputDir)
+
+# in a PU scan every level writes to its own directory
+runOutputDirs = (
+    [args.output / f"ttbar_pu{pu}" for pu in args.pu_scan]
+    if args.pu_scan
+    else [outputDir]
+)
+
+if telemetry:
+    with Telemetry(
         s,
-        field,
-        trackParameters="track_parameters",
-        outputProtoVertices="amvf_truth_time_protovertices",
-        outputVertices="amvf_truth_time_fittedVertices",
-        seeder=acts.VertexSeedFinder.TruthSeeder,
-        useTime=True,
-        vertexFinder=VertexFinder.AMVF,
-        outputDirRoot=outputDir / "vertex_amvf_truth_time",
-    )
+        runOutputDirs,
+        path=args.telemetry,
+        format=args.telemetry_format,
+        interval=args.telemetry_interval,
+        port=args.telemetry_port,
+    ):
+        s.run()
+else:
+    s.run()
 
-s.run()
+for directory in runOutputDirs:
+    if "vertexing" in runStages:
+        summarize_outputs(directory, keep_ntuples=args.vertex_ntuples)
+    if args.output_root:
+        compact_outputs(directory, args.cov_layout, args.cov_float32)
+        compress_outputs(directory, compression)
+
+if args.pu_scan:
+    for pu in args.pu_scan:
+        puSpec = copy.deepcopy(spec)
+        puSpec["generator"]["ttbar"]["pileup"] = pu
+        puHashes = stage_hashes(puSpec, stageFiles)
+        write_manifest(
+            args.output / f"ttbar_pu{pu}",
+            puSpec,
+            {stage: puHashes[stage] for stage in runStages},
+        )
+else:
+    write_manifest(
+        outputDir,
+        spec,
+        hashes,
+        stage_dirs=(
+            {"generator": simulationDir, "simulation": simulationDir}
+            if simulationDir is not None
+            else None
+        ),
+    )
@@ -0,0 +1,5 @@
+"""Shared helpers for the ODD full chain vertexing analysis.
+
+Submodules are kept free of heavy imports at package level so that the
+``odd-analysis`` command line stays fast to start.
+"""
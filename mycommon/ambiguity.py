@@ -0,0 +1,116 @@
+"""Paired comparison of the ambiguity solvers of a `--ambi-solver all` run.
+
+Every solver ran on the same CKF tracks of the same events and wrote to
+`<output>/ambi_<solver>`. Per event and solver this counts the tracks,
+the fakes (less than half of the measurements from the majority
+particle), the particles found and the duplicates, and the reconstructed
+vertices of every finder. The differences to the reference solver are
+taken event by event. Solver times come from the `timing.tsv` of the run.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .benchmark import read_timing
+from .tracksummary import read_tracks
+from .vertexing import read_events
+
+# timing.tsv identifiers containing these are the solver algorithms
+solver_algorithms = {
+    "greedy": "Greedy",
+    "scoring": "ScoreBased",
+    "ML": "AmbiguityResolutionML",
+}
+
+truth_match_min = 0.5
+
+
+def track_counts(path):
+    tracks = read_tracks(path, ["nMeasurements", "nMajorityHits", "majorityParticleId"])
+    matched = tracks["nMajorityHits"] >= truth_match_min * tracks["nMeasurements"]
+    frame = pd.DataFrame(
+        {
+            "event_nr": tracks["event_nr"],
+            "fake": ~matched,
+            "particle": np.where(matched, tracks["majorityParticleId"], 0),
+        }
+    )
+    per_event = frame.groupby("event_nr")
+    counts = pd.DataFrame(
+        {
+            "tracks": per_event.size(),
+            "fakes": per_event["fake"].sum(),
+            "found": frame[~frame["fake"]].groupby("event_nr")["particle"].nunique(),
+        }
+    ).fillna(0)
+    counts["duplicates"] = counts["tracks"] - counts["fakes"] - counts["found"]
+    return counts
+
+
+def solver_table(directory):
+    """Per-event counts of one solver branch."""
+    directory = Path(directory)
+    table = track_counts(next(directory.glob("tracksummary_*.root")))
+    for path in sorted(directory.glob("vertex_*/performance_vertexing.root")):
+        events = read_events(path, ["nRecoVtx"])
+        finder = path.parent.name[len("vertex_") :]
+        table[f"vertices_{finder}"] = pd.Series(
+            events["nRecoVtx"], index=events["event_nr"]
+        )
+    return table
+
+
+def run(args):
+    directory = Path(args.input)
+    branches = {
+        path.name[len("ambi_") :]: path for path in sorted(directory.glob("ambi_*"))
+    }
+    if args.reference not in branches:
+        raise SystemExit(f"no ambi_{args.reference} in {directory}")
+
+    tables = {solver: solver_table(path) for solver, path in branches.items()}
+    timing = read_timing(directory / "timing.tsv")
+    events = len(tables[args.reference])
+
+    reference = tables[args.reference]
+    rows = []
+    for solver, table in tables.items():
+        seconds = sum(
+            s
+            for identifier, s in timing.items()
+            if solver_algorithms.get(solver, solver) in identifier
+        )
+        row = {"solver": solver, "ms_per_event": 1e3 * seconds / events}
+        for column in table.columns:
+            row[column] = table[column].mean()
+            if solver != args.reference:
+                diff = (table[column] - reference[column]).dropna()
+                row[f"d_{column}"] = diff.mean()
+                row[f"d_{column}_err"] = diff.std() / np.sqrt(max(len(diff), 1))
+        rows.append(row)
+
+    summary = pd.DataFrame(rows).set_index("solver")
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(f"{events} events, differences per event to {args.reference}")
+        print(summary.T.to_string(float_format=lambda x: f"{x:.3f}"))
+
+    if args.output:
+        import matplotlib.pyplot as plt
+
+        columns = [c for c in reference.columns if c != "tracks"]
+        fig = plt.figure("Ambiguity solvers", figsize=(4 * len(columns), 4))
+        for ax, column in zip(fig.subplots(1, len(columns)), columns):
+            for solver, table in tables.items():
+                if solver == args.reference:
+                    continue
+                ax.hist(
+                    (table[column] - reference[column]).dropna(),
+                    bins=30,
+                    histtype="step",
+                    label=f"{solver} - {args.reference}",
+                )
+            ax.set_xlabel(f"{column} per event")
+            ax.legend(fontsize="small")
+        fig.savefig(args.output)
@@ -0,0 +1,183 @@
+"""Thread and process scaling of the full chain.
+
+Runs `full_chain_odd.py` on the same seeded events for every configuration
+of processes x threads. The processes split the event range with `--skip`
+and `--events` and run side by side. Per configuration it records the
+throughput over the wall time, the per-stage times from the ACTS
+`timing.tsv` of every process, the CPU time and the peak RSS of every
+process from `wait4`, so nothing beyond the standard library is needed to
+measure.
+"""
+
+import os
+import csv
+import json
+import time
+import subprocess
+import sys
+from pathlib import Path
+
+
+def parse_split(value):
+    """`"4x16"` to `(4, 16)`."""
+    processes, _, threads = value.partition("x")
+    return int(processes), int(threads)
+
+
+def read_timing(path):
+    """`{identifier: total seconds}` from an ACTS sequencer timing file."""
+    with open(path) as f:
+        return {
+            row["identifier"]: float(row["time_total_s"])
+            for row in csv.DictReader(f, delimiter="\t")
+        }
+
+
+def run_config(command, processes, threads, first, events, directory):
+    """Run one configuration and return its measurements."""
+    per_process = [events // processes] * processes
+    for i in range(events % processes):
+        per_process[i] += 1
+
+    start = time.perf_counter()
+    running = {}
+    skip = first
+    for i, n in enumerate(per_process):
+        output = Path(directory) / f"process{i}"
+        popen = subprocess.Popen(
+            [
+                *command,
+                "--threads",
+                str(threads),
+                "--skip",
+                str(skip),
+                "--events",
+                str(n),
+                "--output",
+                str(output),
+                "--force",
+            ],
+            stdout=subprocess.DEVNULL,
+        )
+        running[popen.pid] = output
+        skip += n
+
+    cpu = 0.0
+    peak_rss = []
+    while running:
+        pid, status, usage = os.wait4(-1, 0)
+        if pid not in running:
+            continue
+        output = running.pop(pid)
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise RuntimeError(f"chain in {output} failed with status {status}")
+        cpu += usage.ru_utime + usage.ru_stime
+        peak_rss.append(usage.ru_maxrss * 1024)
+    wall = time.perf_counter() - start
+
+    stages = {}
+    for timing in Path(directory).rglob("timing.tsv"):
+        for identifier, seconds in read_timing(timing).items():
+            stages[identifier] = stages.get(identifier, 0.0) + seconds
+
+    return {
+        "processes": processes,
+        "threads": threads,
+        "events": events,
+        "wall_s": wall,
+        "events_per_s": events / wall,
+        "cpu_s": cpu,
+        "cpu_cores_used": cpu / wall,
+        "cpu_utilization": cpu / wall / (processes * threads),
+        "peak_rss_bytes": sum(peak_rss),
+        "stage_time_s": stages,
+    }
+
+
+def recommend(records, max_memory=None):
+    """Fastest configuration, if given fitting into `max_memory` bytes."""
+    candidates = [
+        r for r in records if max_memory is None or r["peak_rss_bytes"] <= max_memory
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda r: r["events_per_s"])
+
+
+def plot(records, output):
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure("Full chain scaling", figsize=(12, 5))
+    ax_rate, ax_memory = fig.subplots(1, 2)
+
+    for processes in sorted({r["processes"] for r in records}):
+        selected = sorted(
+            (r for r in records if r["processes"] == processes),
+            key=lambda r: r["threads"],
+        )
+        cores = [r["processes"] * r["threads"] for r in selected]
+        ax_rate.plot(
+            cores,
+            [r["events_per_s"] for r in selected],
+            marker="o",
+            label=f"{processes} process{'es' if processes > 1 else ''}",
+        )
+        ax_memory.plot(cores, [r["peak_rss_bytes"] / 1e9 for r in selected], marker="o")
+
+    ax_rate.set_xscale("log", base=2)
+    ax_rate.set_xlabel("processes x threads")
+    ax_rate.set_ylabel("events / s")
+    ax_rate.legend()
+    ax_rate.grid()
+
+    ax_memory.set_xscale("log", base=2)
+    ax_memory.set_xlabel("processes x threads")
+    ax_memory.set_ylabel("peak RSS (sum over processes) [GB]")
+    ax_memory.grid()
+
+    fig.savefig(output)
+
+
+def run(args):
+    command = [sys.executable, str(args.chain), *args.chain_args]
+    configs = [(1, threads) for threads in args.threads]
+    configs += [parse_split(split) for split in args.splits]
+
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+    results = args.work_dir / "benchmark.jsonl"
+    records = []
+    for processes, threads in configs:
+        print(f"{processes} x {threads} threads ...", flush=True)
+        record = run_config(
+            command,
+            processes,
+            threads,
+            args.skip,
+            args.events,
+            args.work_dir / f"p{processes}_t{threads}",
+        )
+        record["host"] = os.uname().nodename
+        record["host_cpus"] = os.cpu_count()
+        records.append(record)
+        with open(results, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+        print(
+            f"  {record['events_per_s']:8.3f} events/s  "
+            f"{record['cpu_utilization']:6.1%} CPU  "
+            f"{record['peak_rss_bytes'] / 1e9:6.2f} GB"
+        )
+
+    best = recommend(
+        records, args.max_memory * 1e9 if args.max_memory is not None else None
+    )
+    if best is None:
+        print("No configuration fits into the memory limit")
+    else:
+        print(
+            f"Recommended on {best['host']} ({best['host_cpus']} CPUs): "
+            f"{best['processes']} processes x {best['threads']} threads, "
+            f"{best['events_per_s']:.3f} events/s"
+        )
+
+    plot(records, args.output or args.work_dir / "scaling.png")
@@ -0,0 +1,43 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+
+default_cache_dir = Path(
+    os.environ.get("ODD_ANALYSIS_CACHE", Path.home() / ".cache" / "odd-analysis")
+)
+
+
+def summary_key(input, spec):
+    """Key a summary by the input file identity and what was computed from it."""
+    stat = os.stat(input)
+    payload = json.dumps(
+        [str(Path(input).resolve()), stat.st_size, stat.st_mtime_ns, spec],
+        sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def cached_summary(input, spec, compute, cache_dir=default_cache_dir):
+    """Return `compute(input)`, reusing a previous result stored in `cache_dir`.
+
+    `compute` must return something JSON serializable. Pass `cache_dir=None`
+    to always recompute.
+    """
+    if cache_dir is None:
+        return compute(input)
+
+    path = Path(cache_dir) / f"{summary_key(input, spec)}.json"
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+
+    summary = compute(input)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(summary, f)
+    os.replace(tmp, path)
+
+    return summary
@@ -0,0 +1,55 @@
+from pathlib import Path
+
+from .labels import get_event_details
+
+
+def find_outputs(root, pattern="*.root"):
+    """Yield a record for every chain output below `root`.
+
+    The event label (e.g. `ttbar_pu200`) is taken from the closest parent
+    directory that `get_event_details` understands, the stage from the
+    directory the file lives in.
+    """
+    root = Path(root)
+    for path in sorted(root.rglob(pattern)):
+        event_label, event_type, details = None, None, {}
+        for parent in path.parents:
+            parsed = get_event_details(parent.name)
+            if parsed is not None:
+                event_label = parent.name
+                event_type, details = parsed
+                break
+            if parent == root:
+                break
+
+        yield {
+            "event_label": event_label,
+            "event_type": event_type,
+            "pu": details.get("pu"),
+            "stage": path.parent.name,
+            "file": path.name,
+            "path": str(path),
+            "size": path.stat().st_size,
+        }
+
+
+def run(args):
+    outputs = [
+        output
+        for output in find_outputs(args.root, args.pattern)
+        if (args.stage is None or output["stage"] == args.stage)
+        and (args.file is None or output["file"] == args.file)
+    ]
+    outputs.sort(key=lambda o: (o["stage"], o["file"], o["pu"] or -1, o["path"]))
+
+    if args.paths:
+        for output in outputs:
+            print(output["path"])
+        return
+
+    for output in outputs:
+        pu = "-" if output["pu"] is None else output["pu"]
+        print(
+            f"{pu:>5} {output['stage']:<28} {output['file']:<32} "
+            f"{output['size'] / 1e6:>10.1f} MB  {output['path']}"
+        )
@@ -0,0 +1,226 @@
+"""Declarative configuration of the full chain and stage hashing.
+
+A chain spec is a YAML or JSON document with one block per stage (see
+`stages`), layered over `configs/full_chain_odd.yaml`. Quantities are
+written as `"<value> <unit>"` and converted with the unit constants the
+caller passes in, usually `acts.UnitConstants`, so this module does not
+need acts.
+
+Every stage gets a content hash of its own block chained with the hash of
+the stage before it, so equal hashes mean equal configuration of the
+stage and everything upstream. Finished runs leave a manifest with these
+hashes in their output directory, which later runs use to find results
+they can reuse instead of recomputing.
+"""
+
+import os
+import re
+import json
+import copy
+import hashlib
+from pathlib import Path
+
+stages = [
+    "generator",
+    "simulation",
+    "digitization",
+    "seeding",
+    "ckf",
+    "ambiguity",
+    "vertexing",
+]
+
+# blocks choosing one of several alternative sub-blocks, only the chosen one
+# is part of the hash
+ambiguity_solvers = ["greedy", "scoring", "ML"]
+
+# "all" runs every alternative side by side
+_alternatives = {
+    "generator": ("type", ["gun", "ttbar"]),
+    "simulation": ("engine", ["fatras", "geant4"]),
+    "ambiguity": ("solver", ambiguity_solvers),
+}
+
+manifest_name = "chain_manifest.json"
+
+default_spec_path = (
+    Path(__file__).resolve().parent.parent / "configs/full_chain_odd.yaml"
+)
+
+# "<number> <unit>[*/<unit>...]", e.g. "0.1 e/GeV"
+_quantity = re.compile(
+    r"^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)"
+    r"\s+([A-Za-z_]+(?:\s*[*/]\s*[A-Za-z_]+)*)\s*$"
+)
+
+
+def merge(base, override):
+    """Recursively merge `override` into a copy of `base`."""
+    result = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = merge(result[key], value)
+        else:
+            result[key] = copy.deepcopy(value)
+    return result
+
+
+def _read(path):
+    path = Path(path)
+    with open(path) as f:
+        if path.suffix in (".yaml", ".yml"):
+            import yaml
+
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+def load_spec(path=None):
+    """Load a spec, layered over the default one unless it is the default."""
+    spec = _read(default_spec_path)
+    if path is not None and Path(path).resolve() != default_spec_path:
+        spec = merge(spec, _read(path))
+    return spec
+
+
+def quantity(value, units):
+    """`"150 MeV"` to `150 * units.MeV`, other values are returned as is."""
+    if not isinstance(value, str):
+        return value
+    match = _quantity.match(value)
+    if match is None:
+        return value
+
+    number, unit = match.groups()
+    result = float(number)
+    for op, name in re.findall(r"(^|[*/])\s*([A-Za-z_]+)", unit):
+        if not hasattr(units, name):
+            return value
+        factor = getattr(units, name)
+        result = result / factor if op == "/" else result * factor
+    return result
+
+
+def convert(spec, units):
+    """Copy of `spec` with all quantities converted to numbers."""
+    if isinstance(spec, dict):
+        return {key: convert(value, units) for key, value in spec.items()}
+    if isinstance(spec, list):
+        return [convert(value, units) for value in spec]
+    return quantity(spec, units)
+
+
+def stage_content(spec, stage):
+    block = copy.deepcopy(spec.get(stage, {}))
+    if stage in _alternatives:
+        key, choices = _alternatives[stage]
+        for choice in choices:
+            if block.get(key) not in (choice, "all"):
+                block.pop(choice, None)
+    if stage == "generator":
+        block["run"] = spec.get("run", {})
+    return block
+
+
+def file_identity(path):
+    """Content hash of small files, size and mtime of large ones."""
+    stat = os.stat(path)
+    if stat.st_size > 50 * 1024**2:
+        return [str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns]
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def stage_hashes(spec, files=None):
+    """Chained content hash per stage.
+
+    `files` maps a stage to the external files it reads (digitization
+    config, material map, ONNX models, ...), which become part of its hash.
+    """
+    files = files or {}
+    hashes = {}
+    previous = ""
+    for stage in stages:
+        payload = {
+            "previous": previous,
+            "config": stage_content(spec, stage),
+            "files": [
+                file_identity(path) for path in files.get(stage, []) if path is not None
+            ],
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        previous = hashes[stage] = hashlib.sha256(encoded).hexdigest()[:16]
+    return hashes
+
+
+def read_manifest(directory):
+    path = Path(directory) / manifest_name
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(directory, spec, hashes, stage_dirs=None):
+    """Record the spec, stage hashes and output files of a finished run.
+
+    `hashes` holds the stages that ran, `stage_dirs` the directories of
+    stages whose outputs were reused from elsewhere.
+    """
+    directory = Path(directory)
+    stage_dirs = stage_dirs or {}
+    manifest = {
+        "spec": spec,
+        "stages": {
+            stage: {
+                "hash": hashes[stage],
+                "dir": str(Path(stage_dirs.get(stage, directory)).resolve()),
+            }
+            for stage in hashes
+        },
+        "files": {
+            str(path.relative_to(directory)): path.stat().st_size
+            for path in sorted(directory.rglob("*"))
+            if path.is_file() and path.name != manifest_name
+        },
+    }
+    tmp = directory / f"{manifest_name}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp, directory / manifest_name)
+
+
+def _files_present(directory, manifest):
+    return all(
+        (Path(directory) / name).exists()
+        and (Path(directory) / name).stat().st_size == size
+        for name, size in manifest["files"].items()
+    )
+
+
+def find_reusable(hashes, directories):
+    """Stages of an earlier run with equal hashes, and where their outputs are.
+
+    `hashes` holds the stages of this run, a leading part of `stages`.
+    Returns `{stage: directory}` for the longest run of leading stages
+    whose hashes match the manifest of one of `directories` and whose
+    output files are unchanged; empty if there is none.
+    """
+    best = {}
+    for directory in directories:
+        manifest = read_manifest(directory)
+        if manifest is None or not _files_present(directory, manifest):
+            continue
+
+        matched = {}
+        for stage in stages:
+            # the manifest may come from a run with more stages than this one
+            if stage not in hashes:
+                break
+            record = manifest["stages"].get(stage)
+            if record is None or record["hash"] != hashes[stage]:
+                break
+            matched[stage] = record["dir"]
+        if len(matched) > len(best):
+            best = matched
+    return best
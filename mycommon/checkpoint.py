@@ -0,0 +1,196 @@
+"""Event-range checkpoints for long full chain runs.
+
+ACTS writers only finalize their files when the sequencer ends, so a job
+dying at event 870 of 1000 leaves nothing usable. `run_chunks` splits the
+event range into chunks, runs each as its own process with `--skip` and
+`--events` (the per-event random seeds only depend on the event number,
+so the events are the same as in one long run) and records a chunk in
+`checkpoint.json` only once its process finished and all its files are
+closed. On `--resume` the missing ranges are worked out from the record and
+only those run; `merge_chunks` then joins all chunks into the usual
+output layout.
+"""
+
+import os
+import sys
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+checkpoint_name = "checkpoint.json"
+
+
+def merge_ranges(ranges):
+    """Sorted, non-overlapping `[start, stop)` ranges covering `ranges`."""
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return merged
+
+
+def missing_ranges(first, stop, completed, chunk):
+    """Chunks of at most `chunk` events of `[first, stop)` not in `completed`."""
+    missing = []
+    position = first
+    for done_start, done_stop in merge_ranges(completed) + [[stop, stop]]:
+        while position < min(done_start, stop):
+            end = min(position + chunk, done_start, stop)
+            missing.append((position, end))
+            position = end
+        position = max(position, done_stop)
+    return missing
+
+
+def chunk_dir(output, start, stop, kind="chunks"):
+    return Path(output) / kind / f"{start:06d}-{stop:06d}"
+
+
+def event_ranges(events):
+    """Contiguous `[start, stop)` ranges covering the event numbers."""
+    ranges = []
+    for event in sorted(set(events)):
+        if ranges and ranges[-1][1] == event:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([event, event + 1])
+    return ranges
+
+
+def read_event_list(path):
+    """Event numbers from a file, one per line, `#` starts a comment."""
+    with open(path) as f:
+        lines = (line.partition("#")[0].strip() for line in f)
+        return [int(line) for line in lines if line]
+
+
+def run_range(command, directory, start, stop):
+    """Run `command` on the events `[start, stop)` writing to `directory`."""
+    subprocess.run(
+        [
+            *command,
+            "--skip",
+            str(start),
+            "--events",
+            str(stop - start),
+            "--output",
+            str(directory),
+        ],
+        check=True,
+    )
+
+
+def run_event_list(command, output, events):
+    """Run `command` on an explicit list of event numbers.
+
+    Every contiguous range is a run of its own with `--skip` and `--events`,
+    so each event is processed with the same random numbers as in the run
+    it comes from. Returns the run directories in event order.
+    """
+    directories = []
+    for start, stop in event_ranges(events):
+        directory = chunk_dir(output, start, stop, kind="events")
+        shutil.rmtree(directory, ignore_errors=True)
+        run_range(command, directory, start, stop)
+        directories.append(directory)
+    return directories
+
+
+def read_checkpoint(output):
+    path = Path(output) / checkpoint_name
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_checkpoint(output, state):
+    path = Path(output) / checkpoint_name
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def run_chunks(command, output, first, events, chunk, key, resume=False):
+    """Run `command` once per missing chunk of `[first, first + events)`.
+
+    `command` gets `--skip`, `--events` and `--output` appended, later
+    occurrences of an option win with argparse. `key` identifies the
+    configuration (e.g. the last stage hash); resuming a checkpoint of a
+    different configuration is refused. Returns the directories of all
+    completed chunks in event order.
+    """
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    stop = first + events
+
+    state = read_checkpoint(output) if resume else None
+    if state is not None and (state["key"], state["first"], state["stop"]) != (
+        key,
+        first,
+        stop,
+    ):
+        raise ValueError(
+            f"{output / checkpoint_name} was written for a different configuration "
+            f"or event range, run without --resume to start over"
+        )
+    if state is None:
+        shutil.rmtree(output / "chunks", ignore_errors=True)
+        state = dict(key=key, first=first, stop=stop, chunks=[])
+        write_checkpoint(output, state)
+
+    # leftovers of chunks that died, their files were never closed
+    completed = {chunk_dir(output, *c) for c in state["chunks"]}
+    if (output / "chunks").exists():
+        for directory in (output / "chunks").iterdir():
+            if directory not in completed:
+                shutil.rmtree(directory)
+
+    todo = missing_ranges(first, stop, state["chunks"], chunk)
+    if state["chunks"]:
+        print(f"Resuming, missing events: {todo}")
+
+    for start, end in todo:
+        run_range(command, chunk_dir(output, start, end), start, end)
+
+        state["chunks"] = sorted(state["chunks"] + [[start, end]])
+        write_checkpoint(output, state)
+
+    return [chunk_dir(output, *c) for c in state["chunks"]]
+
+
+def merge_chunks(chunk_dirs, output):
+    """Join equally named ROOT files of all chunks into `output` with hadd.
+
+    Without ROOT the chunk files are left where they are, uproot reads them
+    together with `uproot.concatenate`.
+    """
+    hadd = shutil.which("hadd")
+    if hadd is None:
+        print("hadd not found, not merging chunks:", *chunk_dirs, sep="\n  ")
+        return False
+
+    names = sorted(
+        {
+            str(path.relative_to(directory))
+            for directory in chunk_dirs
+            for path in directory.rglob("*.root")
+        }
+    )
+    for name in names:
+        inputs = [str(d / name) for d in chunk_dirs if (d / name).exists()]
+        target = Path(output) / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        subprocess.run([hadd, "-f", str(target), *inputs], check=True)
+    return True
+
+
+def chunk_command(script):
+    """Command line rerunning `script` with the arguments of this process."""
+    return [sys.executable, str(script), *sys.argv[1:]]
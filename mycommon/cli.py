@@ -0,0 +1,562 @@
+"""Single entry point for the vertexing analysis plots.
+
+Only argparse and the standard library are imported here. The module
+implementing a subcommand (and with it uproot, pandas, scipy or matplotlib)
+is imported once that subcommand runs, so `--help` and `catalog` start
+instantly.
+"""
+
+import sys
+import argparse
+import importlib
+import pathlib
+
+from .cache import default_cache_dir
+
+# fit results only the double Gaussian model of track-resolution has
+double_gauss_quantities = ["sigma_tail", "fraction_core", "sigma_eff"]
+
+
+def add_output(parser):
+    parser.add_argument("--output", help="save the figure instead of showing it")
+
+
+def add_chain_args(parser):
+    """Options after `--` are passed on to the chain, see `main`."""
+    parser.epilog = "Options after -- are passed on to the chain, e.g. -- --ttbar"
+    parser.set_defaults(chain_args=[])
+
+
+def add_cache(parser):
+    parser.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        default=default_cache_dir,
+        help="directory for per-input summaries (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="cache_dir",
+        action="store_const",
+        const=None,
+        help="always recompute summaries from the inputs",
+    )
+
+
+def add_finder_inputs(parser, required=True):
+    parser.add_argument(
+        "--inputs-tvf", required=required, nargs="+", help="input files truth finder"
+    )
+    parser.add_argument(
+        "--inputs-wot", required=required, nargs="+", help="input files without time"
+    )
+    parser.add_argument(
+        "--inputs-wt", required=required, nargs="+", help="input files with time"
+    )
+
+
+def add_residuals_pulls(subparsers, command, mode):
+    parser = subparsers.add_parser(
+        command,
+        help=f"vertex {command} of the HS vertex",
+        description=f"Fit the HS vertex {command} of one input, or their width "
+        "over PU or truth vertex density for the three finders.",
+    )
+    parser.add_argument(
+        "--over",
+        choices=["fit", "pu", "density"],
+        default="pu",
+        help="fit a single input, or trend over PU or density (default: %(default)s)",
+    )
+    parser.add_argument("--input", help="input file for --over fit")
+    add_finder_inputs(parser, required=False)
+    parser.add_argument("--line-fit", action="store_true")
+    add_output(parser)
+    add_cache(parser)
+    parser.set_defaults(module="mycommon.plots.residuals_pulls", mode=mode)
+    return parser
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(
+        prog="odd-analysis",
+        description="Vertexing performance plots for the ODD full chain outputs",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    catalog = subparsers.add_parser(
+        "catalog", help="list the chain outputs below a directory"
+    )
+    catalog.add_argument("root", type=pathlib.Path)
+    catalog.add_argument("--stage", help="only outputs in this directory, e.g. vertex_ivf")
+    catalog.add_argument("--file", help="only files with this name")
+    catalog.add_argument("--pattern", default="*.root", help="glob for output files")
+    catalog.add_argument(
+        "--paths", action="store_true", help="print bare paths, e.g. for --inputs-*"
+    )
+    catalog.set_defaults(module="mycommon.catalog")
+
+    efficiency = subparsers.add_parser(
+        "efficiency", help="reconstruction, merging and splitting rate distributions"
+    )
+    efficiency.add_argument("input", nargs="+")
+    add_output(efficiency)
+    efficiency.set_defaults(module="mycommon.plots.efficiency")
+
+    efficiency_over_pu = subparsers.add_parser(
+        "efficiency-over-pu", help="reconstructed, merged and split vertices over PU"
+    )
+    add_finder_inputs(efficiency_over_pu)
+    efficiency_over_pu.add_argument(
+        "--inputs-gauss", required=True, nargs="+", help="input files gauss finder"
+    )
+    efficiency_over_pu.add_argument(
+        "--inputs-ivf", required=True, nargs="+", help="input files iterative finder"
+    )
+    add_output(efficiency_over_pu)
+    add_cache(efficiency_over_pu)
+    efficiency_over_pu.set_defaults(module="mycommon.plots.efficiency_over_pu")
+
+    density = subparsers.add_parser(
+        "density", help="truth vertex density and contamination over PU"
+    )
+    density.add_argument("--inputs", required=True, nargs="+", help="input files")
+    add_output(density)
+    density.set_defaults(module="mycommon.plots.density_over_pu")
+
+    vertex_density = subparsers.add_parser(
+        "vertex-density",
+        help="truth vertex density around the HS vertex for any window",
+        description="Recompute the truth vertex density around the hard-scatter "
+        "vertex for several z (and t) windows and the nearest truth vertex from "
+        "a particles file, and optionally the resolution over each of them.",
+    )
+    vertex_density.add_argument(
+        "input", help="particles file, e.g. particles.root of the generation"
+    )
+    vertex_density.add_argument(
+        "--windows",
+        nargs="+",
+        type=float,
+        default=[1.0],
+        help="full window widths in z [mm] (default: %(default)s)",
+    )
+    vertex_density.add_argument(
+        "--time-window", type=float, help="also cut the windows in t, full width [ns]"
+    )
+    vertex_density.add_argument("--table", help="write the per-event table as CSV")
+    vertex_density.add_argument(
+        "--vertexing",
+        help="performance_vertexing.root to plot the HS resolution over the densities",
+    )
+    vertex_density.add_argument(
+        "--variables",
+        nargs="+",
+        default=["resZ"],
+        help="HS residuals or pulls to plot (default: %(default)s)",
+    )
+    add_output(vertex_density)
+    vertex_density.set_defaults(module="mycommon.density")
+
+    residuals = add_residuals_pulls(subparsers, "residuals", "residual")
+    pulls = add_residuals_pulls(subparsers, "pulls", "pull")
+
+    splitting = subparsers.add_parser("splitting", help="vertex splitting ratio over PU")
+    splitting.add_argument("inputs", nargs="+")
+    add_output(splitting)
+    add_cache(splitting)
+    splitting.set_defaults(module="mycommon.plots.splitting_ratio_over_pu")
+
+    track_resolution = subparsers.add_parser(
+        "track-resolution",
+        help="track parameter resolution in truth pT slices from tracksummary",
+        description="Fill and fit res_* of tracksummary in t_pT slices for "
+        "several inputs (e.g. particle hypotheses), each read once and in "
+        "parallel, and compare them to a reference.",
+    )
+    track_resolution.add_argument(
+        "--input",
+        required=True,
+        action="append",
+        metavar="LABEL=PATH",
+        help="labelled tracksummary_ckf.root, may be repeated",
+    )
+    track_resolution.add_argument(
+        "--variable",
+        required=True,
+        action="append",
+        metavar="NAME[:LOW:HIGH]",
+        help="res_* branch and histogram range, may be repeated; the range "
+        "is required for branches without a notebook range",
+    )
+    track_resolution.add_argument(
+        "--pt-bins",
+        nargs="+",
+        type=float,
+        default=[0.8, 1.5, 2.2, 3.0, 3.7, 4.4, 5.1, 12],
+        help="t_pT slice edges in GeV",
+    )
+    track_resolution.add_argument("--bins", type=int, default=100)
+    track_resolution.add_argument(
+        "--nsigma", type=float, default=3, help="core range of the second fit"
+    )
+    track_resolution.add_argument("--min-entries", type=int, default=5)
+    track_resolution.add_argument(
+        "--model",
+        choices=["gauss", "double"],
+        default="gauss",
+        help="iterative single Gaussian or core + tail double Gaussian fit",
+    )
+    track_resolution.add_argument(
+        "--quantity",
+        choices=["sigma", "mu", *double_gauss_quantities],
+        default="sigma",
+        help="fitted quantity to plot, sigma is the core width for --model double; "
+        "sigma_tail, fraction_core and sigma_eff need --model double",
+    )
+    track_resolution.add_argument(
+        "--reference", help="label the ratios are taken to (default: first input)"
+    )
+    track_resolution.add_argument(
+        "--jobs", "-j", type=int, help="worker processes (default: one per input)"
+    )
+    add_output(track_resolution)
+    track_resolution.set_defaults(module="mycommon.plots.track_resolution")
+
+    latency = subparsers.add_parser(
+        "latency",
+        help="per-event latency histogram and slow event replay list",
+        description="Read latency.csv of a chain run with --latency and the "
+        "per-event counters of its outputs, plot the latency distributions and "
+        "write the events above a percentile to a replay list. Latencies of "
+        "runs with more than one thread include the probes waiting for the GIL.",
+    )
+    latency.add_argument("input", type=pathlib.Path, help="chain output directory")
+    latency.add_argument(
+        "--percentile",
+        type=float,
+        default=99,
+        help="events above this percentile of the total latency are listed",
+    )
+    latency.add_argument(
+        "--replay-list",
+        help="event list for --event-list-file of the chain (default: "
+        "<input>/slow_events.txt), details are written next to it as .jsonl",
+    )
+    latency.add_argument(
+        "--algorithms", type=int, default=5, help="slowest algorithms to plot"
+    )
+    add_output(latency)
+    latency.set_defaults(module="mycommon.plots.latency")
+
+    benchmark = subparsers.add_parser(
+        "benchmark",
+        help="thread and process scaling of the full chain",
+        description="Run the full chain on the same seeded events at several "
+        "thread counts and processes x threads splits, record throughput, "
+        "per-stage time, CPU use and peak memory, plot the scaling and "
+        "recommend the fastest configuration.",
+    )
+    benchmark.add_argument(
+        "--chain",
+        type=pathlib.Path,
+        default=pathlib.Path("full_chain_odd.py"),
+        help="chain script (default: %(default)s)",
+    )
+    benchmark.add_argument("--events", type=int, default=100)
+    benchmark.add_argument("--skip", type=int, default=0)
+    benchmark.add_argument(
+        "--threads",
+        nargs="*",
+        type=int,
+        default=[1, 2, 4, 8, 16, 32, 64],
+        help="thread counts to run as a single process",
+    )
+    benchmark.add_argument(
+        "--splits",
+        nargs="*",
+        default=[],
+        metavar="PxT",
+        help="processes x threads splits, e.g. 4x16",
+    )
+    benchmark.add_argument(
+        "--max-memory", type=float, help="memory limit of the recommendation in GB"
+    )
+    benchmark.add_argument(
+        "--work-dir",
+        type=pathlib.Path,
+        default=pathlib.Path("odd_benchmark"),
+        help="outputs and benchmark.jsonl (default: %(default)s)",
+    )
+    benchmark.add_argument(
+        "--output", help="scaling plot (default: <work-dir>/scaling.png)"
+    )
+    add_chain_args(benchmark)
+    benchmark.set_defaults(module="mycommon.benchmark")
+
+    ambiguity = subparsers.add_parser(
+        "ambiguity",
+        help="paired per-event comparison of the ambiguity solvers",
+        description="Compare the ambi_<solver> outputs of a chain run with "
+        "--ambi-solver all event by event: tracks, fakes, found particles, "
+        "duplicates, vertices per finder and solver time.",
+    )
+    ambiguity.add_argument("input", type=pathlib.Path, help="chain output directory")
+    ambiguity.add_argument("--reference", default="greedy", help="solver to compare to")
+    ambiguity.add_argument("--output", help="save the difference histograms")
+    ambiguity.set_defaults(module="mycommon.ambiguity")
+
+    vertex_summary = subparsers.add_parser(
+        "vertex-summary",
+        help="print and merge per-finder vertex performance summaries",
+        description="Merge the vertex_summary.json of chain runs (or summarize "
+        "the vertex ntuples below output directories without one) and print "
+        "efficiency, merged and split vertices and HS residuals and pulls.",
+    )
+    vertex_summary.add_argument(
+        "inputs",
+        nargs="+",
+        type=pathlib.Path,
+        help="vertex_summary.json files or chain output directories",
+    )
+    vertex_summary.add_argument("--output", help="write the merged summary")
+    vertex_summary.set_defaults(module="mycommon.vertex_summary")
+
+    compare = subparsers.add_parser(
+        "compare-outputs",
+        help="check that two chain runs wrote the same outputs",
+        description="Compare the ROOT files of two chain output directories "
+        "column by column, with the trees sorted by event number, e.g. a run "
+        "split into chunks or threads against a single-process reference.",
+    )
+    compare.add_argument("reference", type=pathlib.Path, help="reference output")
+    compare.add_argument("candidate", type=pathlib.Path, help="output to check")
+    compare.add_argument(
+        "--tolerance",
+        type=float,
+        default=0,
+        help="relative tolerance of floating point values (default: exact)",
+    )
+    compare.add_argument(
+        "--files", nargs="*", help="only compare files matching these patterns"
+    )
+    compare.set_defaults(module="mycommon.compare")
+
+    sweep = subparsers.add_parser(
+        "ckf-sweep",
+        help="grid sweep of CKF settings with a Pareto front",
+        description="Run the CKF for every point of a grid of spec settings on "
+        "the same cached inputs in parallel processes, collect efficiency, fake "
+        "and duplicate rate and CKF time, and report the Pareto front.",
+    )
+    sweep.add_argument(
+        "grid",
+        type=pathlib.Path,
+        help="YAML or JSON mapping dotted spec keys to value lists, e.g. "
+        "ckf.config.chi2CutOffMeasurement: [10, 15, 30]",
+    )
+    sweep.add_argument("--spec", type=pathlib.Path, help="base spec of all points")
+    sweep.add_argument(
+        "--chain",
+        type=pathlib.Path,
+        default=pathlib.Path("full_chain_odd.py"),
+        help="chain script (default: %(default)s)",
+    )
+    sweep.add_argument("--events", type=int, default=10)
+    sweep.add_argument("--skip", type=int, default=0)
+    sweep.add_argument("--jobs", type=int, default=4, help="points run at once")
+    sweep.add_argument("--threads", type=int, default=1, help="threads per point")
+    sweep.add_argument(
+        "--work-dir",
+        type=pathlib.Path,
+        default=pathlib.Path("odd_ckf_sweep"),
+        help="outputs, sweep.jsonl and pareto.json (default: %(default)s)",
+    )
+    sweep.add_argument("--output", help="plot (default: <work-dir>/pareto.png)")
+    add_chain_args(sweep)
+    sweep.set_defaults(module="mycommon.sweep")
+
+    seeding = subparsers.add_parser(
+        "seeding-benchmark",
+        help="cost and CKF saving of the ML seed filter over PU",
+        description="Run seeding and CKF without and with the ML seed filter "
+        "on the same cached simulation for every PU and compare seeds per "
+        "event, filter time and CKF time.",
+    )
+    seeding.add_argument(
+        "--chain",
+        type=pathlib.Path,
+        default=pathlib.Path("full_chain_odd.py"),
+        help="chain script (default: %(default)s)",
+    )
+    seeding.add_argument(
+        "--pu", nargs="+", type=int, default=[0, 50, 100, 150, 200], help="PU values"
+    )
+    seeding.add_argument("--events", type=int, default=10)
+    seeding.add_argument("--skip", type=int, default=0)
+    seeding.add_argument(
+        "--threads", type=int, default=1, help="chain threads (default: %(default)s)"
+    )
+    seeding.add_argument(
+        "--work-dir",
+        type=pathlib.Path,
+        default=pathlib.Path("odd_seeding_benchmark"),
+        help="outputs and seeding_benchmark.jsonl (default: %(default)s)",
+    )
+    seeding.add_argument("--output", help="plot (default: <work-dir>/seed_filter.png)")
+    seeding.set_defaults(module="mycommon.seeding_benchmark")
+
+    onnx = subparsers.add_parser(
+        "onnx-benchmark",
+        help="thread, session sharing and batching settings of the ML models",
+        description="Run ONNX models from several event threads with every "
+        "combination of session mode and intra-op / inter-op thread counts, "
+        "record the per-call inference time and the rows per second. The ACTS "
+        "ML algorithms do not expose these session settings, the chain runs "
+        "the shared session with the default threads; --threads of the chain "
+        "is the number of event threads.",
+    )
+    onnx.add_argument(
+        "models",
+        nargs="+",
+        type=pathlib.Path,
+        help="ONNX models, e.g. MLAmbiguityResolution/duplicateClassifier.onnx",
+    )
+    onnx.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["shared", "per-thread", "batched"],
+        default=["shared", "per-thread", "batched"],
+    )
+    onnx.add_argument(
+        "--intra", nargs="+", type=int, default=[0, 1, 2, 4], help="0: default"
+    )
+    onnx.add_argument("--inter", nargs="+", type=int, default=[1])
+    onnx.add_argument(
+        "--callers",
+        nargs="+",
+        type=int,
+        default=[8],
+        help="concurrent event threads, one benchmark per count",
+    )
+    onnx.add_argument("--calls", type=int, default=50, help="calls per thread")
+    onnx.add_argument("--rows", type=int, default=2000, help="seeds or tracks per call")
+    onnx.add_argument(
+        "--work-dir",
+        type=pathlib.Path,
+        default=pathlib.Path("odd_onnx_benchmark"),
+        help="onnx_benchmark.jsonl (default: %(default)s)",
+    )
+    onnx.set_defaults(module="mycommon.inference")
+
+    compression = subparsers.add_parser(
+        "compression",
+        help="size, write and read cost of ROOT compression settings",
+        description="Rewrite chain outputs with every compression setting and "
+        "measure the rewrite time, the file size and the uproot read time.",
+    )
+    compression.add_argument("inputs", nargs="+", help="chain ROOT outputs")
+    compression.add_argument(
+        "--settings",
+        nargs="+",
+        default=["zlib:1", "lz4:4", "zstd:5", "lzma:8"],
+        metavar="ALG:LEVEL[:BASKET[:FLUSH]]",
+        help="settings to compare (default: %(default)s)",
+    )
+    compression.add_argument(
+        "--repeat", type=int, default=3, help="reads per file, the best counts"
+    )
+    compression.add_argument(
+        "--work-dir",
+        type=pathlib.Path,
+        default=pathlib.Path("odd_compression"),
+        help="rewritten files and compression.jsonl (default: %(default)s)",
+    )
+    compression.add_argument(
+        "--keep", action="store_true", help="keep the rewritten files"
+    )
+    add_output(compression)
+    compression.set_defaults(module="mycommon.compression")
+
+    serve = subparsers.add_parser(
+        "serve",
+        help="keep chain outputs in shared memory for other processes",
+        description="Run a daemon that reads requested trees once into shared "
+        "memory and serves them and aggregates over a local socket, see "
+        "mycommon.dataserver.",
+    )
+    serve.add_argument(
+        "--socket",
+        type=pathlib.Path,
+        default=None,
+        help="socket path (default: $ODD_ANALYSIS_SOCKET or <cache>/dataserver.sock)",
+    )
+    serve.add_argument(
+        "--preload", nargs="*", default=[], help="files to read at start up"
+    )
+    serve.add_argument(
+        "--tree", default="vertexing", help="tree to preload (default: %(default)s)"
+    )
+    serve.add_argument(
+        "--columns",
+        nargs="*",
+        help="columns to preload (default: all with one value per entry)",
+    )
+    serve.add_argument(
+        "--stop", action="store_true", help="stop the daemon running at --socket"
+    )
+    serve.set_defaults(module="mycommon.dataserver")
+
+    return parser, {
+        "residuals": residuals,
+        "pulls": pulls,
+        "track-resolution": track_resolution,
+    }
+
+
+def main(argv=None):
+    parser, subparsers = make_parser()
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # split at -- before parsing, so the chain options are neither parsed
+    # as ours nor do they swallow ours
+    chain_args = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, chain_args = argv[:split], argv[split + 1 :]
+    args = parser.parse_args(argv)
+    if chain_args:
+        if not hasattr(args, "chain_args"):
+            parser.error(f"{args.command} takes no chain options after --")
+        args.chain_args = chain_args
+
+    if args.command in ("residuals", "pulls"):
+        if args.over == "fit" and args.input is None:
+            subparsers[args.command].error("--over fit requires --input")
+        if args.over != "fit" and None in (
+            args.inputs_tvf,
+            args.inputs_wot,
+            args.inputs_wt,
+        ):
+            subparsers[args.command].error(
+                f"--over {args.over} requires --inputs-tvf, --inputs-wot and --inputs-wt"
+            )
+
+    if args.command == "track-resolution":
+        if args.model != "double" and args.quantity in double_gauss_quantities:
+            subparsers[args.command].error(
+                f"--quantity {args.quantity} requires --model double"
+            )
+        from .track_resolution import default_ranges
+
+        for value in args.variable:
+            if ":" not in value and value not in default_ranges:
+                subparsers[args.command].error(
+                    f"--variable {value} needs a range, e.g. {value}:-1:1"
+                )
+
+    module = importlib.import_module(args.module)
+    return module.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Column by column comparison of two chain output directories.
+
+Meant to check that a run split into threads, chunks or event lists
+reproduces a reference run, see `mycommon.seeds`. The ROOT files are
+matched by their path below the two directories. Every tree is stably
+sorted by its event column (`event_nr` or `event_id`), since merged
+chunks and multi-threaded writers do not keep the event order, and then
+compared column by column: first the jagged structure (the counts at
+every depth), then the values, exactly or within a relative tolerance.
+Histograms are compared by their bin contents.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import awkward as ak
+
+event_columns = ["event_nr", "event_id"]
+
+
+def root_files(directory):
+    directory = Path(directory)
+    return {str(path.relative_to(directory)) for path in directory.rglob("*.root")}
+
+
+def _sorted_arrays(tree):
+    arrays = tree.arrays(library="ak")
+    event = next((c for c in event_columns if c in arrays.fields), None)
+    if event is not None:
+        arrays = arrays[np.argsort(ak.to_numpy(arrays[event]), kind="stable")]
+    return arrays
+
+
+def _values_equal(a, b, tolerance):
+    if a.dtype.kind in "fc" or b.dtype.kind in "fc":
+        if tolerance:
+            return np.allclose(a, b, rtol=tolerance, atol=0, equal_nan=True)
+        return np.array_equal(a, b, equal_nan=True)
+    return np.array_equal(a, b)
+
+
+def compare_column(a, b, tolerance=0):
+    """`None` if the columns agree, else what differs."""
+    if len(a) != len(b):
+        return f"{len(a)} vs {len(b)} entries"
+    depth = 1
+    while a.ndim > depth:
+        if a.ndim != b.ndim:
+            return f"{a.ndim} vs {b.ndim} dimensions"
+        if not np.array_equal(
+            ak.flatten(ak.num(a, axis=depth), axis=None),
+            ak.flatten(ak.num(b, axis=depth), axis=None),
+        ):
+            return f"different counts at depth {depth}"
+        depth += 1
+    flat_a = ak.to_numpy(ak.flatten(a, axis=None))
+    flat_b = ak.to_numpy(ak.flatten(b, axis=None))
+    if not _values_equal(flat_a, flat_b, tolerance):
+        if flat_a.dtype.kind in "biufc" and flat_b.dtype.kind in "biufc":
+            differ = ~np.isclose(flat_a, flat_b, rtol=tolerance, atol=0, equal_nan=True)
+            return f"{differ.sum()} of {len(differ)} values differ"
+        return "values differ"
+    return None
+
+
+def compare_file(reference, candidate, tolerance=0):
+    """`{object/column: None or difference}` of two ROOT files."""
+    import uproot
+
+    result = {}
+    with uproot.open(reference) as ref, uproot.open(candidate) as cand:
+        names = set(ref.keys(cycle=False)) | set(cand.keys(cycle=False))
+        for name in sorted(names):
+            if name not in ref or name not in cand:
+                result[name] = "missing in " + (
+                    "reference" if name not in ref else "candidate"
+                )
+                continue
+            a, b = ref[name], cand[name]
+            if isinstance(a, uproot.TTree) and isinstance(b, uproot.TTree):
+                arrays_a, arrays_b = _sorted_arrays(a), _sorted_arrays(b)
+                for column in sorted(set(arrays_a.fields) | set(arrays_b.fields)):
+                    key = f"{name}/{column}"
+                    if column not in arrays_a.fields:
+                        result[key] = "missing in reference"
+                    elif column not in arrays_b.fields:
+                        result[key] = "missing in candidate"
+                    else:
+                        result[key] = compare_column(
+                            arrays_a[column], arrays_b[column], tolerance
+                        )
+            elif hasattr(a, "values") and hasattr(b, "values"):
+                values_a, values_b = a.values(), b.values()
+                if values_a.shape != values_b.shape:
+                    result[name] = f"{values_a.shape} vs {values_b.shape} bins"
+                elif not _values_equal(values_a, values_b, tolerance):
+                    result[name] = "bin contents differ"
+                else:
+                    result[name] = None
+    return result
+
+
+def run(args):
+    reference, candidate = Path(args.reference), Path(args.candidate)
+    files = root_files(reference) | root_files(candidate)
+    if args.files:
+        files = {f for f in files if any(Path(f).match(p) for p in args.files)}
+
+    differences = 0
+    for path in sorted(files):
+        if not (reference / path).exists() or not (candidate / path).exists():
+            where = "reference" if not (reference / path).exists() else "candidate"
+            print(f"{path}: missing in {where}")
+            differences += 1
+            continue
+        result = compare_file(reference / path, candidate / path, args.tolerance)
+        differing = {key: diff for key, diff in result.items() if diff is not None}
+        differences += len(differing)
+        print(
+            f"{path}: {len(result) - len(differing)} identical, "
+            f"{len(differing)} differing"
+        )
+        for key, diff in differing.items():
+            print(f"  {key}: {diff}")
+
+    if differences:
+        raise SystemExit(f"{differences} differences")
+    print(
+        "outputs are identical"
+        + (f" within {args.tolerance}" if args.tolerance else "")
+    )
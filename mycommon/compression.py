@@ -0,0 +1,279 @@
+"""Compression and basket layout of the chain ROOT outputs.
+
+The ACTS ROOT writers do not expose compression or basket settings, so the
+chain rewrites the files of an output family after the run with PyROOT:
+every tree is copied entry by entry into a file with the requested
+compression algorithm and level, with the basket size (bytes per branch
+buffer) and auto-flush (entries per cluster) set on the copy. Other
+objects are copied as they are.
+
+A setting is written `algorithm:level[:basket size[:auto flush]]`, e.g.
+`lz4:4` for hot analysis files or `lzma:8:256000:10000` for archives. The
+families are the chain stages, see `families`.
+
+The benchmark (`odd-analysis compression`) rewrites sample outputs with
+every setting and measures the rewrite time (the compression cost), the
+size and the uproot read throughput of the result.
+"""
+
+import os
+import json
+import time
+import shutil
+from pathlib import Path
+
+# ROOT::RCompressionSetting::EAlgorithm, settings are algorithm * 100 + level
+algorithms = {"zlib": 1, "lzma": 2, "lz4": 4, "zstd": 5}
+
+# output files of every chain stage below the output directory
+families = {
+    "generator": ["pythia8_*.root", "particles.root", "vertices.root"],
+    "simulation": ["particles_simulation.root", "particles_*.root", "hits.root"],
+    "digitization": ["measurements.root"],
+    "seeding": ["estimatedparams.root", "performance_seeding.root"],
+    "ckf": ["*_ckf.root"],
+    "ambiguity": ["*_ambi*.root", "*_scoring*.root", "ambi_*/*.root"],
+    "vertexing": ["vertex_*/*.root", "ambi_*/vertex_*/*.root"],
+}
+
+
+def parse_setting(value):
+    """`"zstd:5:32000:1000"` to a setting dict."""
+    algorithm, level, *layout = value.split(":")
+    if algorithm not in algorithms:
+        raise ValueError(f"unknown compression algorithm {algorithm!r}")
+    setting = {"algorithm": algorithm, "level": int(level)}
+    for key, item in zip(["basketSize", "autoFlush"], layout):
+        setting[key] = int(item) if item else None
+    return setting
+
+
+def format_setting(setting):
+    parts = [setting["algorithm"], str(setting["level"])]
+    for key in ["basketSize", "autoFlush"]:
+        parts.append(str(setting.get(key) or ""))
+    return ":".join(parts).rstrip(":")
+
+
+def family_files(directory, family):
+    files = set()
+    for pattern in families[family]:
+        files.update(Path(directory).glob(pattern))
+    return sorted(files)
+
+
+def recompress(input, output, setting):
+    """Copy `input` to `output` with the compression and layout of `setting`.
+
+    Returns the entries of every copied tree.
+    """
+    import ROOT
+
+    source = ROOT.TFile.Open(str(input))
+    target = ROOT.TFile(
+        str(output),
+        "RECREATE",
+        "",
+        algorithms[setting["algorithm"]] * 100 + setting["level"],
+    )
+    entries = {}
+    try:
+        # an autosaved tree has a key per cycle, only the highest one is
+        # complete and `Get` returns it
+        names = dict.fromkeys(key.GetName() for key in source.GetListOfKeys())
+        for name in names:
+            obj = source.Get(name)
+            target.cd()
+            if obj.InheritsFrom("TTree"):
+                copy = obj.CloneTree(0)
+                if setting.get("basketSize"):
+                    copy.SetBasketSize("*", setting["basketSize"])
+                if setting.get("autoFlush"):
+                    copy.SetAutoFlush(setting["autoFlush"])
+                copy.CopyEntries(obj)
+                copy.Write("", ROOT.TObject.kOverwrite)
+                entries[name] = obj.GetEntries()
+            else:
+                target.WriteTObject(obj, name)
+    finally:
+        target.Close()
+        source.Close()
+    return entries
+
+
+def tree_entries(path):
+    """`{tree name: entries}` of the highest cycle of every tree in `path`."""
+    import ROOT
+
+    f = ROOT.TFile.Open(str(path))
+    try:
+        entries = {}
+        for name in dict.fromkeys(key.GetName() for key in f.GetListOfKeys()):
+            obj = f.Get(name)
+            if obj.InheritsFrom("TTree"):
+                entries[name] = obj.GetEntries()
+        return entries
+    finally:
+        f.Close()
+
+
+def recompress_in_place(path, setting):
+    """Recompress `path`, replacing it only if every tree was copied whole."""
+    tmp = Path(path).with_suffix(f".{os.getpid()}.tmp.root")
+    expected = recompress(path, tmp, setting)
+    written = tree_entries(tmp)
+    if written != expected:
+        tmp.unlink()
+        raise RuntimeError(
+            f"recompressing {path} gave entries {written}, expected {expected}"
+        )
+    os.replace(tmp, path)
+
+
+def compress_outputs(directory, settings):
+    """Apply `settings` (`{family or "default": setting}`) to the outputs.
+
+    Returns the seconds spent per family, or `None` without PyROOT.
+    """
+    default = settings.get("default")
+    todo = {family: settings.get(family, default) for family in families}
+    todo = {family: setting for family, setting in todo.items() if setting}
+    if not todo:
+        return {}
+    try:
+        import ROOT  # noqa: F401
+    except ImportError:
+        print("PyROOT not found, outputs keep the writers' compression")
+        return None
+
+    seconds = {}
+    for family, setting in todo.items():
+        start = time.perf_counter()
+        for path in family_files(directory, family):
+            recompress_in_place(path, setting)
+        seconds[family] = time.perf_counter() - start
+    return seconds
+
+
+def read_throughput(path, repeat=3):
+    """Best time to read all trees of `path` with uproot, and bytes read.
+
+    The bytes are those of the decompressed arrays, so they are the same
+    for every compression setting of the same content.
+    """
+    import uproot
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        nbytes = 0
+        with uproot.open(path) as f:
+            for name in f.keys(cycle=False, filter_classname="TTree"):
+                arrays = f[name].arrays(library="np")
+                nbytes += sum(_nbytes(array) for array in arrays.values())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, nbytes
+
+
+def _nbytes(array):
+    # jagged branches come as object arrays of per-entry arrays
+    if array.dtype == object:
+        return sum(getattr(item, "nbytes", 0) for item in array)
+    return array.nbytes
+
+
+def writer_seconds(directory):
+    """Time of the chain writers from `timing.tsv`, if there is one."""
+    from .benchmark import read_timing
+
+    timing = Path(directory) / "timing.tsv"
+    if not timing.exists():
+        return {}
+    return {
+        identifier: seconds
+        for identifier, seconds in read_timing(timing).items()
+        if "Writer" in identifier
+    }
+
+
+def run(args):
+    settings = [parse_setting(value) for value in args.settings]
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+    results = args.work_dir / "compression.jsonl"
+
+    records = []
+    for input in args.inputs:
+        input = Path(input)
+        read, read_bytes = read_throughput(input, args.repeat)
+        reference = {
+            "bytes": input.stat().st_size,
+            "read_s": read,
+            "read_mb_per_s": read_bytes / 1e6 / read,
+        }
+        print(
+            f"{input}: {reference['bytes'] / 1e6:.1f} MB, "
+            f"read {reference['read_s']:.3f} s (as written by the chain)"
+        )
+        for setting in settings:
+            output = args.work_dir / format_setting(setting).replace(":", "_")
+            output.mkdir(exist_ok=True)
+            output = output / input.name
+
+            start = time.perf_counter()
+            recompress(input, output, setting)
+            write = time.perf_counter() - start
+            read, read_bytes = read_throughput(output, args.repeat)
+            record = {
+                "input": str(input),
+                "setting": format_setting(setting),
+                "bytes": output.stat().st_size,
+                "ratio": reference["bytes"] / output.stat().st_size,
+                "write_s": write,
+                "read_s": read,
+                "read_mb_per_s": read_bytes / 1e6 / read,
+                "reference": reference,
+                "chain_writer_s": writer_seconds(input.parent),
+            }
+            records.append(record)
+            with open(results, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            print(
+                f"  {record['setting']:<24} {record['bytes'] / 1e6:8.1f} MB "
+                f"x{record['ratio']:5.2f}  write {write:7.3f} s  read {read:7.3f} s"
+            )
+            if not args.keep:
+                os.remove(output)
+
+    if not args.keep:
+        for directory in args.work_dir.iterdir():
+            if directory.is_dir() and not any(directory.iterdir()):
+                shutil.rmtree(directory)
+
+    if args.output:
+        plot(records, args.output)
+
+
+def plot(records, output):
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure("Output compression", figsize=(12, 5))
+    ax_write, ax_read = fig.subplots(1, 2)
+    for input in sorted({r["input"] for r in records}):
+        selected = [r for r in records if r["input"] == input]
+        for ax, key in [(ax_write, "write_s"), (ax_read, "read_s")]:
+            ax.scatter(
+                [r["bytes"] / 1e6 for r in selected],
+                [r[key] for r in selected],
+                label=Path(input).name,
+            )
+            for r in selected:
+                ax.annotate(
+                    r["setting"], (r["bytes"] / 1e6, r[key]), fontsize="x-small"
+                )
+    ax_write.set_xlabel("file size [MB]")
+    ax_write.set_ylabel("rewrite time [s]")
+    ax_read.set_xlabel("file size [MB]")
+    ax_read.set_ylabel("uproot read time [s]")
+    ax_write.legend(fontsize="small")
+    fig.savefig(output)
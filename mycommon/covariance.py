@@ -0,0 +1,155 @@
+"""Compact storage of the track parameter covariances in `tracksummary`.
+
+With `writeCovMat` the ACTS track summary writer stores all 36 elements
+of the 6x6 covariance per track as `cov_<row>_<column>` branches. After
+the run the chain can rewrite the files (with RDataFrame, so the other
+branches are copied as they are) in one of two compact layouts:
+
+- `upper`: only the 21 branches of the upper triangle, optionally as
+  float32;
+- `correlation`: `sigma_<parameter>` (float32) for the 6 diagonal elements
+  and `corr_<row>_<column>` for the 15 correlation coefficients, stored as
+  int16 in units of 1 / `correlation_scale`.
+
+The sigmas keep what the pull studies need at full float32 precision;
+the correlations are kept to about 3e-5.
+
+`covariance_matrices` rebuilds `(tracks, 6, 6)` arrays from the branches of
+any layout with numpy, `tracksummary.read_tracks(..., covariance=True)`
+does so while reading.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+parameters = ["eLOC0", "eLOC1", "ePHI", "eTHETA", "eQOP", "eT"]
+layouts = ["full", "upper", "correlation"]
+correlation_scale = 32767
+
+_upper = np.triu_indices(len(parameters))
+_strict_upper = np.triu_indices(len(parameters), 1)
+
+
+def cov_name(i, j):
+    return f"cov_{parameters[i]}_{parameters[j]}"
+
+
+def sigma_name(i):
+    return f"sigma_{parameters[i]}"
+
+
+def corr_name(i, j):
+    return f"corr_{parameters[i]}_{parameters[j]}"
+
+
+def layout_of(columns):
+    """Covariance layout of a tree with `columns`, `None` without one."""
+    columns = set(columns)
+    if corr_name(0, 1) in columns:
+        return "correlation"
+    if cov_name(1, 0) in columns:
+        return "full"
+    if cov_name(0, 0) in columns:
+        return "upper"
+    return None
+
+
+def covariance_columns(layout):
+    """Branches needed to rebuild the covariance in `layout`."""
+    if layout == "correlation":
+        return [sigma_name(i) for i in range(len(parameters))] + [
+            corr_name(i, j) for i, j in zip(*_strict_upper)
+        ]
+    return [cov_name(i, j) for i, j in zip(*_upper)]
+
+
+def covariance_matrices(columns, layout):
+    """`(tracks, 6, 6)` covariances from the per-track arrays in `columns`."""
+    n = len(parameters)
+    if layout == "correlation":
+        sigma = np.stack(
+            [np.asarray(columns[sigma_name(i)], dtype=np.float64) for i in range(n)],
+            axis=1,
+        )
+        correlation = np.zeros((len(sigma), n, n))
+        correlation[:, np.arange(n), np.arange(n)] = 1.0
+        packed = np.stack(
+            [columns[corr_name(i, j)] for i, j in zip(*_strict_upper)], axis=1
+        ) / float(correlation_scale)
+        correlation[:, _strict_upper[0], _strict_upper[1]] = packed
+        correlation[:, _strict_upper[1], _strict_upper[0]] = packed
+        return correlation * sigma[:, :, None] * sigma[:, None, :]
+
+    packed = np.stack(
+        [
+            np.asarray(columns[cov_name(i, j)], dtype=np.float64)
+            for i, j in zip(*_upper)
+        ],
+        axis=1,
+    )
+    matrices = np.empty((len(packed), n, n))
+    matrices[:, _upper[0], _upper[1]] = packed
+    matrices[:, _upper[1], _upper[0]] = packed
+    return matrices
+
+
+def compact(input, output, layout, float32=False, tree="tracksummary"):
+    """Copy `input` to `output` with the covariance branches in `layout`."""
+    import ROOT
+
+    df = ROOT.RDataFrame(tree, str(input))
+    full = [
+        cov_name(i, j) for i in range(len(parameters)) for j in range(len(parameters))
+    ]
+    keep = [str(c) for c in df.GetColumnNames() if str(c) not in full]
+
+    if layout == "upper":
+        for i, j in zip(*_upper):
+            name = cov_name(i, j)
+            if float32:
+                df = df.Redefine(name, f"ROOT::RVecF({name})")
+            keep.append(name)
+    elif layout == "correlation":
+        for i in range(len(parameters)):
+            df = df.Define(sigma_name(i), f"ROOT::RVecF(sqrt({cov_name(i, i)}))")
+            keep.append(sigma_name(i))
+        for i, j in zip(*_strict_upper):
+            df = df.Define(
+                corr_name(i, j),
+                f"ROOT::VecOps::Map({cov_name(i, j)}, {cov_name(i, i)}, "
+                f"{cov_name(j, j)}, [](double c, double a, double b) {{ "
+                f"return short(a > 0 && b > 0 ? std::round(std::clamp("
+                f"c / std::sqrt(a * b), -1., 1.) * {correlation_scale}) : 0); }})",
+            )
+            keep.append(corr_name(i, j))
+    else:
+        raise ValueError(f"unknown covariance layout {layout!r}")
+
+    df.Snapshot(tree, str(output), ROOT.std.vector["std::string"](keep))
+
+
+def compact_outputs(directory, layout, float32=False):
+    """Rewrite the `tracksummary_*.root` files below `directory` in `layout`.
+
+    Returns the rewritten files, or `None` without PyROOT. `float32` only
+    applies to the `upper` layout.
+    """
+    if float32 and layout != "upper":
+        raise ValueError(f"float32 covariances need the upper layout, not {layout}")
+    if layout == "full":
+        return []
+    try:
+        import ROOT  # noqa: F401
+    except ImportError:
+        print("PyROOT not found, track summaries keep the full covariance")
+        return None
+
+    files = sorted(Path(directory).glob("tracksummary_*.root"))
+    files += sorted(Path(directory).glob("ambi_*/tracksummary_*.root"))
+    for path in files:
+        tmp = path.with_suffix(f".{os.getpid()}.tmp.root")
+        compact(path, tmp, layout, float32)
+        os.replace(tmp, path)
+    return files
@@ -0,0 +1,374 @@
+"""Resident data service keeping chain outputs in shared memory.
+
+`odd-analysis serve` starts a daemon listening on a local (Unix) socket.
+A client asks for columns of a tree in a file; the daemon reads them once,
+copies every column into its own POSIX shared memory block and answers
+with the block names, dtypes and shapes. The client maps the blocks and
+wraps them as numpy arrays without copying, so a restarted notebook
+kernel or plot script gets its data back without reading the file again.
+Aggregates (count, mean, quantiles, histograms, ...) are computed by the
+daemon so that only the numbers travel.
+
+Without a list of columns a tree is served with the branches that have
+one value per entry, so aggregates keep the granularity of the tree.
+Vector branches (e.g. of `tracksummary`) are only served when asked for
+by name; they are then flattened like `tracksummary.read_tracks` does,
+one row per element plus `event_nr`, `track_index` and `entry_index`. A
+dataset is keyed by the file identity (path, size, modification time),
+tree and columns; a file that changed is read again.
+
+The readers of `mycommon.vertexing` take their columns from a running
+server, see `served`.
+
+Requests and answers are single JSON lines.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import socketserver
+from pathlib import Path
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .cache import default_cache_dir
+
+default_socket = Path(
+    os.environ.get("ODD_ANALYSIS_SOCKET", default_cache_dir / "dataserver.sock")
+)
+
+default_stats = ["count", "mean", "std", "min", "max"]
+
+
+def dataset_key(input, tree, columns):
+    identity = [str(input), tree, sorted(columns)]
+    if os.path.exists(input):
+        stat = os.stat(input)
+        identity = [str(Path(input).resolve()), tree, sorted(columns)]
+        identity += [stat.st_size, stat.st_mtime_ns]
+    return hashlib.sha1(json.dumps(identity).encode()).hexdigest()[:16]
+
+
+def entry_columns(tree):
+    """Branches of an uproot `tree` with one value per entry."""
+    import uproot
+
+    return [
+        name
+        for name, branch in tree.items()
+        if isinstance(branch.interpretation, uproot.AsDtype)
+        and branch.interpretation.inner_shape == ()
+    ]
+
+
+def read_columns(input, tree, columns):
+    """Columns of `tree` as flat numpy arrays, vector branches flattened.
+
+    `columns=None` reads the `entry_columns`.
+    """
+    import uproot
+    import awkward as ak
+
+    from .tracksummary import _tracks_from_chunk
+
+    with uproot.open(input) as f:
+        t = f[tree]
+        columns = entry_columns(t) if columns is None else list(columns)
+        event_column = "event_nr" if "event_nr" in t else None
+        read = columns + ([event_column] if event_column not in columns else [])
+        arrays = t.arrays([c for c in read if c is not None])
+
+    if all(arrays[c].ndim == 1 for c in columns):
+        return {c: ak.to_numpy(arrays[c]) for c in columns}
+    return _tracks_from_chunk(arrays, columns, event_column)
+
+
+def aggregate(values, stats=None, bins=None, range=None):
+    """Summary numbers of `values` as a JSON serializable dict.
+
+    `stats` are numpy reductions by name or `qNN` for the NN-th percentile;
+    with `bins` a histogram over `range` is added.
+    """
+    values = np.asarray(values)
+    finite = values[np.isfinite(values)] if values.dtype.kind == "f" else values
+    result = {}
+    for stat in stats or default_stats:
+        if stat == "count":
+            result[stat] = int(len(values))
+        elif stat.startswith("q"):
+            result[stat] = float(np.percentile(finite, float(stat[1:])))
+        else:
+            result[stat] = float(getattr(np, stat)(finite))
+    if bins is not None:
+        counts, edges = np.histogram(finite, bins=bins, range=range)
+        result["histogram"] = {"counts": counts.tolist(), "edges": edges.tolist()}
+    return result
+
+
+class _Dataset:
+    def __init__(self, arrays):
+        self.arrays = {}
+        self.blocks = {}
+        for column, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[...] = array
+            self.arrays[column] = shared
+            self.blocks[column] = block
+
+    def describe(self):
+        return {
+            column: {
+                "block": self.blocks[column].name,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+            }
+            for column, array in self.arrays.items()
+        }
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def release(self):
+        self.arrays.clear()
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+
+class DataServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        self.datasets = {}
+        self.sources = {}
+        self._lock = threading.Lock()
+        self._loading = {}
+        super().__init__(str(path), _Handler)
+
+    def load(self, input, tree, columns):
+        if columns is None:
+            import uproot
+
+            with uproot.open(input) as f:
+                columns = entry_columns(f[tree])
+        key = dataset_key(input, tree, columns)
+        with self._lock:
+            if key in self.datasets:
+                return key
+            loading = self._loading.setdefault(key, threading.Lock())
+        # other datasets stay available while this one is read
+        with loading:
+            if key not in self.datasets:
+                dataset = _Dataset(read_columns(input, tree, columns))
+                with self._lock:
+                    # drop an older version of the same file, tree and columns
+                    source = (str(input), tree, tuple(sorted(columns)))
+                    stale = self.sources.get(source)
+                    if stale is not None and stale != key:
+                        self.datasets.pop(stale).release()
+                    self.datasets[key] = dataset
+                    self.sources[source] = key
+                    self._loading.pop(key, None)
+        return key
+
+    def find(self, input, tree, column):
+        """Key of a current dataset of `input` and `tree` having `column`."""
+        with self._lock:
+            sources = list(self.sources.items())
+        for (source, source_tree, columns), key in sources:
+            if source == str(input) and source_tree == tree and column in columns:
+                if dataset_key(input, tree, columns) == key:
+                    return key
+        return None
+
+    def drop(self, key):
+        with self._lock:
+            dataset = self.datasets.pop(key, None)
+            self.sources = {s: k for s, k in self.sources.items() if k != key}
+        if dataset is not None:
+            dataset.release()
+
+    def release(self):
+        for key in list(self.datasets):
+            self.drop(key)
+
+    def handle(self, request):
+        op = request["op"]
+        if op == "load":
+            key = self.load(request["input"], request["tree"], request["columns"])
+            return {"dataset": key, "columns": self.datasets[key].describe()}
+        if op == "aggregate":
+            key = self.find(request["input"], request["tree"], request["column"])
+            if key is None:
+                key = self.load(request["input"], request["tree"], [request["column"]])
+            return aggregate(
+                self.datasets[key].arrays[request["column"]],
+                request.get("stats"),
+                request.get("bins"),
+                request.get("range"),
+            )
+        if op == "list":
+            return {
+                key: {"source": list(source), "bytes": self.datasets[key].nbytes}
+                for source, key in self.sources.items()
+            }
+        if op == "drop":
+            self.drop(request["dataset"])
+            return {}
+        if op == "shutdown":
+            threading.Thread(target=self.shutdown).start()
+            return {}
+        raise ValueError(f"unknown operation {op!r}")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                answer = {"ok": True, "result": self.server.handle(json.loads(line))}
+            except Exception as e:
+                answer = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(answer).encode() + b"\n")
+            self.wfile.flush()
+
+
+class Client:
+    """Connection to a running `DataServer`.
+
+    The arrays returned by `load` are views on the shared memory of the
+    server, they are valid as long as the server keeps the dataset (until
+    it is dropped, the file changes or the server stops). Copy what has to
+    outlive that.
+    """
+
+    def __init__(self, path=default_socket):
+        import socket
+
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(str(path))
+        self._file = self._socket.makefile("rwb")
+        self._blocks = {}
+
+    def request(self, op, **kwargs):
+        self._file.write(json.dumps({"op": op, **kwargs}).encode() + b"\n")
+        self._file.flush()
+        answer = json.loads(self._file.readline())
+        if not answer["ok"]:
+            raise RuntimeError(answer["error"])
+        return answer["result"]
+
+    def _attach(self, name):
+        if name not in self._blocks:
+            # the server owns the block, do not let this process unlink it
+            try:
+                block = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                from multiprocessing import resource_tracker
+
+                block = shared_memory.SharedMemory(name=name)
+                resource_tracker.unregister(block._name, "shared_memory")
+            self._blocks[name] = block
+        return self._blocks[name]
+
+    def load(self, input, columns, tree):
+        """Dict of numpy arrays (shared, read-only) of `columns` of `tree`."""
+        result = self.request("load", input=str(input), tree=tree, columns=columns)
+        arrays = {}
+        for column, described in result["columns"].items():
+            array = np.ndarray(
+                described["shape"],
+                dtype=np.dtype(described["dtype"]),
+                buffer=self._attach(described["block"]).buf,
+            )
+            array.flags.writeable = False
+            arrays[column] = array
+        return arrays
+
+    def aggregate(self, input, column, tree, stats=None, bins=None, range=None):
+        return self.request(
+            "aggregate",
+            input=str(input),
+            tree=tree,
+            column=column,
+            stats=stats,
+            bins=bins,
+            range=range,
+        )
+
+    def datasets(self):
+        return self.request("list")
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_clients = {}
+
+
+def served(input, columns, tree, path=default_socket):
+    """`Client.load` if a server is running at `path`, else `None`.
+
+    The connection is kept for the next call and the shared memory it maps.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        if path not in _clients:
+            _clients[path] = Client(path)
+        return _clients[path].load(input, columns, tree)
+    except (FileNotFoundError, ConnectionRefusedError, BrokenPipeError):
+        _clients.pop(path, None)
+        return None
+
+
+def load(input, columns, tree, path=default_socket):
+    """`Client.load` if a server is running at `path`, else read `input`.
+
+    Without a server the columns are read directly, in the same layout.
+    """
+    arrays = served(input, columns, tree, path)
+    return arrays if arrays is not None else read_columns(input, tree, columns)
+
+
+def run(args):
+    path = Path(args.socket or default_socket)
+    if args.stop:
+        with Client(path) as client:
+            client.request("shutdown")
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        # a stale socket of a server that died is replaced, a live one is not
+        try:
+            Client(path).close()
+        except ConnectionRefusedError:
+            path.unlink()
+        else:
+            raise SystemExit(f"a data server is already running on {path}")
+    server = DataServer(path)
+    try:
+        for input in args.preload:
+            server.load(input, args.tree, args.columns)
+        print(f"Serving on {path}", flush=True)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.release()
+        path.unlink(missing_ok=True)
@@ -0,0 +1,228 @@
+"""Local truth vertex density around the hard-scatter vertex.
+
+The vertex writer stores `truthPrimaryVertexDensity` with one fixed
+window. This recomputes the density for any window from the generated
+particles: the truth primary vertices (`vertex_secondary == 0`, one per
+`vertex_primary`) of all events are sorted once by event and z, and every
+window is then two `searchsorted` calls over all events at once. The
+events are kept apart by shifting the z of the k-th event by k times a
+spacing larger than the beam spot, and every window is clipped to its
+event. The time window is applied to the vertices within the z window.
+
+The density of a window of width `w` is the number of other truth
+vertices with |dz| <= w / 2 (and |dt| <= half the time window, which is
+a full width like `w`) divided by `w`, in vertices per mm. The nearest
+neighbour is the truth vertex closest in z to the hard-scatter vertex
+(`vertex_primary == 1`).
+"""
+
+import time
+
+import numpy as np
+
+particles_tree = "particles"
+
+
+def read_truth_vertices(input, tree=particles_tree, step_size="200 MB"):
+    """Event, z and t of every truth primary vertex in a particles file."""
+    import uproot
+    import awkward as ak
+
+    from .pileup import vertex_primary, vertex_secondary
+
+    event_nr, primary, z, t = [], [], [], []
+    with uproot.open(input) as f:
+        tree = f[tree]
+        columns = ["event_id", "particle_id", "vz", "vt"]
+        for arrays in tree.iterate(columns, step_size=step_size, library="ak"):
+            counts = ak.to_numpy(ak.num(arrays["particle_id"]))
+            pid = ak.to_numpy(ak.flatten(arrays["particle_id"])).astype(np.uint64)
+            keep = vertex_secondary(pid) == 0
+            event_nr.append(np.repeat(ak.to_numpy(arrays["event_id"]), counts)[keep])
+            primary.append(vertex_primary(pid)[keep].astype(np.int64))
+            z.append(ak.to_numpy(ak.flatten(arrays["vz"]))[keep])
+            t.append(ak.to_numpy(ak.flatten(arrays["vt"]))[keep])
+
+    event_nr, primary = np.concatenate(event_nr), np.concatenate(primary)
+    # one entry per vertex: all particles of a vertex share its position
+    _, first = np.unique(
+        np.stack([event_nr, primary], axis=1), axis=0, return_index=True
+    )
+    return {
+        "event_nr": event_nr[first],
+        "vertex_primary": primary[first],
+        "z": np.concatenate(z)[first].astype(np.float64),
+        "t": np.concatenate(t)[first].astype(np.float64),
+    }
+
+
+class VertexDensity:
+    """Truth vertices sorted by event and z, queried around the HS vertex."""
+
+    def __init__(self, vertices):
+        self.events, event_index = np.unique(vertices["event_nr"], return_inverse=True)
+        z = vertices["z"]
+        # spacing of the events along the shifted z axis
+        self.spacing = 4 * (np.abs(z).max() + 1) if len(z) else 1.0
+        key = event_index * self.spacing + z
+
+        order = np.argsort(key, kind="stable")
+        self.key = key[order]
+        self.z = z[order]
+        self.t = vertices["t"][order]
+        self.event_index = event_index[order]
+
+        hs = np.nonzero(vertices["vertex_primary"][order] == 1)[0]
+        hs = hs[np.unique(self.event_index[hs], return_index=True)[1]]
+        # the HS position in the sorted vertices, per event with a HS vertex,
+        # and the range of the vertices of its event
+        self.hs = hs
+        self.hs_event = self.event_index[hs]
+        self.first = np.searchsorted(self.event_index, self.hs_event, "left")
+        self.last = np.searchsorted(self.event_index, self.hs_event, "right")
+
+    def table(self):
+        """Per event with a HS vertex: event number, HS z and t, vertices."""
+        return {
+            "event_nr": self.events[self.hs_event],
+            "hs_z": self.z[self.hs],
+            "hs_t": self.t[self.hs],
+            "vertices": np.bincount(self.event_index, minlength=len(self.events))[
+                self.hs_event
+            ],
+        }
+
+    def window(self, width):
+        """`[start, stop)` of the sorted vertices with |dz| <= width / 2."""
+        start = np.searchsorted(self.key, self.key[self.hs] - width / 2, "left")
+        stop = np.searchsorted(self.key, self.key[self.hs] + width / 2, "right")
+        return np.maximum(start, self.first), np.minimum(stop, self.last)
+
+    def count(self, width, time_width=None):
+        """Other vertices within the window around the HS vertex."""
+        start, stop = self.window(width)
+        if time_width is None:
+            return stop - start - 1
+        lengths = stop - start
+        owner = np.repeat(np.arange(len(self.hs)), lengths)
+        # positions of all vertices of all windows, window after window
+        index = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        index += np.repeat(start, lengths)
+        inside = np.abs(self.t[index] - self.t[self.hs][owner]) <= time_width / 2
+        return (
+            np.bincount(owner, weights=inside, minlength=len(self.hs)).astype(np.int64)
+            - 1
+        )
+
+    def density(self, width, time_width=None):
+        return self.count(width, time_width) / width
+
+    def nearest(self):
+        """|dz| and dt of the truth vertex nearest in z to the HS vertex."""
+        dz = np.full(len(self.hs), np.inf)
+        dt = np.full(len(self.hs), np.nan)
+        for step in [-1, 1]:
+            other = self.hs + step
+            valid = (other >= 0) & (other < len(self.key))
+            other = np.where(valid, other, self.hs)
+            valid &= self.event_index[other] == self.hs_event
+            distance = np.where(valid, np.abs(self.z[other] - self.z[self.hs]), np.inf)
+            closer = distance < dz
+            dz = np.where(closer, distance, dz)
+            dt = np.where(closer, self.t[other] - self.t[self.hs], dt)
+        return dz, dt
+
+
+def densities(vertices, widths, time_width=None):
+    """Per-event table with the density for every window width.
+
+    Columns `density_<width>` (vertices per mm) and, with `time_width`,
+    `density_<width>_t` for the windows also cut in time.
+    """
+    import pandas as pd
+
+    density = VertexDensity(vertices)
+    table = density.table()
+    for width in widths:
+        table[f"density_{width:g}"] = density.density(width)
+        if time_width is not None:
+            table[f"density_{width:g}_t"] = density.density(width, time_width)
+    table["nearest_dz"], table["nearest_dt"] = density.nearest()
+    return pd.DataFrame(table).set_index("event_nr")
+
+
+def _binned_width(ax, x, y, label, color):
+    from scipy.stats import binned_statistic
+
+    from .stats import robust_std, robust_std_std
+
+    sigma, edges, _ = binned_statistic(x, y, bins=6, statistic=robust_std)
+    sigma_err, _, _ = binned_statistic(x, y, bins=edges, statistic=robust_std_std)
+    ax.errorbar(
+        0.5 * (edges[:-1] + edges[1:]),
+        sigma,
+        sigma_err,
+        marker="o",
+        linestyle="",
+        color=color,
+        alpha=0.5,
+        label=label,
+    )
+
+
+def plot(table, vertexing, variables, output):
+    """Robust width of the HS residuals over every density and the nearest |dz|."""
+    import uproot
+    import matplotlib.pyplot as plt
+
+    from .plots.residuals_pulls import read_hs_vertices
+
+    with uproot.open(vertexing) as f:
+        event_nr = f["vertexing"]["event_nr"].array(library="np")
+    hs = read_hs_vertices(vertexing)
+    hs = hs.assign(event_nr=event_nr[hs.index]).join(table, on="event_nr")
+    densities = [c for c in table.columns if c.startswith("density")]
+
+    fig = plt.figure("Resolution over density", figsize=(12, 4 * len(variables)))
+    axs = np.array(fig.subplots(len(variables), 2, squeeze=False))
+    for (ax_density, ax_nearest), variable in zip(axs, variables):
+        for i, column in enumerate(densities):
+            data = hs[[column, variable]].dropna()
+            _binned_width(ax_density, data[column], data[variable], column, f"C{i}")
+        data = hs[["nearest_dz", variable]].dropna()
+        data = data[np.isfinite(data["nearest_dz"])]
+        _binned_width(ax_nearest, data["nearest_dz"], data[variable], None, "C0")
+
+        ax_density.set_xlabel("truth vertex density [1/mm]")
+        ax_nearest.set_xlabel("nearest truth vertex |dz| [mm]")
+        for ax in (ax_density, ax_nearest):
+            ax.set_ylabel(f"{variable} sigma")
+            ax.grid()
+        ax_density.legend(fontsize="small")
+
+    if output:
+        fig.savefig(output)
+    else:
+        plt.show()
+
+
+def run(args):
+    start = time.perf_counter()
+    vertices = read_truth_vertices(args.input)
+    read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = densities(vertices, args.windows, args.time_window)
+    computed = time.perf_counter() - start
+    print(
+        f"{len(table)} events, {len(vertices['z'])} truth vertices: "
+        f"read {read:.2f} s, densities {computed:.3f} s"
+    )
+    print(table.describe().T.to_string(float_format=lambda x: f"{x:.3f}"))
+
+    if args.table:
+        table.to_csv(args.table)
+    if args.vertexing:
+        plot(table, args.vertexing, args.variables, args.output)
@@ -0,0 +1,286 @@
+"""ONNX inference settings for the ML seed filter and ambiguity solver.
+
+The ACTS ML algorithms create their ONNX runtime session in C++ with the
+runtime's default options: an intra-op pool as large as the machine per
+session, used by every event thread at once. Their Python configs have no
+session options, so `full_chain_odd.py` cannot set any of the following;
+this module reproduces the load with onnxruntime in Python to measure
+what a change on the ACTS side would bring:
+
+- intra-op and inter-op thread counts of the session;
+- one session shared by all event threads, or one per thread;
+- batching the calls of concurrent event threads into one inference.
+
+`odd-analysis onnx-benchmark` runs a model from several caller threads
+(standing in for the sequencer threads) with every combination, and
+records the time of each inference call and the rows per second. The one
+setting the chain does have is the number of event threads, `--threads`
+of `full_chain_odd.py`: with several caller counts, the `shared` session
+with intra-op 0 is what the chain runs today at each of them.
+"""
+
+import json
+import itertools
+import time
+import queue
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+def session_options(intra=0, inter=0):
+    """Session options, 0 threads is the runtime default."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra
+    options.inter_op_num_threads = inter
+    options.execution_mode = (
+        ort.ExecutionMode.ORT_PARALLEL
+        if inter > 1
+        else ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    return options
+
+
+class CallTimer:
+    """Durations of inference calls, safe to use from several threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = []
+        self.rows = 0
+
+    def reset(self):
+        with self._lock:
+            self.seconds = []
+            self.rows = 0
+
+    def record(self, seconds, rows):
+        with self._lock:
+            self.seconds.append(seconds)
+            self.rows += rows
+
+    def summary(self):
+        seconds = np.array(self.seconds)
+        if not len(seconds):
+            return {"calls": 0}
+        return {
+            "calls": len(seconds),
+            "rows": self.rows,
+            "total_s": float(seconds.sum()),
+            "mean_s": float(seconds.mean()),
+            "p50_s": float(np.percentile(seconds, 50)),
+            "p99_s": float(np.percentile(seconds, 99)),
+        }
+
+
+class SharedSession:
+    """One session for all threads, `run` is thread-safe in onnxruntime."""
+
+    def __init__(self, model, options):
+        import onnxruntime as ort
+
+        self.session = ort.InferenceSession(
+            str(model), options, providers=["CPUExecutionProvider"]
+        )
+        self.timer = CallTimer()
+
+    def run(self, inputs):
+        start = time.perf_counter()
+        outputs = self.session.run(None, inputs)
+        self.timer.record(time.perf_counter() - start, _rows(inputs))
+        return outputs
+
+    def close(self):
+        pass
+
+
+class PerThreadSession:
+    """A session of its own for every calling thread."""
+
+    def __init__(self, model, options):
+        self.model = model
+        self.options = options
+        self.timer = CallTimer()
+        self._local = threading.local()
+
+    def run(self, inputs):
+        import onnxruntime as ort
+
+        if not hasattr(self._local, "session"):
+            self._local.session = ort.InferenceSession(
+                str(self.model), self.options, providers=["CPUExecutionProvider"]
+            )
+        start = time.perf_counter()
+        outputs = self._local.session.run(None, inputs)
+        self.timer.record(time.perf_counter() - start, _rows(inputs))
+        return outputs
+
+    def close(self):
+        pass
+
+
+class BatchingSession:
+    """Join the calls of concurrent threads into one inference.
+
+    A worker takes the waiting calls, up to `max_batch` rows or what
+    arrived within `max_delay` seconds, concatenates their inputs along the
+    first axis, runs them at once and hands every caller its rows of the
+    outputs. The timer records the joint inference calls.
+    """
+
+    def __init__(self, model, options, max_batch=65536, max_delay=0.002):
+        self._shared = SharedSession(model, options)
+        self.timer = self._shared.timer
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def run(self, inputs):
+        done = threading.Event()
+        call = {"inputs": inputs, "done": done}
+        self._queue.put(call)
+        done.wait()
+        if "error" in call:
+            raise call["error"]
+        return call["outputs"]
+
+    def _work(self):
+        while True:
+            call = self._queue.get()
+            if call is None:
+                return
+            calls = [call]
+            rows = _rows(call["inputs"])
+            deadline = time.perf_counter() + self.max_delay
+            while rows < self.max_batch:
+                try:
+                    call = self._queue.get(
+                        timeout=max(deadline - time.perf_counter(), 0)
+                    )
+                except queue.Empty:
+                    break
+                if call is None:
+                    self._queue.put(None)
+                    break
+                calls.append(call)
+                rows += _rows(call["inputs"])
+            self._run(calls)
+
+    def _run(self, calls):
+        names = list(calls[0]["inputs"])
+        sizes = [_rows(call["inputs"]) for call in calls]
+        inputs = {
+            name: np.concatenate([call["inputs"][name] for call in calls])
+            for name in names
+        }
+        try:
+            outputs = self._shared.run(inputs)
+        except Exception as e:
+            for call in calls:
+                call["error"] = e
+                call["done"].set()
+            return
+        bounds = np.cumsum([0] + sizes)
+        for call, start, stop in zip(calls, bounds[:-1], bounds[1:]):
+            call["outputs"] = [output[start:stop] for output in outputs]
+            call["done"].set()
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+
+modes = {
+    "shared": SharedSession,
+    "per-thread": PerThreadSession,
+    "batched": BatchingSession,
+}
+
+
+def _rows(inputs):
+    return len(next(iter(inputs.values())))
+
+
+def synthetic_inputs(model, rows, rng):
+    """Random inputs for `model` with `rows` in the dynamic first dimension."""
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(model), providers=["CPUExecutionProvider"])
+    inputs = {}
+    for spec in session.get_inputs():
+        shape = [rows] + [d if isinstance(d, int) else 1 for d in spec.shape[1:]]
+        dtype = np.float32 if "float" in spec.type else np.int64
+        inputs[spec.name] = rng.normal(size=shape).astype(dtype)
+    return inputs
+
+
+def measure(model, mode, intra, inter, callers, calls, rows, seed=0):
+    """Run `calls` inferences from each of `callers` threads."""
+    inputs = synthetic_inputs(model, rows, np.random.default_rng(seed))
+    session = modes[mode](model, session_options(intra, inter))
+    # the first call of a session allocates its buffers
+    session.run(inputs)
+    session.timer.reset()
+
+    latencies = CallTimer()
+
+    def caller():
+        for _ in range(calls):
+            start = time.perf_counter()
+            session.run(inputs)
+            latencies.record(time.perf_counter() - start, rows)
+
+    threads = [threading.Thread(target=caller) for _ in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    session.close()
+
+    return {
+        "model": str(model),
+        "mode": mode,
+        "intra_op_threads": intra,
+        "inter_op_threads": inter,
+        "callers": callers,
+        "rows_per_call": rows,
+        "wall_s": wall,
+        "rows_per_s": callers * calls * rows / wall,
+        # as seen by the event thread, including waiting for a batch
+        "event_call": latencies.summary(),
+        # the inference calls onnxruntime ran
+        "inference": session.timer.summary(),
+    }
+
+
+def run(args):
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+    results = args.work_dir / "onnx_benchmark.jsonl"
+
+    for model, callers in itertools.product(args.models, args.callers):
+        best = None
+        print(f"{model} ({callers} event threads, {args.rows} rows per call)")
+        for mode, intra, inter in itertools.product(args.modes, args.intra, args.inter):
+            record = measure(model, mode, intra, inter, callers, args.calls, args.rows)
+            with open(results, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            print(
+                f"  {mode:<10} intra {intra:3d} inter {inter:3d}  "
+                f"{record['rows_per_s']:12.0f} rows/s  "
+                f"call p50 {1e3 * record['event_call']['p50_s']:8.2f} ms  "
+                f"p99 {1e3 * record['event_call']['p99_s']:8.2f} ms"
+            )
+            if best is None or record["rows_per_s"] > best["rows_per_s"]:
+                best = record
+        print(
+            f"  fastest: {best['mode']}, intra-op {best['intra_op_threads']}, "
+            f"inter-op {best['inter_op_threads']} threads"
+        )
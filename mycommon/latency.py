@@ -0,0 +1,206 @@
+"""Per-event, per-algorithm latency of the full chain.
+
+`TimedSequencer` wraps the sequencer like `ScopedSequencer` does and puts a
+small Python algorithm (a probe) after every algorithm added through it.
+Algorithms of one event run one after the other, so the time between a
+probe and the one before it is the latency of the algorithm in between.
+The probes only take a timestamp; the differences are formed when the run
+ends and written to `latency.csv` with one row per event and algorithm.
+
+The probes are Python algorithms and take the GIL. With several threads
+they wait on each other, and the latencies come out higher than those of
+the algorithms alone. Measure with one thread; the thread count of the run
+is kept in `latency.csv` and shown next to the results.
+
+Without `per_algorithm` only the start and the end of every event get a
+probe, which is enough for the progress counters of `Telemetry`.
+
+The per-event counters (particles, measurements, seeds, tracks, vertices)
+are read afterwards from the chain outputs, see `event_counters`.
+"""
+
+import time
+import threading
+from pathlib import Path
+
+import numpy as np
+
+latency_name = "latency.csv"
+
+# per-event counters from the chain outputs: file (glob) below the output
+# directory, tree, event number branch and, for trees with one entry per
+# event, the per-object branch to count (`None`: one entry per object)
+counter_sources = {
+    "particles": ("particles_simulation.root", "particles", "event_id", "particle_id"),
+    "measurements": ("measurements.root", "measurements", "event_nr", None),
+    "seeds": ("estimatedparams.root", "estimatedparams", "event_nr", None),
+    "tracks": ("tracksummary_ckf.root", "tracksummary", "event_nr", "nMeasurements"),
+}
+
+
+def _probe_type():
+    import acts.examples
+
+    class LatencyProbe(acts.examples.IAlgorithm):
+        def __init__(self, name, level, recorder, position):
+            acts.examples.IAlgorithm.__init__(self, name=name, level=level)
+            self.recorder = recorder
+            self.position = position
+
+        def execute(self, context):
+            self.recorder.stamp(context.eventNumber, self.position)
+            return acts.examples.ProcessCode.SUCCESS
+
+    return LatencyProbe
+
+
+class TimedSequencer:
+    """Sequencer view timing every algorithm added through it per event.
+
+    `run` runs the wrapped sequencer and writes `latency.csv` to `output`
+    (unless it is `None`). While running, `started`, `completed` and
+    `totals` (seconds per algorithm position, summed over events) are kept
+    up to date for monitoring. Without `per_algorithm` the whole event is
+    one position.
+    """
+
+    def __init__(self, sequencer, output, per_algorithm=True):
+        self._sequencer = sequencer
+        self.output = Path(output) if output is not None else None
+        self.per_algorithm = per_algorithm
+        self.labels = ["start"]
+        self.started = 0
+        self.completed = 0
+        self.totals = {}
+        self._stamps = {}
+        self._lock = threading.Lock()
+        self._probe = _probe_type()
+        self._addProbe()
+
+    def __getattr__(self, attr):
+        return getattr(self._sequencer, attr)
+
+    def _addProbe(self):
+        position = len(self.labels) - 1
+        self._sequencer.addAlgorithm(
+            self._probe(
+                f"LatencyProbe{position}",
+                self._sequencer.config.logLevel,
+                self,
+                position,
+            )
+        )
+
+    def stamp(self, event, position):
+        now = time.perf_counter()
+        with self._lock:
+            stamps = self._stamps.setdefault(event, {})
+            stamps[position] = now
+            if position == 0:
+                self.started += 1
+            elif position - 1 in stamps:
+                self.totals[position] = (
+                    self.totals.get(position, 0.0) + now - stamps[position - 1]
+                )
+            if position == len(self.labels) - 1:
+                self.completed += 1
+
+    def addAlgorithm(self, algorithm):
+        self._sequencer.addAlgorithm(algorithm)
+        if self.per_algorithm:
+            self.labels.append(type(algorithm).__name__)
+            self._addProbe()
+
+    def run(self):
+        if not self.per_algorithm:
+            self.labels.append("event")
+            self._addProbe()
+        self._sequencer.run()
+        if self.output is not None:
+            self.write()
+
+    def snapshot(self):
+        """`(started, completed, {label: seconds})` of the events so far."""
+        with self._lock:
+            totals = {
+                f"{position:03d}_{self.labels[position]}": seconds
+                for position, seconds in sorted(self.totals.items())
+            }
+            return self.started, self.completed, totals
+
+    def write(self):
+        self.output.mkdir(parents=True, exist_ok=True)
+        with open(self.output / latency_name, "w") as f:
+            f.write(f"# threads {self._sequencer.config.numThreads}\n")
+            f.write("event,position,algorithm,seconds\n")
+            for event in sorted(self._stamps):
+                stamps = self._stamps[event]
+                for position in range(1, len(self.labels)):
+                    if position in stamps and position - 1 in stamps:
+                        seconds = stamps[position] - stamps[position - 1]
+                        f.write(
+                            f"{event},{position},{self.labels[position]},{seconds:.9f}\n"
+                        )
+
+
+def read_latency(output):
+    """Latency per event (rows) and algorithm (columns) as a DataFrame.
+
+    `attrs["threads"]` is the thread count of the run, `None` if unknown.
+    """
+    import pandas as pd
+
+    path = Path(output) / latency_name
+    with open(path) as f:
+        first = f.readline().split()
+    threads = int(first[2]) if first[:2] == ["#", "threads"] else None
+
+    latency = pd.read_csv(path, comment="#")
+    latency["algorithm"] = (
+        latency["position"].astype(str).str.zfill(3) + "_" + latency["algorithm"]
+    )
+    latency = latency.pivot(index="event", columns="algorithm", values="seconds")
+    latency.attrs["threads"] = threads
+    return latency
+
+
+def _count(path, tree, event_branch, per_object):
+    import uproot
+    import awkward as ak
+
+    with uproot.open(path) as f:
+        if tree not in f:
+            return None
+        t = f[tree]
+        if per_object is None:
+            events = t[event_branch].array(library="np")
+            numbers, counts = np.unique(events, return_counts=True)
+            return dict(zip(numbers.tolist(), counts.tolist()))
+        arrays = t.arrays([event_branch, per_object])
+        counts = ak.to_numpy(ak.num(arrays[per_object], axis=1))
+        return dict(zip(ak.to_numpy(arrays[event_branch]).tolist(), counts.tolist()))
+
+
+def event_counters(output):
+    """Per-event object counts from the chain outputs below `output`.
+
+    Returns `{counter: {event: count}}` for the sources found, plus
+    `vertices_<finder>` from the `nRecoVtx` of every vertexing output.
+    """
+    from .vertexing import read_events
+
+    output = Path(output)
+    counters = {}
+    for name, (pattern, tree, event_branch, per_object) in counter_sources.items():
+        for path in sorted(output.glob(pattern)):
+            counts = _count(path, tree, event_branch, per_object)
+            if counts is not None:
+                counters[name] = counts
+                break
+
+    for path in sorted(output.glob("vertex_*/performance_vertexing.root")):
+        vertexing = read_events(path, ["nRecoVtx"])
+        counters[f"vertices_{path.parent.name[len('vertex_'):]}"] = dict(
+            zip(vertexing["event_nr"].tolist(), vertexing["nRecoVtx"].tolist())
+        )
+    return counters
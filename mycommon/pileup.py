@@ -0,0 +1,332 @@
+"""Pile-up from a pre-generated library of minimum-bias events.
+
+Instead of running Pythia8 `npileup` times per hard-scatter event, the
+minimum-bias events are generated (and possibly simulated) once and stored
+as a library: per table (generated particles, or simulated hits and
+particles) one memory-mapped `.npy` file per column plus the event offsets,
+so any event is a slice that can be read without touching the others.
+Overlaying then only samples a Poisson number of library events per
+hard-scatter event, moves each to a vertex drawn from the beam spot and
+appends it to the hard-scatter tables.
+
+Events are exchanged with ACTS as the per-event CSV files of its CSV
+writers and readers (positions in mm, times in ns). ACTS has no CSV vertex
+reader, so the truth vertices of the overlaid events, which the vertex
+finders and their performance writer need, are built from the particles
+and written to `vertices.root` in the layout of the ACTS vertex writer.
+"""
+
+import re
+import json
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+from .seeds import event_rng
+
+index_name = "index.json"
+vertices_name = "vertices.root"
+
+# columns moved with the pile-up vertex (x, y, z, t) per table. Simulated
+# hits only move in time: moving them in z would take endcap hits off their
+# sensors, so the hit library is simulated with the beam spot spread in z
+# and keeps the z of its own vertices.
+vertex_columns = {
+    "particles": {"vx": 0, "vy": 1, "vz": 2, "vt": 3},
+    "particles_simulated": {"vt": 3},
+    "hits": {"tt": 3},
+}
+
+# Barcode layout of ACTS particle ids, the primary vertex is in the top bits
+_vertex_primary_shift = 52
+_vertex_primary_mask = (1 << 12) - 1
+_vertex_secondary_shift = 40
+_vertex_secondary_mask = (1 << 12) - 1
+_generation_shift = 16
+_generation_mask = (1 << 8) - 1
+# the vertex barcode is the particle barcode with the particle (bits 24-39)
+# and sub-particle (bits 0-15) numbers cleared
+_vertex_id_mask = ((1 << 64) - 1) ^ (((1 << 16) - 1) << 24) ^ ((1 << 16) - 1)
+
+
+def csv_events(directory, stem="particles"):
+    """`(event number, path)` of the per-event CSV files in `directory`."""
+    pattern = re.compile(rf"event(\d+)-{re.escape(stem)}\.csv")
+    events = []
+    for path in Path(directory).iterdir():
+        match = pattern.fullmatch(path.name)
+        if match is not None:
+            events.append((int(match.group(1)), path))
+    return sorted(events)
+
+
+def csv_path(directory, event, stem="particles"):
+    return Path(directory) / f"event{event:09d}-{stem}.csv"
+
+
+def vertex_primary(particle_id):
+    return (particle_id >> _vertex_primary_shift) & _vertex_primary_mask
+
+
+def vertex_secondary(particle_id):
+    return (particle_id >> _vertex_secondary_shift) & _vertex_secondary_mask
+
+
+def generation(particle_id):
+    return (particle_id >> _generation_shift) & _generation_mask
+
+
+def with_vertex_primary(particle_id, value):
+    keep = np.uint64((1 << _vertex_primary_shift) - 1)
+    return (particle_id & keep) | (
+        value.astype(np.uint64) << np.uint64(_vertex_primary_shift)
+    )
+
+
+def truth_vertices(particles):
+    """Truth vertices of the generated particles of one event.
+
+    One vertex per vertex barcode of the particles of generation 0, at the
+    position of its first particle and with all of them as outgoing
+    particles. Particles created in the simulation are left out, their
+    vertices are not generator vertices.
+    """
+    pid = np.asarray(particles["particle_id"]).astype(np.uint64)
+    keep = generation(pid) == 0
+    pid = pid[keep]
+    vertex_id = pid & np.uint64(_vertex_id_mask)
+    order = np.argsort(vertex_id, kind="stable")
+    vertex_id, first, counts = np.unique(
+        vertex_id[order], return_index=True, return_counts=True
+    )
+    vertices = {
+        column: np.asarray(particles[column])[keep][order][first]
+        for column in ["vx", "vy", "vz", "vt"]
+    }
+    vertices["vertex_id"] = vertex_id
+    vertices["vertex_primary"] = vertex_primary(vertex_id)
+    vertices["vertex_secondary"] = vertex_secondary(vertex_id)
+    vertices["outgoing_particles"] = np.split(pid[order], np.cumsum(counts)[:-1])
+    return vertices
+
+
+class TruthVertexWriter:
+    """`vertices` tree in the layout of the ACTS `RootVertexWriter`.
+
+    `RootVertexReader` reads it back onto the whiteboard. Entries are
+    written in event order and event numbers without `write` get an empty
+    entry, so the entry number is the event number.
+    """
+
+    def __init__(self, path, tree="vertices"):
+        import ROOT
+
+        vector = ROOT.std.vector
+        self._file = ROOT.TFile(str(path), "RECREATE")
+        self._tree = ROOT.TTree(tree, tree)
+        self._event_id = array("I", [0])
+        self._tree.Branch("event_id", self._event_id, "event_id/i")
+        self._columns = {
+            "vertex_id": vector("std::uint64_t")(),
+            "process": vector("std::uint32_t")(),
+            "vx": vector("float")(),
+            "vy": vector("float")(),
+            "vz": vector("float")(),
+            "vt": vector("float")(),
+            "incoming_particles": vector("std::vector<std::uint64_t>")(),
+            "outgoing_particles": vector("std::vector<std::uint64_t>")(),
+            "vertex_primary": vector("std::uint32_t")(),
+            "vertex_secondary": vector("std::uint32_t")(),
+            "generation": vector("std::uint32_t")(),
+        }
+        for name, column in self._columns.items():
+            self._tree.Branch(name, column)
+        self._next = 0
+
+    def write(self, event, vertices):
+        """Write the `truth_vertices` of `event`."""
+        while self._next < event:
+            self._fill(self._next, None)
+        self._fill(event, vertices)
+
+    def _fill(self, event, vertices):
+        self._event_id[0] = event
+        for column in self._columns.values():
+            column.clear()
+        if vertices is not None:
+            n = len(vertices["vertex_id"])
+            for name, column in self._columns.items():
+                if name in ("process", "generation"):
+                    values = [0] * n
+                elif name == "incoming_particles":
+                    values = [[]] * n
+                elif name == "outgoing_particles":
+                    values = [ids.tolist() for ids in vertices[name]]
+                else:
+                    values = vertices[name].tolist()
+                column.reserve(n)
+                for value in values:
+                    column.push_back(value)
+        self._tree.Fill()
+        self._next = event + 1
+
+    def close(self):
+        self._file.cd()
+        self._tree.Write()
+        self._file.Close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_library(csv_dir, library_dir, stems=("particles",)):
+    """Convert per-event CSV files into a random access library.
+
+    The events are the ones with a file of the first of `stems`, which has
+    to be a particle table.
+    """
+    import pandas as pd
+
+    events = csv_events(csv_dir, stems[0])
+    if not events:
+        raise ValueError(f"no event*-{stems[0]}.csv files in {csv_dir}")
+
+    library_dir = Path(library_dir)
+    index = {"events": len(events), "source": str(Path(csv_dir).resolve())}
+    index["tables"] = {}
+    for stem in stems:
+        frames = [pd.read_csv(csv_path(csv_dir, event, stem)) for event, _ in events]
+        counts = np.array([len(frame) for frame in frames], dtype=np.int64)
+        rows = pd.concat(frames, ignore_index=True)
+
+        table_dir = library_dir / stem
+        table_dir.mkdir(parents=True, exist_ok=True)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        np.save(table_dir / "offsets.npy", offsets)
+        for column in rows.columns:
+            np.save(table_dir / f"{column}.npy", rows[column].to_numpy())
+
+        index["tables"][stem] = {
+            "rows": int(offsets[-1]),
+            "columns": list(rows.columns),
+        }
+
+    with open(library_dir / index_name, "w") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def open_library(library_dir):
+    """The index and memory-mapped `offsets` and `columns` of every table."""
+    library_dir = Path(library_dir)
+    with open(library_dir / index_name) as f:
+        index = json.load(f)
+    tables = {}
+    for stem, table in index["tables"].items():
+        tables[stem] = {
+            "offsets": np.load(library_dir / stem / "offsets.npy"),
+            "columns": {
+                column: np.load(library_dir / stem / f"{column}.npy", mmap_mode="r")
+                for column in table["columns"]
+            },
+        }
+    return {"index": index, "tables": tables}
+
+
+def _take(table, chosen):
+    """Rows of the `chosen` events and the position in `chosen` of each."""
+    starts = table["offsets"][chosen]
+    counts = table["offsets"][chosen + 1] - starts
+    event = np.repeat(np.arange(len(chosen)), counts)
+    rows = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows += np.repeat(starts, counts)
+    return {c: np.asarray(v[rows]) for c, v in table["columns"].items()}, event
+
+
+def sample_pileup(library, rng, mu, vertex_stddev, first_vertex=1):
+    """All tables of a Poisson(`mu`) number of library events.
+
+    Every event is moved to its own vertex drawn from a Gaussian with
+    `vertex_stddev` (x, y, z in mm, t in ns) around the origin, see
+    `vertex_columns`, and its primary vertex ids are renumbered to follow on
+    `first_vertex`. Returns `{stem: {column: array}}`.
+
+    The events of one bunch crossing are drawn without replacement, so the
+    library needs more events than the largest Poisson draw.
+    """
+    tables = library["tables"]
+    events = library["index"]["events"]
+    n = rng.poisson(mu)
+    if n > events:
+        raise ValueError(
+            f"drew {n} pile-up events at mu={mu} but the library has only "
+            f"{events}, build a larger one"
+        )
+    chosen = rng.choice(events, n, replace=False)
+    vertices = rng.normal(0.0, vertex_stddev, size=(n, 4))
+
+    sampled = {stem: _take(table, chosen) for stem, table in tables.items()}
+
+    # library events are generated alone, their primary vertices start at 1;
+    # the first table holds the particles of all of them
+    particles, event = next(iter(sampled.values()))
+    per_event = np.zeros(n, dtype=np.int64)
+    np.maximum.at(
+        per_event, event, vertex_primary(particles["particle_id"].astype(np.uint64))
+    )
+    shift = first_vertex - 1 + np.cumsum(per_event) - per_event
+
+    result = {}
+    for stem, (columns, event) in sampled.items():
+        for column, component in vertex_columns.get(stem, {}).items():
+            columns[column] = columns[column] + vertices[event, component]
+        pid = columns["particle_id"].astype(np.uint64)
+        columns["particle_id"] = with_vertex_primary(
+            pid, vertex_primary(pid).astype(np.int64) + shift[event]
+        )
+        result[stem] = columns
+    return result
+
+
+def overlay(hard_scatter_dir, library_dir, output_dir, mu, vertex_stddev, seed):
+    """Write the hard scatter plus sampled pile-up for every event.
+
+    Every table of the library is combined with the hard-scatter file of
+    the same stem, and the truth vertices of the combined particles go to
+    `vertices.root`. The random numbers of an event only depend on `seed`
+    and the event number, so a sub-range of events gives the same pile-up
+    as a full run.
+    """
+    import pandas as pd
+
+    library = open_library(library_dir)
+    stems = list(library["tables"])
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    with TruthVertexWriter(output_dir / vertices_name) as vertex_writer:
+        for event, _ in csv_events(hard_scatter_dir, stems[0]):
+            hard_scatter = {
+                stem: pd.read_csv(csv_path(hard_scatter_dir, event, stem))
+                for stem in stems
+            }
+            pid = hard_scatter[stems[0]]["particle_id"].to_numpy(np.uint64)
+            first_vertex = int(vertex_primary(pid).max()) + 1
+
+            rng = event_rng(seed, event)
+            pileup = sample_pileup(library, rng, mu, vertex_stddev, first_vertex)
+            for stem in stems:
+                combined = pd.concat(
+                    [
+                        hard_scatter[stem],
+                        pd.DataFrame(pileup[stem])[hard_scatter[stem].columns],
+                    ]
+                )
+                combined.to_csv(csv_path(output_dir, event, stem), index=False)
+                if stem == stems[0]:
+                    vertex_writer.write(event, truth_vertices(combined))
@@ -0,0 +1,5 @@
+"""Plot implementations behind the ``odd-analysis`` subcommands.
+
+Each module exposes ``run(args)`` and is only imported by
+:mod:`mycommon.cli` once its subcommand is selected.
+"""
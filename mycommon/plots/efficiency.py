@@ -0,0 +1,45 @@
+from pathlib import Path
+import matplotlib.pyplot as plt
+
+columns = [
+    "nRecoVtx",
+    "nMergedVtx",
+    "nSplitVtx",
+    "nTrueVtx",
+    "nVtxReconstructable",
+]
+
+efficiency_range = (0, 1)
+
+
+def run(args):
+    from ..vertexing import read_events
+
+    event_label = Path(args.input[0]).parent.parent.name
+
+    fig = plt.figure("vertex pulls", figsize=(8, 6))
+    fig.suptitle(f"Vertex efficiency for {event_label}")
+    axs = fig.subplots(3, 1, sharex=True)
+
+    for input in args.input:
+        vertexing = read_events(input, columns, library="pd")
+
+        for ax, column in zip(axs, ["nRecoVtx", "nMergedVtx", "nSplitVtx"]):
+            ax.hist(
+                vertexing[column] / vertexing["nVtxReconstructable"],
+                30,
+                range=efficiency_range,
+                density=True,
+                histtype="step",
+                label=Path(input).parent.name,
+            )
+
+    for ax, xlabel in zip(axs, ["Reconstruction rate", "Merging rate", "Splitting rate"]):
+        ax.legend()
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel("a.u.")
+
+    if args.output:
+        fig.savefig(args.output)
+    else:
+        plt.show()
@@ -0,0 +1,120 @@
+from pathlib import Path
+import numpy as np
+import matplotlib.pyplot as plt
+
+from ..cache import cached_summary
+from ..labels import get_event_details
+
+columns = [
+    "nRecoVtx",
+    "nMergedVtx",
+    "nSplitVtx",
+    "nTrueVtx",
+    "nVtxReconstructable",
+]
+
+
+def summarize(input):
+    # only needed when there is no cached summary for this input
+    from ..vertexing import read_events
+
+    data = read_events(input, columns, library="pd")
+
+    return {
+        "n_true": float(data["nTrueVtx"].mean()),
+        "n_reconstructable": float(data["nVtxReconstructable"].mean()),
+        "n_reco": float(data["nRecoVtx"].mean()),
+        "n_reco_err": float(data["nRecoVtx"].std()),
+        "n_merged": float(data["nMergedVtx"].mean()),
+        "n_merged_err": float(data["nMergedVtx"].std()),
+        "n_split": float(data["nSplitVtx"].mean()),
+        "n_split_err": float(data["nSplitVtx"].std()),
+    }
+
+
+def run(args):
+    assert (
+        len(args.inputs_tvf) == len(args.inputs_wot) == len(args.inputs_wt)
+    ), "equal number of inputs required"
+
+    event_label = Path(args.inputs_wot[0]).parent.parent.name
+    event_type, _ = get_event_details(event_label)
+
+    inputs = {
+        "without time": args.inputs_wot,
+        "with time": args.inputs_wt,
+        "gauss": args.inputs_gauss,
+        "truth": args.inputs_tvf,
+        "ivf": args.inputs_ivf,
+    }
+
+    fig = plt.figure("Vertex efficiency over PU", figsize=(8, 6))
+    fig.suptitle(f"Vertex efficiency for {event_type} over PU")
+    axs = fig.subplots(3, 1, sharex=True)
+
+    for input_type, inputs_list in inputs.items():
+        pus = []
+        summaries = []
+        for input in inputs_list:
+            event_label = Path(input).parent.parent.name
+            pus.append(get_event_details(event_label)[1]["pu"])
+            summaries.append(
+                cached_summary(
+                    input, "efficiency_over_pu/2", summarize, args.cache_dir
+                )
+            )
+
+        pus = np.array(pus)
+        data = {
+            key: np.array([summary[key] for summary in summaries])
+            for key in summaries[0]
+        }
+
+        axs[0].errorbar(
+            pus,
+            data["n_reco"],
+            data["n_reco_err"],
+            marker="o",
+            linestyle="",
+            alpha=0.5,
+            label=f"{input_type}",
+        )
+        axs[1].errorbar(
+            pus,
+            data["n_merged"],
+            marker="o",
+            linestyle="",
+            alpha=0.5,
+            label=f"{input_type}",
+        )
+        axs[2].errorbar(
+            pus,
+            data["n_split"],
+            marker="o",
+            linestyle="",
+            alpha=0.5,
+            label=f"{input_type}",
+        )
+
+    # optimal: every PU vertex plus the HS vertex is found, nothing merged or split
+    axs[0].plot(pus, pus + 1, linestyle="--", color="black", label="optimal")
+    axs[1].plot(pus, np.zeros(pus.shape), linestyle="--", color="black", label="optimal")
+    axs[2].plot(pus, np.zeros(pus.shape), linestyle="--", color="black", label="optimal")
+
+    axs[0].grid()
+    axs[0].legend()
+    axs[0].set_ylabel("Reconstructed vertices")
+
+    axs[1].grid()
+    axs[1].legend()
+    axs[1].set_ylabel("Merged vertices")
+
+    axs[2].grid()
+    axs[2].legend()
+    axs[2].set_xlabel("PU")
+    axs[2].set_ylabel("Split vertices")
+
+    if args.output:
+        fig.savefig(args.output)
+    else:
+        plt.show()
@@ -0,0 +1,81 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from ..chainspec import read_manifest
+from ..latency import read_latency, event_counters
+
+
+def run(args):
+    latency = read_latency(args.input)
+    threads = latency.attrs["threads"]
+    # the probes take the GIL, with several threads they also time the wait
+    bias = (
+        ""
+        if threads == 1
+        else f", measured with {threads or 'unknown'} threads: the latencies "
+        "include the probes waiting for the GIL, rerun with --threads 1"
+    )
+    total = latency.sum(axis=1)
+    threshold = np.percentile(total, args.percentile)
+
+    counters = pd.DataFrame(event_counters(args.input))
+    events = latency.join(counters).assign(total=total)
+    slow = events[events["total"] > threshold].sort_values("total", ascending=False)
+
+    manifest = read_manifest(args.input)
+    seed = manifest["spec"]["run"]["seed"] if manifest is not None else None
+
+    print(
+        f"{len(total)} events, median {np.median(total):.3g} s, "
+        f"{args.percentile}th percentile {threshold:.3g} s, {len(slow)} above"
+        f"{bias}"
+    )
+    print(latency.median().sort_values(ascending=False).head(10).to_string())
+
+    replay = Path(args.replay_list or Path(args.input) / "slow_events.txt")
+    with open(replay, "w") as f:
+        f.write(
+            f"# events above the {args.percentile}th percentile of the per-event "
+            f"latency ({threshold:.3g} s), run seed {seed}{bias}\n"
+        )
+        for event in slow.index:
+            f.write(f"{event}\n")
+    with open(replay.with_suffix(".jsonl"), "w") as f:
+        for event, row in slow.iterrows():
+            record = {"event": int(event), "seed": seed, "threads": threads}
+            record.update({k: None if pd.isna(v) else v for k, v in row.items()})
+            f.write(json.dumps(record) + "\n")
+    print(f"Replay list: {replay}")
+
+    fig = plt.figure("Per-event latency", figsize=(12, 5))
+    ax_total, ax_algorithms = fig.subplots(1, 2)
+
+    bins = np.geomspace(max(total.min(), 1e-6), total.max(), 50)
+    ax_total.hist(total, bins=bins, histtype="step")
+    ax_total.axvline(threshold, linestyle="--", color="gray")
+    ax_total.set_xscale("log")
+    ax_total.set_yscale("log")
+    ax_total.set_xlabel("event latency [s]")
+    ax_total.set_ylabel("events")
+
+    slowest = latency.median().sort_values(ascending=False).index[: args.algorithms]
+    bins = np.geomspace(
+        max(latency[slowest].min().min(), 1e-6), latency[slowest].max().max(), 50
+    )
+    for algorithm in slowest:
+        ax_algorithms.hist(
+            latency[algorithm], bins=bins, histtype="step", label=algorithm
+        )
+    ax_algorithms.set_xscale("log")
+    ax_algorithms.set_yscale("log")
+    ax_algorithms.set_xlabel("algorithm latency per event [s]")
+    ax_algorithms.legend(fontsize="small")
+
+    if args.output:
+        fig.savefig(args.output)
+    else:
+        plt.show()
@@ -0,0 +1,294 @@
+from pathlib import Path
+import numpy as np
+import matplotlib.pyplot as plt
+
+from ..cache import cached_summary
+from ..labels import get_event_details
+
+variable_types = ["x", "y", "z", "t"]
+
+residuals = ["resX", "resY", "resZ", "resT"]
+pulls = ["pullX", "pullY", "pullZ", "pullT"]
+columns = (
+    [
+        "vertex_primary",
+        "vertex_secondary",
+        "nTrueVtx",
+        "recoVertexClassification",
+        "truthPrimaryVertexDensity",
+        "recoVertexContamination",
+    ]
+    + residuals
+    + pulls
+)
+
+
+def read_hs_vertices(input, classified=True):
+    # only needed when there is no cached summary for this input
+    import uproot
+
+    vertexing = uproot.open(input)["vertexing"].arrays(columns, library="pd")
+
+    # filter for first primary vertex which is the HS vertex by design
+    mask = (vertexing["vertex_primary"] == 1) & (vertexing["vertex_secondary"] == 0)
+    if classified:
+        mask &= vertexing["recoVertexClassification"] == 1
+    return vertexing[mask]
+
+
+def summarize(input, variables):
+    from ..stats import robust_gauss_fit
+
+    vertexing = read_hs_vertices(input)
+
+    summary = {}
+    for variable in variables:
+        (mu, sigma), cov = robust_gauss_fit(vertexing[variable].dropna())
+        summary[variable] = {
+            "mu": float(mu),
+            "sigma": float(sigma),
+            "sigma_err": float(cov[1, 1] ** 0.5),
+        }
+    return summary
+
+
+def split_inputs(args):
+    assert (
+        len(args.inputs_tvf) == len(args.inputs_wot) == len(args.inputs_wt)
+    ), "equal number of inputs required"
+
+    event_label = Path(args.inputs_wot[0]).parent.parent.name
+    event_type, _ = get_event_details(event_label)
+
+    inputs = {
+        "without time": args.inputs_wot,
+        "with time": args.inputs_wt,
+        "truth": args.inputs_tvf,
+    }
+    return event_type, inputs
+
+
+def fitted_variables(input_type, variables):
+    return [
+        variable
+        for variable_type, variable in zip(variable_types, variables)
+        if not (input_type == "without time" and variable_type == "t")
+    ]
+
+
+def plot_missing(ax, input_type):
+    ax.errorbar(
+        np.nan,
+        np.nan,
+        np.nan,
+        marker="o",
+        linestyle="",
+        alpha=0.5,
+        label=f"{input_type}",
+    )
+
+
+def run_fits(args, title, variables):
+    import scipy.stats
+
+    from ..stats import robust_gauss_fit
+
+    event_label = Path(args.input).parent.parent.name
+
+    vertexing = read_hs_vertices(args.input, classified=False)
+
+    fig = plt.figure(f"{title}", figsize=(12, 8))
+    fig.suptitle(f"{title} for {event_label}")
+    axs = fig.subplots(2, 2)
+    axs = [item for sublist in axs for item in sublist]
+
+    for variable, ax in zip(variables, axs):
+        data = vertexing[variable].dropna()
+        (mu, sigma), cov = robust_gauss_fit(data)
+
+        range = (mu - 5 * sigma, mu + 5 * sigma)
+
+        ax.hist(
+            vertexing[variable],
+            100,
+            range=range,
+            density=True,
+            label=variable,
+        )
+
+        x = np.linspace(range[0], range[1], 100)
+        ax.plot(
+            x,
+            scipy.stats.norm.pdf(x, mu, sigma),
+            label=f"mu={mu:.2f}, sigma={sigma:.2f}",
+        )
+
+        ax.set_title(variable)
+        ax.legend()
+
+    return fig
+
+
+def run_over_pu(args, title, variables):
+    event_type, inputs = split_inputs(args)
+
+    fig = plt.figure(f"{title} over PU", figsize=(12, 8))
+    fig.suptitle(f"{title} over PU for {event_type}")
+    axs = fig.subplots(2, 2)
+    axs = [item for sublist in axs for item in sublist]
+
+    for i, (input_type, inputs_list) in enumerate(inputs.items()):
+        fitted = fitted_variables(input_type, variables)
+
+        pus = []
+        summaries = []
+        for input in inputs_list:
+            event_label = Path(input).parent.parent.name
+            pus.append(get_event_details(event_label)[1]["pu"])
+            summaries.append(
+                cached_summary(
+                    input,
+                    ["residuals_pulls_over_pu/1", fitted],
+                    lambda input: summarize(input, fitted),
+                    args.cache_dir,
+                )
+            )
+        pus = np.array(pus)
+
+        for variable, ax in zip(variables, axs):
+            if variable not in fitted:
+                plot_missing(ax, input_type)
+                continue
+
+            sigma = np.array([summary[variable]["sigma"] for summary in summaries])
+            sigma_err = np.array(
+                [summary[variable]["sigma_err"] for summary in summaries]
+            )
+
+            ax.errorbar(
+                pus,
+                sigma,
+                sigma_err,
+                marker="o",
+                linestyle="",
+                color=f"C{i}",
+                alpha=0.5,
+                label=f"{input_type}",
+            )
+
+            if args.line_fit:
+                from ..stats import line_fit
+
+                params, cov, p_value = line_fit(pus, sigma, sigma_err)
+
+                ax.plot(
+                    pus,
+                    params[0] * pus + params[1],
+                    marker="",
+                    linestyle="--",
+                    color=f"C{i}",
+                    alpha=0.5,
+                    label=f"fit: {params[0]:.2f} * PU + {params[1]:.2f}, p-value: {p_value:.2f}",
+                )
+
+    for variable, ax in zip(variables, axs):
+        ax.set_title(variable)
+        ax.legend()
+
+    return fig
+
+
+def run_over_density(args, title, variables):
+    import pandas as pd
+    from scipy.stats import binned_statistic
+
+    from ..stats import robust_std, robust_std_std, line_fit
+
+    event_type, inputs = split_inputs(args)
+
+    fig = plt.figure(f"{title} over density", figsize=(12, 8))
+    fig.suptitle(f"{title} over density for {event_type}")
+    axs = fig.subplots(2, 2)
+    axs = [item for sublist in axs for item in sublist]
+
+    for i, (input_type, inputs_list) in enumerate(inputs.items()):
+        fitted = fitted_variables(input_type, variables)
+
+        datas = []
+        for input in inputs_list:
+            event_label = Path(input).parent.parent.name
+            vertexing = read_hs_vertices(input)
+            vertexing["pu"] = get_event_details(event_label)[1]["pu"]
+            datas.append(vertexing)
+        data = pd.concat(datas)
+
+        for variable, ax in zip(variables, axs):
+            if variable not in fitted:
+                plot_missing(ax, input_type)
+                continue
+
+            bins = 6
+            sigma, density_edges, _ = binned_statistic(
+                data["truthPrimaryVertexDensity"],
+                data[variable],
+                bins=bins,
+                range=None,
+                statistic=robust_std,
+            )
+            sigma_err, _, _ = binned_statistic(
+                data["truthPrimaryVertexDensity"],
+                data[variable],
+                bins=bins,
+                range=None,
+                statistic=robust_std_std,
+            )
+            density_mid = 0.5 * (density_edges[:-1] + density_edges[1:])
+
+            ax.errorbar(
+                density_mid,
+                sigma,
+                sigma_err,
+                marker="o",
+                linestyle="",
+                color=f"C{i}",
+                alpha=0.5,
+                label=f"{input_type}",
+            )
+
+            if args.line_fit:
+                # replace 0 with 1 to avoid division by zero
+                sigma_err[sigma_err == 0] = 1
+                params, cov, p_value = line_fit(density_mid, sigma, sigma_err)
+
+                ax.plot(
+                    density_mid,
+                    params[0] * density_mid + params[1],
+                    marker="",
+                    linestyle="--",
+                    color=f"C{i}",
+                    alpha=0.5,
+                    label=f"fit: {params[0]:.2f} * density + {params[1]:.2f}, p-value: {p_value:.2f}",
+                )
+
+    for variable, ax in zip(variables, axs):
+        ax.set_title(variable)
+        ax.legend()
+
+    return fig
+
+
+def run(args):
+    title = "Vertex resolution" if args.mode == "residual" else "Vertex pull sigma"
+    variables = residuals if args.mode == "residual" else pulls
+
+    if args.over == "fit":
+        fig = run_fits(args, title, variables)
+    elif args.over == "pu":
+        fig = run_over_pu(args, title, variables)
+    else:
+        fig = run_over_density(args, title, variables)
+
+    if args.output:
+        fig.savefig(args.output)
+    else:
+        plt.show()
@@ -0,0 +1,55 @@
+from pathlib import Path
+import numpy as np
+import matplotlib.pyplot as plt
+
+from ..cache import cached_summary
+from ..labels import get_event_details
+
+columns = [
+    "nTrueVtx",
+    "nRecoVtx",
+]
+
+
+def summarize(input):
+    # only needed when there is no cached summary for this input
+    from ..vertexing import read_events
+
+    data = read_events(input, columns)
+
+    # fraction of events with more reconstructed than true vertices
+    return {
+        "splitting_ratio": float(
+            np.sum(data["nRecoVtx"] > data["nTrueVtx"]) / len(data["nRecoVtx"])
+        ),
+    }
+
+
+def run(args):
+    result = {}
+
+    for input in args.inputs:
+        event_type, event_details = get_event_details(Path(input).parent.parent.name)
+        summary = cached_summary(
+            input, "splitting_ratio_over_pu/2", summarize, args.cache_dir
+        )
+
+        result.setdefault(event_type, []).append(
+            (event_details["pu"], summary["splitting_ratio"])
+        )
+
+    fig = plt.figure("vertex splitting ratio over PU", figsize=(12, 8))
+    fig.suptitle(f"Vertex splitting ratio over PU")
+    ax = fig.gca()
+
+    for event_type, data in result.items():
+        n, splitting_ratio = np.array(sorted(data)).T
+        ax.plot(n, splitting_ratio, marker="o", alpha=0.5, label=f"{event_type}")
+
+    # ax.set_yscale("log")
+    ax.legend()
+
+    if args.output:
+        plt.savefig(args.output)
+    else:
+        plt.show()
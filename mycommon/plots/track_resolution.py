@@ -0,0 +1,88 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+from ..track_resolution import resolution_vs_pt
+
+
+def parse_labelled(value):
+    label, _, path = value.partition("=")
+    if not path:
+        raise ValueError(f"expected LABEL=PATH, got {value}")
+    return label, path
+
+
+def parse_variable(value):
+    name, *limits = value.split(":")
+    if limits:
+        return name, (float(limits[0]), float(limits[1]))
+    return name, None
+
+
+def run(args):
+    inputs = dict(parse_labelled(value) for value in args.input)
+    variables = [parse_variable(value) for value in args.variable]
+    ranges = {name: limits for name, limits in variables if limits is not None}
+    variables = [name for name, _ in variables]
+    reference = args.reference or next(iter(inputs))
+
+    results = resolution_vs_pt(
+        inputs,
+        variables,
+        pt_edges=args.pt_bins,
+        ranges=ranges,
+        bins=args.bins,
+        jobs=args.jobs,
+        model=args.model,
+        nsigma=args.nsigma,
+        min_entries=args.min_entries,
+    )
+
+    pt_edges = np.asarray(args.pt_bins)
+    pt_mid = 0.5 * (pt_edges[1:] + pt_edges[:-1])
+    pt_err = 0.5 * (pt_edges[1:] - pt_edges[:-1])
+
+    fig = plt.figure("Track resolution over pT", figsize=(6 * len(variables), 8))
+    axs = fig.subplots(
+        2, len(variables), sharex=True, squeeze=False, height_ratios=[7, 3]
+    )
+
+    for j, variable in enumerate(variables):
+        ref = results[reference][variable]
+        for i, (label, result) in enumerate(results.items()):
+            value = result[variable][args.quantity]
+            error = result[variable].get(f"{args.quantity}_err")
+            axs[0, j].errorbar(
+                pt_mid,
+                value,
+                error,
+                pt_err,
+                marker="o",
+                linestyle="",
+                color=f"C{i}",
+                label=label,
+            )
+            if label != reference:
+                axs[1, j].errorbar(
+                    pt_mid,
+                    value / ref[args.quantity],
+                    xerr=pt_err,
+                    marker="o",
+                    linestyle="",
+                    color=f"C{i}",
+                )
+
+        axs[0, j].set_title(variable)
+        axs[0, j].set_ylabel(args.quantity)
+        axs[0, j].legend()
+        axs[0, j].grid()
+
+        axs[1, j].axhline(1, linestyle="--", color="gray")
+        axs[1, j].set_xscale("log")
+        axs[1, j].set_xlabel("t_pT [GeV]")
+        axs[1, j].set_ylabel(f"ratio to {reference}")
+        axs[1, j].grid()
+
+    if args.output:
+        fig.savefig(args.output)
+    else:
+        plt.show()
@@ -0,0 +1,173 @@
+"""Cost and saving of the ML seed filter over pile-up.
+
+For every PU the chain first runs up to digitization into a cache
+directory. Then it runs twice up to the CKF, without and with
+`--MLSeedFilter`, reusing the cached generation and simulation
+(`--reuse-from`), so both see identical hits. From the ACTS `timing.tsv`
+of the two runs it takes the seeding, seed filter and track finding
+times. The seed and track counts come from `estimatedparams.root` and
+`tracksummary_ckf.root`. The filter pays for itself where the CKF time it
+saves exceeds its own time.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from .benchmark import read_timing
+from .latency import counter_sources, _count
+
+# timing.tsv identifiers containing these belong to the stage
+stage_algorithms = {
+    "seeding": "SeedingAlgorithm",
+    "filter": "SeedFilterML",
+    "ckf": "TrackFinding",
+}
+
+
+def stage_seconds(directory):
+    timing = read_timing(Path(directory) / "timing.tsv")
+    return {
+        stage: sum(s for identifier, s in timing.items() if match in identifier)
+        for stage, match in stage_algorithms.items()
+    }
+
+
+def per_event(directory, counter):
+    pattern, tree, event_branch, per_object = counter_sources[counter]
+    paths = sorted(Path(directory).glob(pattern))
+    if not paths:
+        return None
+    counts = _count(paths[0], tree, event_branch, per_object)
+    return float(np.mean(list(counts.values()))) if counts else 0.0
+
+
+def run_chain(command, pu, output, extra):
+    subprocess.run(
+        [*command, "--ttbar", "--ttbar-pu", str(pu), "--output", str(output), *extra],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return Path(output) / f"ttbar_pu{pu}"
+
+
+def measure(command, pu, work_dir):
+    """Both runs at one PU, times in seconds per event."""
+    cache = run_chain(command, pu, work_dir / "cache", ["--last-stage", "digitization"])
+    runs = {}
+    for name, flag in [("without", "--no-MLSeedFilter"), ("with", "--MLSeedFilter")]:
+        directory = run_chain(
+            command,
+            pu,
+            work_dir / name,
+            [flag, "--last-stage", "ckf", "--reuse-from", str(cache)],
+        )
+        runs[name] = {
+            "seconds": stage_seconds(directory),
+            "seeds_per_event": per_event(directory, "seeds"),
+            "tracks_per_event": per_event(directory, "tracks"),
+        }
+    return runs
+
+
+def summarize(pu, events, runs):
+    without, with_ = runs["without"], runs["with"]
+    filter_s = with_["seconds"]["filter"] / events
+    ckf_saved = (without["seconds"]["ckf"] - with_["seconds"]["ckf"]) / events
+    return {
+        "pu": pu,
+        "events": events,
+        "seeds_per_event": without["seeds_per_event"],
+        "tracks_per_event_without": without["tracks_per_event"],
+        "tracks_per_event_with": with_["tracks_per_event"],
+        "seeding_s_per_event": without["seconds"]["seeding"] / events,
+        "filter_s_per_event": filter_s,
+        "ckf_s_per_event_without": without["seconds"]["ckf"] / events,
+        "ckf_s_per_event_with": with_["seconds"]["ckf"] / events,
+        "ckf_saved_s_per_event": ckf_saved,
+        "net_saved_s_per_event": ckf_saved - filter_s,
+        "runs": runs,
+    }
+
+
+def break_even(records):
+    """Lowest PU from which on the filter saves time, `None` if it never does."""
+    pays = [r["pu"] for r in records if r["net_saved_s_per_event"] > 0]
+    losing = [r["pu"] for r in records if r["net_saved_s_per_event"] <= 0]
+    candidates = [pu for pu in pays if all(pu > other for other in losing)]
+    return min(candidates) if candidates else None
+
+
+def plot(records, output):
+    import matplotlib.pyplot as plt
+
+    pu = np.array([r["pu"] for r in records])
+    fig = plt.figure("ML seed filter over PU", figsize=(12, 5))
+    ax_time, ax_seeds = fig.subplots(1, 2)
+
+    ms = {
+        key: 1e3 * np.array([r[key] for r in records])
+        for key in [
+            "filter_s_per_event",
+            "ckf_saved_s_per_event",
+            "ckf_s_per_event_without",
+            "ckf_s_per_event_with",
+        ]
+    }
+    ax_time.plot(pu, ms["filter_s_per_event"], marker="o", label="seed filter")
+    ax_time.plot(pu, ms["ckf_saved_s_per_event"], marker="o", label="CKF time saved")
+    ax_time.plot(
+        pu, ms["ckf_s_per_event_without"], marker=".", linestyle="--", label="CKF"
+    )
+    ax_time.plot(
+        pu,
+        ms["ckf_s_per_event_with"],
+        marker=".",
+        linestyle="--",
+        label="CKF after filter",
+    )
+    ax_time.set_xlabel("PU")
+    ax_time.set_ylabel("time per event [ms]")
+    ax_time.legend()
+    ax_time.grid()
+
+    ax_seeds.plot(pu, [r["seeds_per_event"] for r in records], marker="o")
+    ax_seeds.set_xlabel("PU")
+    ax_seeds.set_ylabel("seeds per event")
+    ax_seeds.grid()
+
+    fig.savefig(output)
+
+
+def run(args):
+    command = [sys.executable, str(args.chain), "--threads", str(args.threads)]
+    command += ["--events", str(args.events), "--skip", str(args.skip)]
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+    results = args.work_dir / "seeding_benchmark.jsonl"
+
+    records = []
+    for pu in args.pu:
+        print(f"PU {pu} ...", flush=True)
+        record = summarize(
+            pu, args.events, measure(command, pu, args.work_dir / f"pu{pu}")
+        )
+        records.append(record)
+        with open(results, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(
+            f"  {record['seeds_per_event']:10.0f} seeds/event  "
+            f"filter {1e3 * record['filter_s_per_event']:9.1f} ms  "
+            f"CKF saved {1e3 * record['ckf_saved_s_per_event']:9.1f} ms  "
+            f"net {1e3 * record['net_saved_s_per_event']:+9.1f} ms per event"
+        )
+
+    pu = break_even(records)
+    if pu is None:
+        print("The seed filter does not pay for itself in the PU range")
+    else:
+        print(f"The seed filter pays for itself from PU {pu} on")
+
+    plot(records, args.output or args.work_dir / "seed_filter.png")
@@ -0,0 +1,91 @@
+"""Helpers around `acts.examples.Sequencer` for the full chain scripts.
+
+Nothing here imports acts, algorithms are rebuilt from their own type and
+config, so the module can be imported without an ACTS environment.
+"""
+
+# config attributes starting with `input`/`output` that are not whiteboard keys
+_path_suffixes = ("Dir", "Stem", "Path", "File", "Filename", "FileName")
+
+
+class ScopedSequencer:
+    """Sequencer view that keeps the whiteboard collections of a branch apart.
+
+    Every collection written by a reader or algorithm added through the
+    scope, and every alias declared in it, gets `_<name>` appended. Inputs referring to
+    such collections are redirected, inputs produced outside of the scope
+    (measurements, particles, ...) are shared. This allows running the stock
+    `add*` helpers of `acts.examples` several times on the same events::
+
+        with ScopedSequencer(s, "proton") as sp:
+            addSeeding(sp, ..., outputDirRoot=outputDir / "proton")
+            addCKFTracks(sp, ..., outputDirRoot=outputDir / "proton")
+
+    Algorithms are rebuilt from their config at `level`. Writers are rebuilt
+    when the scope is left, after the helpers dropped their original
+    instances, so that no output file is opened twice.
+    """
+
+    def __init__(self, sequencer, name, level=None):
+        self._sequencer = sequencer
+        self.name = name
+        self.level = level if level is not None else sequencer.config.logLevel
+        self._produced = set()
+        self._writers = []
+
+    def __getattr__(self, attr):
+        return getattr(self._sequencer, attr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        writers, self._writers = self._writers, []
+        if exc_info[0] is None:
+            for writer_type, config in writers:
+                self._sequencer.addWriter(writer_type(config=config, level=self.level))
+
+    def scoped(self, key):
+        return f"{key}_{self.name}"
+
+    def _rename(self, value, output):
+        if output:
+            self._produced.add(value)
+            return self.scoped(value)
+        return self.scoped(value) if value in self._produced else value
+
+    def _rescope(self, config, outputs):
+        renamed = {}
+        for attr in dir(config):
+            if attr.startswith("_") or attr.endswith(_path_suffixes):
+                continue
+            output = outputs and attr.startswith("output")
+            if not (attr.startswith("input") or output):
+                continue
+
+            value = getattr(config, attr)
+            if isinstance(value, str) and value:
+                renamed[attr] = self._rename(value, output)
+            elif isinstance(value, list) and all(isinstance(v, str) for v in value):
+                renamed[attr] = [self._rename(v, output) for v in value if v]
+
+        for attr, value in renamed.items():
+            setattr(config, attr, value)
+        return config
+
+    def addReader(self, reader):
+        config = self._rescope(reader.config, outputs=True)
+        self._sequencer.addReader(type(reader)(config=config, level=self.level))
+
+    def addAlgorithm(self, algorithm):
+        config = self._rescope(algorithm.config, outputs=True)
+        self._sequencer.addAlgorithm(type(algorithm)(config=config, level=self.level))
+
+    def addWriter(self, writer):
+        self._writers.append(
+            (type(writer), self._rescope(writer.config, outputs=False))
+        )
+
+    def addWhiteboardAlias(self, alias, name):
+        name = self._rename(name, output=False)
+        self._sequencer.addWhiteboardAlias(self._rename(alias, output=True), name)
@@ -58,3 +58,229 @@ def line_fit(x, y, yerr):
     p_value = 1 - scipy.stats.chi2.cdf(chi2sum, ndf)
 
     return popt, pcov, p_value
+
+
+def gauss(x, a, m, s):
+    return a * np.exp(-0.5 * ((x - m) / s) ** 2)
+
+
+def gauss_fit_hist(centers, counts, fit_range=None, p0=None):
+    """Chi2 fit of a Gaussian to a histogram, skipping empty bins like ROOT."""
+    mask = counts > 0
+    if fit_range is not None:
+        mask &= (centers >= fit_range[0]) & (centers <= fit_range[1])
+    x, y = centers[mask], counts[mask]
+
+    if p0 is None:
+        m = np.average(x, weights=y)
+        s = np.sqrt(np.average((x - m) ** 2, weights=y))
+        p0 = (y.max(), m, s)
+
+    params, cov = scipy.optimize.curve_fit(
+        gauss, x, y, p0=p0, sigma=np.sqrt(y), absolute_sigma=True, maxfev=10000
+    )
+    params[2] = abs(params[2])
+    return params, cov
+
+
+def iterative_gauss_fit_hist(centers, counts, nsigma=3, min_entries=5):
+    """Gaussian fit over the full histogram, refitted in mean +- nsigma * sigma.
+
+    Returns `(amplitude, mean, sigma)` and their covariance, or NaNs if the
+    histogram has too few entries or either fit fails.
+    """
+    failed = np.full(3, np.nan), np.full((3, 3), np.nan)
+    if counts.sum() < min_entries or np.count_nonzero(counts) < 3:
+        return failed
+
+    try:
+        params, _ = gauss_fit_hist(centers, counts)
+        _, m, s = params
+        return gauss_fit_hist(
+            centers, counts, fit_range=(m - nsigma * s, m + nsigma * s), p0=params
+        )
+    except (RuntimeError, ValueError, TypeError) as e:
+        print(f"Gaussian fit failed. Error: {e}")
+        return failed
+
+
+def _hist_quantiles(centers, counts, quantiles):
+    """Linearly interpolated quantiles of many histograms at once."""
+    width = centers[1] - centers[0]
+    edges = np.append(centers - 0.5 * width, centers[-1] + 0.5 * width)
+
+    cdf = np.cumsum(counts, axis=-1)
+    cdf = cdf / np.maximum(cdf[..., -1:], 1)
+    cdf = np.concatenate([np.zeros(cdf.shape[:-1] + (1,)), cdf], axis=-1)
+
+    result = np.empty(counts.shape[:-1] + (len(quantiles),))
+    for j, q in enumerate(quantiles):
+        i = np.clip(np.sum(cdf < q, axis=-1), 1, len(edges) - 1)[..., None]
+        lo = np.take_along_axis(cdf, i - 1, axis=-1)[..., 0]
+        hi = np.take_along_axis(cdf, i, axis=-1)[..., 0]
+        frac = np.where(hi > lo, (q - lo) / np.where(hi > lo, hi - lo, 1), 0.5)
+        result[..., j] = edges[i[..., 0] - 1] + frac * width
+    return result
+
+
+def double_gauss_start(centers, counts):
+    """Starting values `(log a1, mu, log s1, log a2, log s2)` from quantiles.
+
+    The core width comes from the interquartile range, the tail width from
+    the central 95%, and the core fraction is chosen such that the model
+    reproduces the histogram height at the median.
+    """
+    width = centers[1] - centers[0]
+    q = _hist_quantiles(centers, counts, [0.025, 0.25, 0.5, 0.75, 0.975])
+    mu = q[:, 2]
+    s_core = np.maximum((q[:, 3] - q[:, 1]) / 1.349, 0.5 * width)
+    s_tail = np.maximum((q[:, 4] - q[:, 0]) / 3.92, 1.5 * s_core)
+
+    n = counts.sum(axis=-1)
+    i = np.clip(np.searchsorted(centers, mu), 1, len(centers) - 2)
+    window = np.stack([i - 1, i, i + 1], axis=-1)
+    height = np.take_along_axis(counts, window, axis=-1).mean(axis=-1)
+
+    norm = n * width / math.sqrt(2 * math.pi)
+    f = (height / np.maximum(norm, 1e-300) - 1 / s_tail) / (1 / s_core - 1 / s_tail)
+    f = np.clip(f, 0.05, 0.95)
+
+    a1 = np.maximum(norm * f / s_core, 1e-3)
+    a2 = np.maximum(norm * (1 - f) / s_tail, 1e-3)
+    return np.stack([np.log(a1), mu, np.log(s_core), np.log(a2), np.log(s_tail)], -1)
+
+
+def _double_gauss_model(x, p):
+    a1, mu, s1 = np.exp(p[:, 0:1]), p[:, 1:2], np.exp(p[:, 2:3])
+    a2, s2 = np.exp(p[:, 3:4]), np.exp(p[:, 4:5])
+    d = x - mu
+    g1 = a1 * np.exp(-0.5 * (d / s1) ** 2)
+    g2 = a2 * np.exp(-0.5 * (d / s2) ** 2)
+
+    # analytic derivatives with respect to (log a1, mu, log s1, log a2, log s2)
+    jac = np.stack(
+        [
+            g1,
+            g1 * d / s1**2 + g2 * d / s2**2,
+            g1 * (d / s1) ** 2,
+            g2,
+            g2 * (d / s2) ** 2,
+        ],
+        axis=-1,
+    )
+    return g1 + g2, jac
+
+
+def double_gauss_fit_hist(
+    counts, edges, fit_range=None, min_entries=20, max_iterations=200, tolerance=1e-8
+):
+    """Fit `a1 * exp(-(x-mu)^2/2s1^2) + a2 * exp(-(x-mu)^2/2s2^2)` to many
+    histograms at once.
+
+    `counts` has shape `(n, bins)` with common `edges`. All histograms are
+    fitted together by a batched Levenberg-Marquardt minimisation of the
+    chi2 over non-empty bins (as ROOT does) using analytic derivatives.
+    Starting values come from `double_gauss_start`.
+
+    Returns a dict of arrays of length `n`: `mu`, `sigma_core`,
+    `sigma_tail`, their `*_err`, `fraction_core` (area fraction of the
+    core), `sigma_eff` (the RMS of the fitted model), `chi2`, `ndf`,
+    `converged` and `stalled`, set where the damping ran away before the
+    chi2 converged. Histograms with fewer than `min_entries` are NaN.
+    """
+    counts = np.atleast_2d(np.asarray(counts, dtype=float))
+    edges = np.asarray(edges, dtype=float)
+    centers = 0.5 * (edges[1:] + edges[:-1])
+    n_params = 5
+
+    weights = np.where(counts > 0, 1 / np.where(counts > 0, counts, 1), 0)
+    if fit_range is not None:
+        weights = weights * ((centers >= fit_range[0]) & (centers <= fit_range[1]))
+    ndf = np.count_nonzero(weights, axis=-1) - n_params
+    valid = (counts.sum(axis=-1) >= min_entries) & (ndf > 0)
+    counts, weights = counts[valid], weights[valid]
+
+    # keep the widths between a tenth of a bin and ten times the range
+    width = centers[1] - centers[0]
+    log_sigma_range = math.log(0.1 * width), math.log(10 * (edges[-1] - edges[0]))
+
+    def chi2_of(p):
+        model, jac = _double_gauss_model(centers, p)
+        residual = counts - model
+        return np.sum(weights * residual**2, axis=-1), residual, jac
+
+    p = double_gauss_start(centers, counts)
+    chi2, residual, jac = chi2_of(p)
+    damping = np.full(len(counts), 1e-3)
+    converged = np.zeros(len(counts), dtype=bool)
+    stalled = np.zeros(len(counts), dtype=bool)
+    eye = np.eye(n_params)
+
+    for _ in range(max_iterations):
+        done = converged | stalled
+        if done.all():
+            break
+
+        jtw = np.swapaxes(jac, -1, -2) * weights[:, None, :]
+        hessian = jtw @ jac
+        gradient = np.einsum("npb,nb->np", jtw, residual)
+        diagonal = np.einsum("npp->np", hessian)[:, :, None] * eye
+        system = hessian + damping[:, None, None] * diagonal + 1e-12 * eye
+        step = np.linalg.solve(system, gradient[..., None])[..., 0]
+
+        trial = p + np.where(done[:, None], 0, step)
+        trial[:, [2, 4]] = np.clip(trial[:, [2, 4]], *log_sigma_range)
+        with np.errstate(over="ignore", invalid="ignore"):
+            trial_chi2, trial_residual, trial_jac = chi2_of(trial)
+        improved = np.isfinite(trial_chi2) & (trial_chi2 < chi2) & ~done
+
+        converged |= improved & (chi2 - trial_chi2 <= tolerance * (1 + chi2))
+        # no step lowers the chi2 any more, the fit is stuck
+        stalled |= ~converged & (damping > 1e10)
+
+        p[improved] = trial[improved]
+        residual[improved] = trial_residual[improved]
+        jac[improved] = trial_jac[improved]
+        chi2 = np.where(improved, trial_chi2, chi2)
+        damping = np.where(
+            done, damping, np.where(improved, damping / 10, damping * 10)
+        )
+
+    jtw = np.swapaxes(jac, -1, -2) * weights[:, None, :]
+    cov = np.linalg.pinv(jtw @ jac)
+    err = np.sqrt(np.abs(np.einsum("npp->np", cov)))
+
+    mu = p[:, 1]
+    a1, s1 = np.exp(p[:, 0]), np.exp(p[:, 2])
+    a2, s2 = np.exp(p[:, 3]), np.exp(p[:, 4])
+    # errors on log(s) translate to relative errors on s
+    s1_err, s2_err = s1 * err[:, 2], s2 * err[:, 4]
+
+    swap = s1 > s2
+    s1, s2 = np.where(swap, s2, s1), np.where(swap, s1, s2)
+    s1_err, s2_err = np.where(swap, s2_err, s1_err), np.where(swap, s1_err, s2_err)
+    a1, a2 = np.where(swap, a2, a1), np.where(swap, a1, a2)
+    fraction = a1 * s1 / (a1 * s1 + a2 * s2)
+
+    fitted = {
+        "mu": mu,
+        "mu_err": err[:, 1],
+        "sigma_core": s1,
+        "sigma_core_err": s1_err,
+        "sigma_tail": s2,
+        "sigma_tail_err": s2_err,
+        "fraction_core": fraction,
+        "sigma_eff": np.sqrt(fraction * s1**2 + (1 - fraction) * s2**2),
+        "chi2": chi2,
+    }
+
+    result = {}
+    for key, value in fitted.items():
+        result[key] = np.full(len(valid), np.nan)
+        result[key][valid] = value
+    result["ndf"] = ndf
+    result["converged"] = np.zeros(len(valid), dtype=bool)
+    result["converged"][valid] = converged
+    result["stalled"] = np.zeros(len(valid), dtype=bool)
+    result["stalled"][valid] = stalled
+    return result
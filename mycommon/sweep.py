@@ -0,0 +1,249 @@
+"""Grid sweep over CKF and track selection settings.
+
+The grid maps dotted spec keys to the values to try, e.g.::
+
+    ckf.config.chi2CutOffMeasurement: [10, 15, 30]
+    ckf.config.maxPixelHoles: [0, 1]
+    ckf.selector.nMeasurementsMin: [7, 8]
+
+Every point is a spec overlay (`point_NNN.json`) run with `--spec` and
+`--last-stage ckf`. A first run up to seeding fills the cache that all
+points reuse with `--reuse-from`: the points only differ in the CKF, so
+their generation and simulation hashes match and particles and hits are
+read back. Digitization and seeding run again in every point, with the
+same seed they give the same measurements and seeds. Points run side by
+side in `jobs` processes. A rerun in the same work directory skips the
+cache run while `cache.json` records the same chain command and base spec
+and the cache manifest still matches its files.
+
+Per point it collects the efficiency from the `trackeff_vs_eta` of
+`performance_ckf.root`, the fake and duplicate rates over the tracks of
+`tracksummary_ckf.root` and the CKF time per event from `timing.tsv`.
+The Pareto front is the set of points no other point beats in all of
+efficiency, fake rate, duplicate rate and CKF time.
+"""
+
+import json
+import itertools
+import subprocess
+import sys
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .chainspec import _read, merge, read_manifest, _files_present
+from .benchmark import read_timing
+from .ambiguity import track_counts
+
+# (key, larger is better) of the objectives of the Pareto front
+objectives = [
+    ("efficiency", True),
+    ("fake_rate", False),
+    ("duplicate_rate", False),
+    ("ckf_s_per_event", False),
+]
+
+
+def grid_points(grid):
+    """Every combination of the grid as `{dotted key: value}`."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+
+def overlay(point):
+    """Nested spec overlay of a point."""
+    spec = {}
+    for key, value in point.items():
+        *parents, leaf = key.split(".")
+        block = spec
+        for parent in parents:
+            block = block.setdefault(parent, {})
+        block[leaf] = value
+    return spec
+
+
+def efficiency(path, name="trackeff_vs_eta"):
+    """Overall efficiency from the passed and total histograms of a TEfficiency."""
+    import uproot
+
+    with uproot.open(path) as f:
+        if name not in f:
+            return None
+        eff = f[name]
+        passed = eff.member("fPassedHistogram").values().sum()
+        total = eff.member("fTotalHistogram").values().sum()
+    return float(passed / total) if total else None
+
+
+def measure(directory, events):
+    directory = Path(directory)
+    counts = track_counts(directory / "tracksummary_ckf.root")
+    tracks = counts["tracks"].sum()
+    timing = read_timing(directory / "timing.tsv")
+    ckf = sum(s for identifier, s in timing.items() if "TrackFinding" in identifier)
+    return {
+        "efficiency": efficiency(directory / "performance_ckf.root"),
+        "fake_rate": float(counts["fakes"].sum() / tracks) if tracks else None,
+        "duplicate_rate": (
+            float(counts["duplicates"].sum() / tracks) if tracks else None
+        ),
+        "tracks_per_event": float(tracks / events),
+        "ckf_s_per_event": ckf / events,
+    }
+
+
+def pareto_front(records):
+    """Indices of the records not dominated by any other record."""
+    # oriented so that larger is better, a missing value is the worst
+    values = np.array(
+        [
+            [
+                (1 if larger else -1) * r[key] if r[key] is not None else -np.inf
+                for key, larger in objectives
+            ]
+            for r in records
+        ]
+    )
+    front = []
+    for i, v in enumerate(values):
+        dominated = np.any(np.all(values >= v, axis=1) & np.any(values > v, axis=1))
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def cached_run(work_dir, key):
+    """Output directory of the cache run recorded for `key`, else `None`."""
+    state = work_dir / "cache.json"
+    if not state.exists():
+        return None
+    with open(state) as f:
+        recorded = json.load(f)
+    if recorded["key"] != key:
+        return None
+    cache = Path(recorded["output"])
+    manifest = read_manifest(cache)
+    if manifest is None or manifest["stages"] != recorded["stages"]:
+        return None
+    return cache if _files_present(cache, manifest) else None
+
+
+def run_point(command, spec, directory, threads):
+    subprocess.run(
+        [
+            *command,
+            "--spec",
+            str(spec),
+            "--threads",
+            str(threads),
+            "--output",
+            str(directory),
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def plot(records, front, output):
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure("CKF sweep", figsize=(12, 5))
+    ax_eff, ax_fake = fig.subplots(1, 2)
+    time = np.array([1e3 * r["ckf_s_per_event"] for r in records])
+    for ax, key, label in [
+        (ax_eff, "efficiency", "efficiency"),
+        (ax_fake, "fake_rate", "fake rate"),
+    ]:
+        values = np.array([np.nan if r[key] is None else r[key] for r in records])
+        ax.scatter(time, values, color="gray", alpha=0.5, label="points")
+        order = sorted(front, key=lambda i: time[i])
+        ax.plot(time[order], values[order], marker="o", color="C1", label="Pareto")
+        for i in order:
+            ax.annotate(
+                str(records[i]["point"]), (time[i], values[i]), fontsize="x-small"
+            )
+        ax.set_xlabel("CKF time per event [ms]")
+        ax.set_ylabel(label)
+        ax.grid()
+    ax_eff.legend()
+    fig.savefig(output)
+
+
+def run(args):
+    grid = _read(args.grid)
+    base = _read(args.spec) if args.spec is not None else {}
+    points = grid_points(grid)
+    work_dir = args.work_dir
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    command = [sys.executable, str(args.chain), *args.chain_args]
+    command += ["--events", str(args.events), "--skip", str(args.skip)]
+
+    base_spec = work_dir / "base.json"
+    base_spec.write_text(json.dumps(base, indent=2))
+    key = {"command": command, "spec": base}
+    cache = cached_run(work_dir, key)
+    if cache is not None:
+        print(f"Reusing cached inputs in {cache}", flush=True)
+    else:
+        print("Caching inputs ...", flush=True)
+        run_point(
+            command + ["--last-stage", "seeding"],
+            base_spec,
+            work_dir / "cache",
+            args.threads * args.jobs,
+        )
+        cache = next((work_dir / "cache").glob("ttbar_pu*"))
+        with open(work_dir / "cache.json", "w") as f:
+            stages = read_manifest(cache)["stages"]
+            json.dump({"key": key, "output": str(cache), "stages": stages}, f)
+
+    specs = []
+    for i, point in enumerate(points):
+        spec = work_dir / f"point_{i:03d}.json"
+        spec.write_text(json.dumps(merge(base, overlay(point)), indent=2))
+        specs.append(spec)
+
+    def run_one(i):
+        directory = work_dir / f"point_{i:03d}"
+        run_point(
+            command + ["--last-stage", "ckf", "--reuse-from", str(cache)],
+            specs[i],
+            directory,
+            args.threads,
+        )
+        return {
+            "point": i,
+            "parameters": points[i],
+            **measure(next(directory.glob("ttbar_pu*")), args.events),
+        }
+
+    records = []
+    results = work_dir / "sweep.jsonl"
+    # the records of this run only, not those of earlier runs in work_dir
+    results.write_text("")
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        for record in pool.map(run_one, range(len(points))):
+            records.append(record)
+            with open(results, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            print(f"point {record['point']:3d} {record['parameters']}", flush=True)
+
+    front = pareto_front(records)
+    print(f"\nPareto front ({len(front)} of {len(records)} points):")
+    for i in sorted(front, key=lambda i: records[i]["ckf_s_per_event"]):
+        r = records[i]
+        rates = {
+            key: "-" if r[key] is None else f"{r[key]:.4f}"
+            for key in ["efficiency", "fake_rate", "duplicate_rate"]
+        }
+        print(
+            f"  {r['point']:3d}  eff {rates['efficiency']}  "
+            f"fake {rates['fake_rate']}  dup {rates['duplicate_rate']}  "
+            f"CKF {1e3 * r['ckf_s_per_event']:8.1f} ms/event  {r['parameters']}"
+        )
+    with open(work_dir / "pareto.json", "w") as f:
+        json.dump([records[i] for i in front], f, indent=2)
+
+    plot(records, front, args.output or work_dir / "pareto.png")
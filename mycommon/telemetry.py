@@ -0,0 +1,209 @@
+"""Periodic throughput metrics of a running chain for farm monitoring.
+
+`Telemetry` runs a thread next to the sequencer that samples, every
+`interval` seconds, the progress of a `TimedSequencer` (events started and
+completed, and with per-algorithm probes the time per algorithm summed over
+events), the resident memory of the process and the size of every output
+below the output directories.
+Samples are appended to a JSON-lines file, or written as Prometheus text
+format, replacing the file atomically so that the node exporter textfile
+collector never sees a partial file. With `port` the Prometheus text is
+also served over HTTP at `/metrics`.
+
+Events that started but did not complete yet are the queue depth: the
+events the sequencer has in flight on its threads. Outputs are grouped by
+writer, i.e. by file name with the `eventNNNNNNNNN-` prefix of per-event
+files removed, and prefixed by their directory when there are several.
+
+The progress comes from the Python probes of the `TimedSequencer`, which
+take the GIL. Without per-algorithm timing there are two of them per event,
+at its start and end, so their cost is small but not zero.
+"""
+
+import os
+import re
+import json
+import time
+import socket
+import threading
+from pathlib import Path
+
+_event_prefix = re.compile(r"^event\d+-")
+
+
+def rss_bytes():
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        # peak instead of current where /proc is not available
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def output_bytes(directory):
+    """`{writer output name: bytes}` of the files below `directory`."""
+    sizes = {}
+    for path in Path(directory).rglob("*"):
+        try:
+            if not path.is_file():
+                continue
+            size = path.stat().st_size
+        except OSError:
+            # written or removed while listing
+            continue
+        name = str(
+            path.relative_to(directory).with_name(_event_prefix.sub("", path.name))
+        )
+        sizes[name] = sizes.get(name, 0) + size
+    return sizes
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(sample, prefix="odd_chain"):
+    """A sample in the Prometheus text exposition format."""
+    job = f'output="{_escape(sample["output"])}",host="{_escape(sample["host"])}"'
+    lines = []
+
+    def metric(name, kind, value, labels=""):
+        if not any(line.startswith(f"# TYPE {prefix}_{name} ") for line in lines):
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+        lines.append(f"{prefix}_{name}{{{job}{labels}}} {value}")
+
+    metric("events_started_total", "counter", sample["events_started"])
+    metric("events_processed_total", "counter", sample["events_processed"])
+    metric("events_per_second", "gauge", sample["events_per_s"])
+    metric("queue_depth", "gauge", sample["queue_depth"])
+    metric("rss_bytes", "gauge", sample["rss_bytes"])
+    metric("elapsed_seconds", "gauge", sample["elapsed_s"])
+    for algorithm, seconds in sample["algorithm_time_s"].items():
+        metric(
+            "algorithm_seconds_total",
+            "counter",
+            seconds,
+            f',algorithm="{_escape(algorithm)}"',
+        )
+    for name, size in sample["output_bytes"].items():
+        metric("output_bytes", "gauge", size, f',file="{_escape(name)}"')
+    return "\n".join(lines) + "\n"
+
+
+class Telemetry:
+    """Sample the progress of `sequencer` while it runs.
+
+    `sequencer` is a `TimedSequencer`; use as a context manager around its
+    `run`. `output_dirs` is the directory, or the list of directories, the
+    run writes to. `format` is `"jsonl"` or `"prometheus"`.
+    """
+
+    def __init__(
+        self, sequencer, output_dirs, path=None, format="jsonl", interval=10, port=None
+    ):
+        self.sequencer = sequencer
+        if isinstance(output_dirs, (str, os.PathLike)):
+            output_dirs = [output_dirs]
+        self.output_dirs = [Path(d) for d in output_dirs]
+        self.path = Path(path) if path is not None else None
+        self.format = format
+        self.interval = interval
+        self.port = port
+        self.text = ""
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+        self._start = None
+        self._last = None
+
+    def sample(self):
+        now = time.time()
+        started, completed, totals = self.sequencer.snapshot()
+        last_time, last_completed = self._last
+        self._last = (now, completed)
+        # the telemetry file itself may be below the output directory
+        own = self.path.resolve() if self.path is not None else None
+        sizes = {}
+        for directory in self.output_dirs:
+            prefix = f"{directory.name}/" if len(self.output_dirs) > 1 else ""
+            for name, size in output_bytes(directory).items():
+                if (directory / name).resolve() != own:
+                    sizes[prefix + name] = size
+        return {
+            "time": now,
+            "output": ",".join(str(d) for d in self.output_dirs),
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "elapsed_s": now - self._start,
+            "events_started": started,
+            "events_processed": completed,
+            "events_per_s": (completed - last_completed) / max(now - last_time, 1e-9),
+            "events_per_s_average": completed / max(now - self._start, 1e-9),
+            "queue_depth": started - completed,
+            "rss_bytes": rss_bytes(),
+            "algorithm_time_s": totals,
+            "output_bytes": sizes,
+        }
+
+    def emit(self):
+        sample = self.sample()
+        self.text = prometheus_text(sample)
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.format == "prometheus":
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(self.text)
+            os.replace(tmp, self.path)
+        else:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(sample) + "\n")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.emit()
+
+    def _serve(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.text.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("", self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def __enter__(self):
+        self._start = time.time()
+        self._last = (self._start, 0)
+        if self.port is not None:
+            self._serve()
+        self.emit()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        # the final numbers, also when the run failed
+        self.emit()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
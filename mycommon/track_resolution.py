@@ -0,0 +1,177 @@
+"""Track parameter resolution in slices of truth pT, without ROOT.
+
+Replaces the `TTree::Draw` into `TH2D` plus `ProjectionY` loop of the
+particle hypothesis notebook. `tracksummary` is streamed once and every
+requested `res_*` variable is histogrammed for all pT slices in the same
+pass; the fits then run on the small `(variable, slice, bin)` count array.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .stats import iterative_gauss_fit_hist, double_gauss_fit_hist
+from .tracksummary import iterate_tracks
+
+default_pt_edges = [0.8, 1.5, 2.2, 3.0, 3.7, 4.4, 5.1, 12]
+
+# histogram (and first fit) ranges used in the notebook
+default_ranges = {
+    "res_eLOC0_fit": (-0.1, 0.1),
+    "res_eLOC1_fit": (-0.1, 0.1),
+    "res_ePHI_fit": (-0.03, 0.03),
+    "res_eTHETA_fit": (-0.01, 0.01),
+    "res_eQOP_fit": (-0.1, 0.1),
+    "res_eT_fit": (-35, 35),
+}
+
+
+def fill_slices(
+    input,
+    variables,
+    pt_edges=default_pt_edges,
+    ranges=None,
+    bins=100,
+    tree="tracksummary",
+    pt="t_pT",
+    step_size="100 MB",
+):
+    """Histogram `variables` in slices of `pt` reading `input` once.
+
+    Returns counts of shape `(len(variables), len(pt_edges) - 1, bins)`.
+    Entries outside a variable's range are dropped, as the fit ignores
+    ROOT's under- and overflow bins.
+    """
+    ranges = {**default_ranges, **(ranges or {})}
+    missing = [variable for variable in variables if variable not in ranges]
+    if missing:
+        raise ValueError(f"no histogram range for {', '.join(missing)}")
+    pt_edges = np.asarray(pt_edges, dtype=float)
+    n_pt = len(pt_edges) - 1
+    lows = np.array([ranges[variable][0] for variable in variables], dtype=float)
+    highs = np.array([ranges[variable][1] for variable in variables], dtype=float)
+
+    counts = np.zeros(len(variables) * n_pt * bins, dtype=np.int64)
+
+    tracks = iterate_tracks(
+        input, [pt] + list(variables), tree=tree, step_size=step_size
+    )
+    for chunk in tracks:
+        pt_index = np.searchsorted(pt_edges, chunk[pt], side="right") - 1
+        pt_valid = (pt_index >= 0) & (pt_index < n_pt)
+
+        for i, variable in enumerate(variables):
+            scaled = (chunk[variable] - lows[i]) / (highs[i] - lows[i]) * bins
+            valid = pt_valid & (scaled >= 0) & (scaled < bins)
+            res_index = scaled[valid].astype(np.int64)
+            flat_index = (i * n_pt + pt_index[valid]) * bins + res_index
+            counts += np.bincount(flat_index, minlength=counts.size)
+
+    return counts.reshape(len(variables), n_pt, bins)
+
+
+def _fill_slices(kwargs):
+    return fill_slices(**kwargs)
+
+
+def fill_slices_parallel(inputs, variables, jobs=None, **kwargs):
+    """`fill_slices` for several labelled inputs, one worker process each.
+
+    `inputs` maps a label (e.g. the particle hypothesis) to a file.
+    """
+    labels = list(inputs)
+    tasks = [
+        dict(input=inputs[label], variables=variables, **kwargs) for label in labels
+    ]
+    if jobs == 1 or len(tasks) == 1:
+        return dict(zip(labels, map(_fill_slices, tasks)))
+    with ProcessPoolExecutor(max_workers=jobs or len(tasks)) as executor:
+        return dict(zip(labels, executor.map(_fill_slices, tasks)))
+
+
+def fit_slices(counts, edges, model="gauss", nsigma=3, min_entries=5):
+    """Fit every slice with an iterative single or a double Gaussian.
+
+    `counts` has shape `(..., bins)` and `edges` the `bins + 1` histogram
+    edges. Returns arrays of shape `counts.shape[:-1]` for the keys `mu`,
+    `mu_err`, `sigma` and `sigma_err`, NaN where the fit was not possible.
+    For `model="double"` `sigma` is the core width, and `sigma_tail`,
+    `fraction_core` and `sigma_eff` are added; fits that did not converge
+    are NaN as well.
+    """
+    flat = counts.reshape(-1, counts.shape[-1])
+
+    if model == "double":
+        fit = double_gauss_fit_hist(flat, edges, min_entries=min_entries)
+        result = {
+            "mu": fit["mu"],
+            "mu_err": fit["mu_err"],
+            "sigma": fit["sigma_core"],
+            "sigma_err": fit["sigma_core_err"],
+            "sigma_tail": fit["sigma_tail"],
+            "sigma_tail_err": fit["sigma_tail_err"],
+            "fraction_core": fit["fraction_core"],
+            "sigma_eff": fit["sigma_eff"],
+        }
+        failed = np.isfinite(fit["chi2"]) & ~fit["converged"]
+        if failed.any():
+            print(
+                f"{failed.sum()} double Gaussian fits did not converge "
+                f"({fit['stalled'].sum()} stalled)"
+            )
+        for value in result.values():
+            value[failed] = np.nan
+    else:
+        centers = 0.5 * (edges[1:] + edges[:-1])
+        result = {
+            key: np.full(len(flat), np.nan)
+            for key in ["mu", "mu_err", "sigma", "sigma_err"]
+        }
+        for i, slice_counts in enumerate(flat):
+            params, cov = iterative_gauss_fit_hist(
+                centers, slice_counts, nsigma=nsigma, min_entries=min_entries
+            )
+            result["mu"][i], result["sigma"][i] = params[1], params[2]
+            result["mu_err"][i] = cov[1, 1] ** 0.5
+            result["sigma_err"][i] = cov[2, 2] ** 0.5
+
+    return {key: value.reshape(counts.shape[:-1]) for key, value in result.items()}
+
+
+def resolution_vs_pt(
+    inputs,
+    variables,
+    pt_edges=default_pt_edges,
+    ranges=None,
+    bins=100,
+    jobs=None,
+    model="gauss",
+    nsigma=3,
+    min_entries=5,
+):
+    """Fill and fit all `variables` in pT slices for every labelled input.
+
+    Returns `{label: {variable: fit result}}` with the `fit_slices` keys.
+    Variables without a default range need one in `ranges`.
+    """
+    ranges = {**default_ranges, **(ranges or {})}
+    missing = [variable for variable in variables if variable not in ranges]
+    if missing:
+        raise ValueError(f"no histogram range for {', '.join(missing)}")
+    counts = fill_slices_parallel(
+        inputs, variables, jobs=jobs, pt_edges=pt_edges, ranges=ranges, bins=bins
+    )
+
+    results = {}
+    for label, label_counts in counts.items():
+        results[label] = {}
+        for variable, variable_counts in zip(variables, label_counts):
+            edges = np.linspace(*ranges[variable], bins + 1)
+            results[label][variable] = fit_slices(
+                variable_counts,
+                edges,
+                model=model,
+                nsigma=nsigma,
+                min_entries=min_entries,
+            )
+    return results
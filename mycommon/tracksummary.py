@@ -0,0 +1,144 @@
+"""Per-track columns from the per-event `tracksummary` tree.
+
+`tracksummary_ckf.root` has one entry per event with vector branches
+holding one value per track. The functions here stream it in chunks and
+turn every branch into one contiguous numpy array per chunk, indexed by
+track. The flattening reuses the content buffer uproot decoded (no copy)
+and the event and track indices are built from the list offsets, so no
+Python code runs per track.
+"""
+
+import numpy as np
+import uproot
+import awkward as ak
+
+from .covariance import layout_of, covariance_columns, covariance_matrices
+
+# truth matching information written by the ACTS track summary writer; not
+# every ACTS version writes all of them, missing ones are skipped
+truth_columns = [
+    "nMajorityHits",
+    "majorityParticleId",
+    "majorityParticleId_vertex_primary",
+    "majorityParticleId_vertex_secondary",
+    "majorityParticleId_particle",
+    "majorityParticleId_generation",
+    "majorityParticleId_sub_particle",
+    "trackClassification",
+    "t_charge",
+    "t_time",
+    "t_vx",
+    "t_vy",
+    "t_vz",
+    "t_theta",
+    "t_phi",
+    "t_eta",
+    "t_p",
+    "t_pT",
+    "t_d0",
+    "t_z0",
+]
+
+
+def flatten(array):
+    """Contiguous numpy view on the content of a jagged per-event array."""
+    return ak.to_numpy(ak.flatten(array, axis=1))
+
+
+def _tracks_from_chunk(chunk, columns, event_column):
+    jagged = [c for c in columns if chunk[c].ndim > 1]
+    if not jagged:
+        raise ValueError(f"none of {columns} is a per-track column")
+
+    counts = ak.to_numpy(ak.num(chunk[jagged[0]], axis=1))
+    for column in jagged[1:]:
+        if not np.array_equal(ak.to_numpy(ak.num(chunk[column], axis=1)), counts):
+            raise ValueError(f"{column} and {jagged[0]} differ in tracks per event")
+
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    event_index = np.repeat(np.arange(len(counts)), counts)
+
+    tracks = {}
+    if event_column is not None:
+        tracks["event_nr"] = ak.to_numpy(chunk[event_column])[event_index]
+    tracks["track_index"] = np.arange(offsets[-1]) - offsets[:-1][event_index]
+    tracks["entry_index"] = event_index
+
+    for column in columns:
+        if column in jagged:
+            tracks[column] = flatten(chunk[column])
+        else:
+            tracks[column] = ak.to_numpy(chunk[column])[event_index]
+
+    return tracks
+
+
+def iterate_tracks(
+    input,
+    columns,
+    truth=False,
+    covariance=False,
+    tree="tracksummary",
+    event_column="event_nr",
+    step_size="100 MB",
+    entry_start=None,
+    entry_stop=None,
+):
+    """Yield one dict of per-track numpy arrays per chunk of `input`.
+
+    Besides `columns` (and `truth_columns` present in the file if `truth`
+    is set) every chunk has `event_nr`, `track_index` (position of the track
+    in its event) and `entry_index` (tree entry of its event). Per-event
+    columns are broadcast to the tracks. With `covariance` every chunk also
+    has `covariance`, the `(tracks, 6, 6)` fitted covariances rebuilt from
+    whatever layout the file has (see `covariance`).
+    """
+    with uproot.open(input) as f:
+        t = f[tree]
+        columns = list(dict.fromkeys(columns))
+        if truth:
+            columns += [c for c in truth_columns if c in t and c not in columns]
+        layout = None
+        if covariance:
+            layout = layout_of(t.keys())
+            if layout is None:
+                raise ValueError(f"{input} has no covariance branches")
+            cov_columns = [c for c in covariance_columns(layout) if c not in columns]
+            columns += cov_columns
+        if event_column not in t:
+            event_column = None
+        read = columns + ([event_column] if event_column is not None else [])
+
+        for chunk, report in t.iterate(
+            list(dict.fromkeys(read)),
+            step_size=step_size,
+            entry_start=entry_start,
+            entry_stop=entry_stop,
+            report=True,
+        ):
+            tracks = _tracks_from_chunk(chunk, columns, event_column)
+            tracks["entry_index"] += report.tree_entry_start
+            if layout is not None:
+                tracks["covariance"] = covariance_matrices(tracks, layout)
+                for column in cov_columns:
+                    del tracks[column]
+            yield tracks
+
+
+def read_tracks(input, columns, library="np", **kwargs):
+    """All tracks of `input` as a dict of numpy arrays or a DataFrame.
+
+    Takes the same keyword arguments as `iterate_tracks`.
+    """
+    chunks = list(iterate_tracks(input, columns, **kwargs))
+    if chunks:
+        tracks = {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+    else:
+        tracks = {}
+
+    if library == "pd":
+        import pandas as pd
+
+        return pd.DataFrame(tracks)
+    return tracks
@@ -0,0 +1,325 @@
+"""Mergeable per-finder vertex performance summaries.
+
+A PU scan only needs a few numbers per finder and PU point: the vertex
+counters of every event (true, reconstructable, reconstructed, merged,
+split vertices), how often the hard-scatter vertex is found, and its
+residuals and pulls. `FinderSummary` accumulates them with fixed binning
+(`binning`), so summaries of chunks, event lists or shards are merged by
+adding them up and give the same result as one run over all events.
+
+The ACTS Python bindings give Python algorithms no access to the vertex
+collections on the whiteboard, so the summary is filled from the vertex
+writer output of each finder, streamed chunk by chunk right after the run.
+The chain writes it to `vertex_summary.json`; with `--no-vertex-ntuples`
+the per-vertex `performance_vertexing.root` files are still written by the
+run and only removed after they have been summarized, which saves disk
+space but not the writing.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+summary_name = "vertex_summary.json"
+
+# per-event counters summed over events
+counters = ["nTrueVtx", "nVtxReconstructable", "nRecoVtx", "nMergedVtx", "nSplitVtx"]
+
+# (bins, low, high) of the hard-scatter residuals (mm, ns) and pulls
+binning = {
+    "resX": (200, -0.1, 0.1),
+    "resY": (200, -0.1, 0.1),
+    "resZ": (200, -0.2, 0.2),
+    "resT": (200, -0.5, 0.5),
+    "pullX": (200, -5.0, 5.0),
+    "pullY": (200, -5.0, 5.0),
+    "pullZ": (200, -5.0, 5.0),
+    "pullT": (200, -5.0, 5.0),
+}
+
+vertex_columns = ["vertex_primary", "vertex_secondary", "recoVertexClassification"]
+
+
+class Histogram:
+    """Fixed binning histogram with under-, overflow and moments."""
+
+    def __init__(self, bins, low, high):
+        self.bins, self.low, self.high = bins, low, high
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = self.overflow = self.nan = 0
+        self.sum = self.sum2 = 0.0
+
+    @property
+    def edges(self):
+        return np.linspace(self.low, self.high, self.bins + 1)
+
+    @property
+    def entries(self):
+        return int(self.counts.sum()) + self.underflow + self.overflow
+
+    def fill(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        finite = np.isfinite(values)
+        self.nan += int((~finite).sum())
+        values = values[finite]
+        self.underflow += int((values < self.low).sum())
+        self.overflow += int((values >= self.high).sum())
+        inside = values[(values >= self.low) & (values < self.high)]
+        index = ((inside - self.low) * (self.bins / (self.high - self.low))).astype(
+            np.int64
+        )
+        self.counts += np.bincount(
+            np.minimum(index, self.bins - 1), minlength=self.bins
+        )
+        self.sum += float(values.sum())
+        self.sum2 += float((values**2).sum())
+
+    def merge(self, other):
+        if (self.bins, self.low, self.high) != (other.bins, other.low, other.high):
+            raise ValueError("cannot merge histograms with different binning")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.nan += other.nan
+        self.sum += other.sum
+        self.sum2 += other.sum2
+        return self
+
+    def mean(self):
+        return self.sum / self.entries if self.entries else np.nan
+
+    def rms(self):
+        if not self.entries:
+            return np.nan
+        return float(np.sqrt(max(self.sum2 / self.entries - self.mean() ** 2, 0.0)))
+
+    def to_dict(self):
+        return {
+            "bins": self.bins,
+            "low": self.low,
+            "high": self.high,
+            "counts": self.counts.tolist(),
+            "underflow": self.underflow,
+            "overflow": self.overflow,
+            "nan": self.nan,
+            "sum": self.sum,
+            "sum2": self.sum2,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["bins"], data["low"], data["high"])
+        histogram.counts = np.array(data["counts"], dtype=np.int64)
+        for key in ["underflow", "overflow", "nan", "sum", "sum2"]:
+            setattr(histogram, key, data[key])
+        return histogram
+
+
+class FinderSummary:
+    """Counters and hard-scatter histograms of one vertex finder."""
+
+    def __init__(self):
+        self.events = 0
+        self.hs_found = 0
+        self.sums = dict.fromkeys(counters, 0)
+        self.squares = dict.fromkeys(counters, 0)
+        self.histograms = {column: Histogram(*bins) for column, bins in binning.items()}
+
+    def fill_events(self, events):
+        """Add the per-event counters of a chunk, see `iterate_events`."""
+        self.events += len(events["event_nr"])
+        for column in counters:
+            if column in events:
+                values = events[column].astype(np.int64)
+                self.sums[column] += int(values.sum())
+                self.squares[column] += int((values**2).sum())
+
+    def fill_vertices(self, vertices):
+        """Add a chunk of the per-vertex columns."""
+        hs = (
+            (vertices["vertex_primary"] == 1)
+            & (vertices["vertex_secondary"] == 0)
+            & (vertices["recoVertexClassification"] == 1)
+        )
+        self.hs_found += int(hs.sum())
+        for column, histogram in self.histograms.items():
+            if column in vertices:
+                histogram.fill(vertices[column][hs])
+
+    def merge(self, other):
+        self.events += other.events
+        self.hs_found += other.hs_found
+        for column in counters:
+            self.sums[column] += other.sums[column]
+            self.squares[column] += other.squares[column]
+        for column, histogram in self.histograms.items():
+            histogram.merge(other.histograms[column])
+        return self
+
+    def mean(self, column):
+        return self.sums[column] / self.events if self.events else np.nan
+
+    def std(self, column):
+        if not self.events:
+            return np.nan
+        variance = self.squares[column] / self.events - self.mean(column) ** 2
+        return float(np.sqrt(max(variance, 0.0)))
+
+    def efficiency(self):
+        """Reconstructed over reconstructable vertices."""
+        reconstructable = self.sums["nVtxReconstructable"]
+        return self.sums["nRecoVtx"] / reconstructable if reconstructable else np.nan
+
+    def to_dict(self):
+        return {
+            "events": self.events,
+            "hs_found": self.hs_found,
+            "sums": self.sums,
+            "squares": self.squares,
+            "histograms": {
+                column: histogram.to_dict()
+                for column, histogram in self.histograms.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        summary.events = data["events"]
+        summary.hs_found = data["hs_found"]
+        summary.sums.update(data["sums"])
+        summary.squares.update(data["squares"])
+        for column, histogram in data["histograms"].items():
+            summary.histograms[column] = Histogram.from_dict(histogram)
+        return summary
+
+
+def summarize_file(input, step_size="100 MB"):
+    """`FinderSummary` of one `performance_vertexing.root`."""
+    import uproot
+
+    from .vertexing import iterate_events
+
+    summary = FinderSummary()
+    for events in iterate_events(input, step_size=step_size):
+        summary.fill_events(events)
+    with uproot.open(input) as f:
+        tree = f["vertexing"]
+        columns = vertex_columns + [c for c in binning if c in tree]
+        for vertices in tree.iterate(columns, step_size=step_size, library="np"):
+            summary.fill_vertices(vertices)
+    return summary
+
+
+def vertex_files(directory):
+    """`{finder: path}` of the vertex writer outputs below `directory`.
+
+    Finders of an ambiguity solver branch are named `ambi_<solver>/<finder>`.
+    Only these two levels are searched, so the outputs of the chunks and
+    event lists of a run are not counted a second time.
+    """
+    directory = Path(directory)
+    paths = [
+        *directory.glob("vertex_*/performance_vertexing.root"),
+        *directory.glob("ambi_*/vertex_*/performance_vertexing.root"),
+    ]
+    return {
+        str(path.parent.relative_to(directory)).replace("vertex_", ""): path
+        for path in sorted(paths)
+    }
+
+
+def read_summary(path):
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        finder: FinderSummary.from_dict(summary)
+        for finder, summary in data["finders"].items()
+    }
+
+
+def write_summary(summaries, path):
+    data = {
+        "finders": {finder: summary.to_dict() for finder, summary in summaries.items()}
+    }
+    tmp = Path(path).with_suffix(".tmp")
+    tmp.write_text(json.dumps(data))
+    tmp.replace(path)
+
+
+def merge_summaries(summaries):
+    """Sum of several `{finder: FinderSummary}`."""
+    merged = {}
+    for summary in summaries:
+        for finder, finder_summary in summary.items():
+            if finder in merged:
+                merged[finder].merge(finder_summary)
+            else:
+                merged[finder] = FinderSummary().merge(finder_summary)
+    return merged
+
+
+def summarize_outputs(directory, keep_ntuples=True):
+    """Write `vertex_summary.json` of the vertex outputs below `directory`.
+
+    Without `keep_ntuples` the summarized ntuples are removed.
+    """
+    files = vertex_files(directory)
+    if not files:
+        return None
+    summaries = {finder: summarize_file(path) for finder, path in files.items()}
+    write_summary(summaries, Path(directory) / summary_name)
+    if not keep_ntuples:
+        for path in files.values():
+            path.unlink()
+    return summaries
+
+
+def merge_chunk_summaries(chunk_dirs, output):
+    """Merge the summaries of all chunks into `output`."""
+    paths = [Path(d) / summary_name for d in chunk_dirs]
+    paths = [path for path in paths if path.exists()]
+    if not paths:
+        return None
+    merged = merge_summaries(read_summary(path) for path in paths)
+    write_summary(merged, Path(output) / summary_name)
+    return merged
+
+
+def load(path):
+    """Summaries of a summary file, or of the outputs below a directory."""
+    path = Path(path)
+    if path.is_dir():
+        if (path / summary_name).exists():
+            return read_summary(path / summary_name)
+        return {
+            finder: summarize_file(file) for finder, file in vertex_files(path).items()
+        }
+    return read_summary(path)
+
+
+def run(args):
+    summaries = merge_summaries(load(path) for path in args.inputs)
+
+    for finder, summary in summaries.items():
+        print(f"{finder}: {summary.events} events")
+        print(
+            f"  efficiency {summary.efficiency():.3f}  "
+            f"HS found {summary.hs_found / max(summary.events, 1):.3f}"
+        )
+        for column in counters:
+            print(
+                f"  {column:<20} {summary.mean(column):9.2f} "
+                f"+- {summary.std(column):7.2f} per event"
+            )
+        for column, histogram in summary.histograms.items():
+            if histogram.entries:
+                print(
+                    f"  {column:<20} mean {histogram.mean():+.4f}  "
+                    f"rms {histogram.rms():.4f}  "
+                    f"outside {histogram.underflow + histogram.overflow}"
+                )
+
+    if args.output:
+        write_summary(summaries, args.output)
@@ -0,0 +1,124 @@
+"""Per-event columns from the `vertexing` tree.
+
+`performance_vertexing.root` has one row per vertex, and the event-level
+counters (`nRecoVtx`, `nTrueVtx`, ...) repeat on every row of an event.
+The functions here stream only the requested event-level columns and keep
+the first row of every event, so the result has one row per event no
+matter how many vertices there are. Rows of an event are contiguous in
+the tree; the first row of each is found from where `event_nr` changes,
+also across chunk boundaries.
+
+`read_events` takes the rows from an `odd-analysis serve` daemon when one
+is running, see `mycommon.dataserver`, and streams the file otherwise.
+"""
+
+import numpy as np
+import uproot
+
+# event-level counters written by the ACTS vertex performance writer; not
+# every ACTS version writes all of them, missing ones are skipped
+event_columns = [
+    "nRecoVtx",
+    "nTrueVtx",
+    "nVtxDetectorAcceptance",
+    "nVtxReconstructable",
+    "nMergedVtx",
+    "nSplitVtx",
+]
+
+
+def _first_of_event(event, previous=None):
+    """Mask of the rows where `event` differs from the row before."""
+    first = np.empty(len(event), dtype=bool)
+    first[1:] = event[1:] != event[:-1]
+    if len(event):
+        first[0] = event[0] != previous
+    return first
+
+
+def iterate_events(
+    input,
+    columns=None,
+    tree="vertexing",
+    event_column="event_nr",
+    step_size="100 MB",
+):
+    """Yield one dict of per-event numpy arrays per chunk of `input`.
+
+    `columns` default to the `event_columns` present in the file. Every
+    chunk has `event_nr` and `entry_index` (first tree entry of the event)
+    besides them. An event split over two chunks is yielded with the first.
+    """
+    with uproot.open(input) as f:
+        t = f[tree]
+        if columns is None:
+            columns = [c for c in event_columns if c in t]
+        columns = [c for c in dict.fromkeys(columns) if c != event_column]
+
+        previous = None
+        for chunk, report in t.iterate(
+            [event_column, *columns],
+            step_size=step_size,
+            library="np",
+            report=True,
+        ):
+            event = chunk[event_column]
+            (index,) = np.nonzero(_first_of_event(event, previous))
+            if len(event):
+                previous = event[-1]
+            events = {
+                event_column: event[index],
+                "entry_index": index + report.tree_entry_start,
+            }
+            for column in columns:
+                events[column] = chunk[column][index]
+            yield events
+
+
+def served_events(input, columns=None, tree="vertexing", event_column="event_nr"):
+    """Like `read_events` from a running data server, else `None`."""
+    from .dataserver import default_socket, served
+
+    if not default_socket.exists():
+        return None
+    if columns is None:
+        with uproot.open(input) as f:
+            columns = [c for c in event_columns if c in f[tree]]
+    columns = [c for c in dict.fromkeys(columns) if c != event_column]
+
+    arrays = served(input, [event_column, *columns], tree)
+    if arrays is None:
+        return None
+    event = arrays[event_column]
+    (index,) = np.nonzero(_first_of_event(event))
+    # indexing copies, the events outlive the shared memory of the server
+    events = {event_column: event[index], "entry_index": index}
+    for column in columns:
+        events[column] = arrays[column][index]
+    return events
+
+
+def read_events(input, columns=None, library="np", **kwargs):
+    """All events of `input` as a dict of numpy arrays or a DataFrame.
+
+    Takes the same keyword arguments as `iterate_events`; `step_size` only
+    applies without a data server.
+    """
+    step_size = kwargs.pop("step_size", None)
+    events = served_events(input, columns, **kwargs)
+    if events is None:
+        if step_size is not None:
+            kwargs["step_size"] = step_size
+        chunks = list(iterate_events(input, columns, **kwargs))
+        if chunks:
+            events = {
+                key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]
+            }
+        else:
+            events = {}
+
+    if library == "pd":
+        import pandas as pd
+
+        return pd.DataFrame(events)
+    return events
@@ -1,156 +1,12 @@
 #!/usr/bin/env python3
 
+import sys
 import argparse
-from pathlib import Path
-import matplotlib.pyplot as plt
-import uproot
-import numpy as np
-import awkward as ak
-import pandas as pd
 
-from labels import  get_event_details
-from stats import robust_gauss_fit, line_fit
+from mycommon.cli import main
 
-variable_types = ["x", "y", "z", "t"]
-
-residuals = ["resX", "resY", "resZ", "resT"]
-pulls = ["pullX", "pullY", "pullZ", "pullT"]
-columns = (
-    [
-        "vertex_primary",
-        "vertex_secondary",
-        "nTrueVtx",
-        "recoVertexClassification",
-    ]
-    + residuals
-    + pulls
-)
-
-parser = argparse.ArgumentParser()
+parser = argparse.ArgumentParser(add_help=False)
 parser.add_argument("--mode", choices=["residual", "pull"], required=True)
-parser.add_argument(
-    "--inputs-tvf", required=True, nargs="+", help="input files truth finder"
-)
-parser.add_argument(
-    "--inputs-wot", required=True, nargs="+", help="input files without time"
-)
-parser.add_argument(
-    "--inputs-wt", required=True, nargs="+", help="input files with time"
-)
-parser.add_argument("--output")
-parser.add_argument("--line-fit", action="store_true")
-args = parser.parse_args()
-
-assert (
-    len(args.inputs_tvf) == len(args.inputs_wot) == len(args.inputs_wt)
-), "equal number of inputs required"
-
-#event_sim_label = Path(args.inputs_wot[0]).parent.name
-#event_label, simulation_label = split_event_sim_label(event_sim_label)
-event_label = Path(args.inputs_wot[0]).parent.parent.name
-event_type, _ = get_event_details(event_label)
-
-inputs = {
-    "without time": args.inputs_wot,
-    "with time": args.inputs_wt,
-    "truth": args.inputs_tvf,
-}
-
-title = "Vertex resolution" if args.mode == "residual" else "Vertex pull sigma"
-variables = residuals if args.mode == "residual" else pulls
-
-results = {
-    input_type: {variable: [] for variable in variables} for input_type in inputs.keys()
-}
-
-for input_type, inputs_list in inputs.items():
-    for input in inputs_list:
-        #event_sim_label = Path(input).parent.name
-        #event_label, simulation_label = split_event_sim_label(event_sim_label)
-        event_label = Path(input).parent.parent.name
-        pu = get_event_details(event_label)[1]["pu"]
-
-        vertexing = uproot.open(input)["vertexing"].arrays(columns, library="pd")
-      # filter for first primary vertex which is the HS vertex by design
-        vertexing = vertexing[
-            (vertexing["vertex_primary"] == 1)
-            & (vertexing["vertex_secondary"] == 0)
-            & (vertexing["recoVertexClassification"] == 1)
-        ]
-
-        for variable_type, variable in zip(variable_types, variables):
-            if input_type == "without time" and variable_type == "t":
-                continue
-
-            data = vertexing[variable].dropna()
-            (mu, sigma), cov = robust_gauss_fit(data)
-
-            results[input_type][variable].append(
-                {
-                    "pu": pu,
-                    "mu": mu,
-                    "sigma": sigma,
-                    "sigma_err": cov[1, 1] ** 0.5,
-                }
-            )
-
-fig = plt.figure(f"{title} over PU", figsize=(12, 8))
-fig.suptitle(f"{title} over PU for {event_type}")
-axs = fig.subplots(2, 2)
-axs = [item for sublist in axs for item in sublist]
-
-for i, (input_type, result) in enumerate(results.items()):
-    for variable_type, variable, ax in zip(variable_types, variables, axs):
-        if input_type == "without time" and variable_type == "t":
-            ax.errorbar(
-                np.nan,
-                np.nan,
-                np.nan,
-                marker="o",
-                linestyle="",
-                alpha=0.5,
-                label=f"{input_type}",
-            )
-            continue
-
-        data = pd.DataFrame(result[variable])
-
-        ax.set_title(variable)
-        ax.errorbar(
-            data["pu"],
-            data["sigma"],
-            data["sigma_err"],
-            marker="o",
-            linestyle="",
-            color=f"C{i}",
-            alpha=0.5,
-            label=f"{input_type}",
-        )
-        ax.legend()
-
-        if args.line_fit:
-            params, cov, p_value = line_fit(
-                data["pu"], data["sigma"], data["sigma_err"]
-            )
-
-            ax.plot(
-                data["pu"],
-                params[0] * data["pu"] + params[1],
-                marker="",
-                linestyle="--",
-                color=f"C{i}",
-                alpha=0.5,
-                label=f"fit: {params[0]:.2f} * PU + {params[1]:.2f}, p-value: {p_value:.2f}",
-            )
-
-for variable, ax in zip(
-    variables,
-    axs,
-):
-    ax.set_title(variable)
-    ax.legend()
+mode, argv = parser.parse_known_args()
 
-if args.output:
-    plt.savefig(args.output)
-else:
-    plt.show()
+sys.exit(main([f"{mode.mode}s", "--over", "pu", *argv]))
@@ -15,6 +15,8 @@ export LD_LIBRARY_PATH=$ODD_PATH/factory:$LD_LIBRARY_PATH
 # === Python path ===
 export PYTHONPATH=/afs/cern.ch/user/r/reyu/public/acts-install/python:$PYTHONPATH
 export PYTHONPATH=/eos/user/r/reyu/full_chain_odd/mycommon:$PYTHONPATH
+# repository root, for `mycommon.*` and the plot/ scripts (or `pip install -e .`)
+export PYTHONPATH=/eos/user/r/reyu/full_chain_odd:$PYTHONPATH
 source /afs/cern.ch/user/r/reyu/public/acts-install/bin/this_odd.sh
 echo "✅ ACTS + ODD environment ready"
 
@@ -0,0 +1,50 @@
+from mycommon.chainspec import stages, write_manifest, find_reusable
+
+
+def full_run(directory):
+    directory.mkdir()
+    (directory / "hits.root").write_bytes(b"hits")
+    hashes = {stage: f"{stage}-hash" for stage in stages}
+    write_manifest(directory, {}, hashes)
+    return hashes
+
+
+def test_shorter_run_reuses_longer_manifest(tmp_path):
+    hashes = full_run(tmp_path / "full")
+    short = {stage: hashes[stage] for stage in stages[: stages.index("ckf") + 1]}
+
+    reused = find_reusable(short, [tmp_path / "full"])
+
+    assert list(reused) == list(short)
+
+
+def test_changed_stage_stops_reuse(tmp_path):
+    hashes = full_run(tmp_path / "full")
+    short = {stage: hashes[stage] for stage in stages[: stages.index("ckf") + 1]}
+    short["seeding"] = "other"
+
+    reused = find_reusable(short, [tmp_path / "full"])
+
+    assert list(reused) == stages[: stages.index("seeding")]
+
+
+def test_sweep_rerun(tmp_path):
+    # ckf-sweep: the cache runs with --last-stage seeding, every point with
+    # --last-stage ckf --reuse-from cache; a rerun reads both manifests
+    hashes = {stage: f"{stage}-hash" for stage in stages}
+    upto = {
+        last: {stage: hashes[stage] for stage in stages[: stages.index(last) + 1]}
+        for last in ["seeding", "ckf"]
+    }
+    cache, point = tmp_path / "cache", tmp_path / "point_000"
+    for directory, last in [(cache, "seeding"), (point, "ckf")]:
+        directory.mkdir()
+        (directory / "hits.root").write_bytes(b"hits")
+        write_manifest(directory, {}, upto[last])
+
+    assert list(find_reusable(upto["seeding"], [cache, point])) == list(
+        upto["seeding"]
+    )
+    assert list(find_reusable(upto["ckf"], [point, cache])) == list(upto["ckf"])
+    # a point directory rerun only up to seeding, e.g. by seeding-benchmark
+    assert list(find_reusable(upto["seeding"], [point])) == list(upto["seeding"])
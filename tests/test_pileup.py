@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from mycommon.pileup import (
+    build_library,
+    open_library,
+    sample_pileup,
+    truth_vertices,
+    vertex_primary,
+    vertex_secondary,
+)
+
+
+def barcode(primary, secondary, particle, generation=0, sub_particle=0):
+    return (
+        (primary << 52)
+        | (secondary << 40)
+        | (particle << 24)
+        | (generation << 16)
+        | sub_particle
+    )
+
+
+def particles(ids, positions):
+    return pd.DataFrame(
+        {
+            "particle_id": np.array(ids, dtype=np.uint64),
+            **{
+                c: np.array(v, dtype=float)
+                for c, v in zip("vx vy vz vt".split(), zip(*positions))
+            },
+        }
+    )
+
+
+def test_truth_vertices_of_overlaid_event(tmp_path):
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    # minimum-bias events: a primary vertex with two particles and a decay
+    for event in range(4):
+        particles(
+            [barcode(1, 0, 1), barcode(1, 0, 2), barcode(1, 1, 1)],
+            [(0, 0, 0, 0), (0, 0, 0, 0), (1, 2, 3, 4)],
+        ).to_csv(csv_dir / f"event{event:09d}-particles.csv", index=False)
+    build_library(csv_dir, tmp_path / "library")
+    library = open_library(tmp_path / "library")
+
+    hard_scatter = particles(
+        [barcode(1, 0, 1), barcode(1, 0, 2), barcode(1, 0, 2, generation=1)],
+        [(0.1, 0, 5, 0), (0.1, 0, 5, 0), (7, 7, 7, 7)],
+    )
+    rng = np.random.default_rng(1)
+    pileup = sample_pileup(library, rng, 3, [0.01, 0.01, 50, 0.2], first_vertex=2)
+    event = pd.concat([hard_scatter, pd.DataFrame(pileup["particles"])])
+
+    vertices = truth_vertices(event)
+
+    n = len(pileup["particles"]["particle_id"]) // 3
+    # the HS vertex without the simulated particle, every pile-up event has
+    # a primary and a secondary vertex
+    assert len(vertices["vertex_id"]) == 1 + 2 * n
+    assert sorted(set(vertices["vertex_primary"].tolist())) == list(range(1, n + 2))
+    assert np.array_equal(
+        vertices["vertex_primary"], vertex_primary(vertices["vertex_id"])
+    )
+    assert vertices["vertex_secondary"].tolist().count(1) == n
+    assert sum(len(ids) for ids in vertices["outgoing_particles"]) == 2 + 3 * n
+
+    hs = vertices["vertex_primary"] == 1
+    assert vertices["vz"][hs].tolist() == [5]
+    for ids, z in zip(vertices["outgoing_particles"], vertices["vz"]):
+        assert np.all(vertex_primary(ids) == vertex_primary(ids[0]))
+        assert np.all(vertex_secondary(ids) == vertex_secondary(ids[0]))
+        assert np.all(event["vz"].to_numpy()[np.isin(event["particle_id"], ids)] == z)